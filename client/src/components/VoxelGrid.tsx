@@ -346,12 +346,15 @@ import { authStorage } from "../utils/auth";
 
 // נקרא קודם כל מ-VITE_GAME_WS; אם אין, ניפול לכתובת מה-Edge באותו הוסט
 const ENV_WS = (import.meta as any).env?.VITE_GAME_WS as string | undefined;
+// resume token from the server's "session" frame; sessionStorage so a reload resumes too
+const SESSION_KEY = "game.session";
 
 interface GameState {
   w: number;
   h: number;
   data: number[];
   chunk_id?: string;
+  version?: number;
 }
 
 interface VoxelGridProps {
@@ -367,6 +370,16 @@ const VoxelGrid: React.FC<VoxelGridProps> = ({ serverUrl }) => {
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<ReturnType<typeof setTimeout> | null>(null);
   const reconnectingRef = useRef<boolean>(false);
+  // עותק של המצב האחרון, כדי להחיל עליו דלתאות בתוך onmessage
+  const gameStateRef = useRef<GameState | null>(null);
+  const sessionRef = useRef<string | null>(sessionStorage.getItem(SESSION_KEY));
+
+  const applyState = useCallback((next: GameState | null) => {
+    gameStateRef.current = next;
+    setGameState(next);
+    // BIT_IS_PLAYER = 0 => בדיקה עם (cell & 1)
+    setPlayerCount(next ? next.data.filter((cell: number) => (cell & 1) === 1).length : 0);
+  }, []);
 
   // תמיד מחזיר מחרוזת תקינה ל-WS
   const getWebSocketUrl = useCallback((): string => {
@@ -402,8 +415,17 @@ const VoxelGrid: React.FC<VoxelGridProps> = ({ serverUrl }) => {
     try {
       const base = getWebSocketUrl();
       const token = authStorage.getToken?.();
-      const url: string = token ? `${base}?token=${encodeURIComponent(token)}` : base;
-      console.log("[WS URL]", url, "token?", Boolean(token));
+      const params = new URLSearchParams();
+      if (token) params.set("token", token);
+      // reconnect: take our player back and get only what changed since the board we show
+      const cur = gameStateRef.current;
+      if (sessionRef.current) {
+        params.set("resume", sessionRef.current);
+        if (cur?.chunk_id && cur.version !== undefined) params.set("seen", `${cur.chunk_id}:${cur.version}`);
+      }
+      const query = params.toString();
+      const url: string = query ? `${base}?${query}` : base;
+      console.log("[WS URL]", base, "token?", Boolean(token), "resume?", params.has("resume"));
 
       const ws = new WebSocket(url);
       wsRef.current = ws;
@@ -415,16 +437,27 @@ const VoxelGrid: React.FC<VoxelGridProps> = ({ serverUrl }) => {
       ws.onmessage = (event) => {
         try {
           const data = JSON.parse(event.data);
-          if (data.type === "matrix") {
-            setGameState({
+          if (data.type === "session") {
+            sessionRef.current = data.token;
+            sessionStorage.setItem(SESSION_KEY, data.token);
+          } else if (data.type === "matrix") {
+            applyState({
               w: data.w,
               h: data.h,
               data: data.data,
               chunk_id: data.chunk_id,
+              version: data.version,
             });
-            // BIT_IS_PLAYER = 0 => בדיקה עם (cell & 1)
-            const players = data.data.filter((cell: number) => (cell & 1) === 1);
-            setPlayerCount(players.length);
+          } else if (data.type === "delta") {
+            const cur = gameStateRef.current;
+            if (!cur || cur.chunk_id !== data.chunk_id || cur.version !== data.base) {
+              // פספסנו גרסה — מבקשים תמונה מלאה מהשרת
+              ws.send(JSON.stringify({ k: "whereami" }));
+              return;
+            }
+            const next = cur.data.slice();
+            for (const [r, c, v] of data.cells) next[r * cur.w + c] = v;
+            applyState({ ...cur, data: next, version: data.version });
           }
         } catch (err) {
           console.error("WS parse error:", err);
@@ -432,9 +465,8 @@ const VoxelGrid: React.FC<VoxelGridProps> = ({ serverUrl }) => {
       };
 
       ws.onclose = () => {
+        // the board stays up: a resume only sends what changed since
         setConnected(false);
-        setGameState(null);
-        setPlayerCount(0);
         if (!reconnectingRef.current) {
           reconnectingRef.current = true;
           reconnectTimeoutRef.current = setTimeout(() => {
@@ -451,7 +483,7 @@ const VoxelGrid: React.FC<VoxelGridProps> = ({ serverUrl }) => {
       console.error("WS connect failed:", err);
       setConnected(false);
     }
-  }, [getWebSocketUrl]);
+  }, [getWebSocketUrl, applyState]);
 
   const sendMessage = useCallback((message: any) => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
@@ -507,7 +539,7 @@ const VoxelGrid: React.FC<VoxelGridProps> = ({ serverUrl }) => {
         reconnectTimeoutRef.current = null;
       }
       try {
-        wsRef.current?.close();
+        wsRef.current?.close(1000);   // a clean close ends the session
         wsRef.current = null;
       } catch {}
     };
@@ -0,0 +1,118 @@
+"""
+UserStore vs the old users.json handling (re-read + normalize + linear scan
+per request, whole-file rewrite per registration – kept below as the
+reference).
+
+Grows the user count step by step and reports login lookup latency (by
+username, email and id) for both, registration cost, then checks that
+concurrent registrations from threads and from a second process lose
+nothing and never share an id, and that a users.json with gaps migrates
+with its holes on the free list. Scratch files only. Run from services/auth:
+
+    python bench.py [--users 300000] [--threads 8]
+"""
+import argparse, json, multiprocessing, random, tempfile, threading, time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from store import UserStore, Taken, parse_id, to_bin
+
+
+def ref_load(path: Path) -> List[Dict[str, Any]]:
+    users = json.loads(path.read_text(encoding="utf-8"))["users"]
+    for u in users:
+        u["id"] = to_bin(parse_id(u["id"]))
+    return users
+
+
+def ref_login(path: Path, username: str):
+    return next((u for u in ref_load(path) if u["username"].lower() == username.lower()), None)
+
+
+def per_call(fn, args: List[Any]) -> float:
+    t0 = time.perf_counter()
+    for a in args:
+        fn(a)
+    return (time.perf_counter() - t0) / len(args)
+
+
+def grow(store: UserStore, upto: int) -> float:
+    start = store.count()
+    t0 = time.perf_counter()
+    for i in range(start, upto):
+        store.register(f"User{i}", f"user{i}@example.com")
+    return (time.perf_counter() - t0) / max(upto - start, 1)
+
+
+def hammer(store: UserStore, tag: str, n: int) -> None:
+    for i in range(n):
+        try:   # every race name is tried by all registrants, one wins
+            store.register(f"race{i}", f"race{i}@example.com")
+        except Taken:
+            pass
+        store.register(f"{tag}-{i}", f"{tag}-{i}@example.com")
+
+
+def hammer_process(path: str, tag: str, n: int) -> None:
+    hammer(UserStore(Path(path), legacy_json=None), tag, n)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=300000)
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args()
+    tmp = Path(tempfile.mkdtemp(prefix="auth-bench-"))
+    random.seed(0)
+
+    store = UserStore(tmp / "users.db", legacy_json=None)
+    print(f"{'users':>8} {'register':>10} {'by name':>9} {'by email':>9} {'by id':>9} {'users.json':>11}")
+    for size in [s for s in (1000, 10000, 100000) if s < args.users] + [args.users]:
+        reg = grow(store, size)
+        sample = random.sample(range(size), 200)
+        name = per_call(store.by_username, [f"user{i}" for i in sample])
+        email = per_call(store.by_email, [f"USER{i}@example.com" for i in sample])
+        uid = per_call(store.by_id, sample)
+        ref = "-"
+        if size <= 100000:
+            legacy = tmp / "users.json"
+            legacy.write_text(json.dumps({"users": [{"id": to_bin(i), "username": f"User{i}", "email": f"user{i}@example.com"}
+                                                    for i in range(size)]}))
+            ref = f"{per_call(lambda n: ref_login(legacy, n), [f'user{i}' for i in sample[:5]]) * 1e3:8.1f} ms"
+        print(f"{size:8d} {reg * 1e6:7.1f} µs {name * 1e6:6.1f} µs {email * 1e6:6.1f} µs {uid * 1e6:6.1f} µs {ref:>11}")
+
+    # concurrent registrations: threads sharing one store + a second process
+    path = tmp / "race.db"
+    n = 300
+    shared = UserStore(path, legacy_json=None)
+    threads = [threading.Thread(target=hammer, args=(shared, f"t{t}", n)) for t in range(args.threads)]
+    proc = multiprocessing.get_context("spawn").Process(target=hammer_process, args=(str(path), "p", n))
+    t0 = time.perf_counter()
+    proc.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    proc.join()
+    dt = time.perf_counter() - t0
+    ids = [r[0] for r in shared.conn.execute("SELECT id FROM users")]
+    want = n + (args.threads + 1) * n
+    print(f"race: {len(ids)} users (want {want}) in {dt:.2f}s, ids unique: {len(set(ids)) == len(ids)}, "
+          f"dense 0..{want - 1}: {sorted(ids) == list(range(want))}")
+
+    # migration of a users.json with holes, then the free list fills them
+    legacy = tmp / "legacy.json"
+    legacy.write_text(json.dumps({"users": [
+        {"id": "00000000", "username": "a", "email": "a@x.com"},
+        {"id": 3, "username": "b", "email": "b@x.com"},
+        {"id": "5", "username": "c", "email": "c@x.com"},
+        {"id": "00000111", "username": "A", "email": "dup@x.com"},   # same name, other case
+    ]}))
+    migrated = UserStore(tmp / "migrated.db", legacy_json=legacy)
+    again = UserStore(tmp / "migrated.db", legacy_json=legacy)     # second start: no re-import
+    got = [migrated.register(f"new{i}", f"new{i}@x.com")["id"] for i in range(5)]
+    print(f"migration: {again.count() - 5} users kept, new ids {got}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+User store for the auth service: SQLite (AUTH_DB_PATH, default users.db next
+to this file) instead of rewriting users.json on every registration.
+
+    users(id INTEGER PRIMARY KEY, username, email, username_key, email_key, created)
+        UNIQUE username_key, UNIQUE email_key   -- lower() of the two, as before
+    free_ranges(lo INTEGER PRIMARY KEY, hi)     -- holes below the high-water mark, lo..hi inclusive
+    meta(key TEXT PRIMARY KEY, value TEXT)       -- next_id, migrated_json
+
+Lookups by id, username or email are one index probe each, so login cost
+does not grow with the user count. Ids are handed out lowest-free-first:
+the smallest free id (left by deletes, or gaps in migrated data – one row
+per gap, however wide), else next_id. On the wire an id is its binary string, zero-padded to at
+least 8 digits – ids below 256 keep their old 8-bit form.
+
+Registration is one IMMEDIATE transaction, and the unique indexes are the
+final word on duplicates, so concurrent registrations – threads here or
+other worker processes on the same file – cannot lose writes or hand out
+an id twice. The first open of a database imports users.json into it, once.
+"""
+import json, os, re, sqlite3, threading, time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DB_PATH = Path(os.getenv("AUTH_DB_PATH", str(Path(__file__).parent / "users.db")))
+LEGACY_JSON = Path(__file__).parent / "users.json"
+ID_BITS = 32                                 # ids 0 .. 2**32-1
+BIN_RE = re.compile(r"^[01]{8,}$")
+
+
+class Taken(Exception):
+    """Username or email already registered; str() is "username_taken" / "email_taken"."""
+
+
+class IdSpaceExhausted(Exception):
+    pass
+
+
+def to_bin(n: int) -> str:
+    return f"{n:08b}"
+
+
+def parse_id(uid: Any) -> int:
+    """An id as clients and users.json write it: int, binary string ("00000010") or decimal string."""
+    if isinstance(uid, bool):
+        raise ValueError(f"bad user id {uid!r}")
+    if isinstance(uid, int):
+        n = uid
+    elif isinstance(uid, str) and BIN_RE.fullmatch(uid):
+        n = int(uid, 2)
+    elif isinstance(uid, str):
+        n = int(uid)     # ValueError if it is not a number either
+    else:
+        raise ValueError(f"bad user id {uid!r}")
+    if not 0 <= n < 1 << ID_BITS:
+        raise ValueError(f"user id out of range: {uid!r}")
+    return n
+
+
+class UserStore:
+    def __init__(self, path: Path = DB_PATH, legacy_json: Optional[Path] = LEGACY_JSON) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # FastAPI runs sync endpoints on a thread pool: one connection, one lock
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                id           INTEGER PRIMARY KEY,
+                username     TEXT NOT NULL,
+                email        TEXT NOT NULL,
+                username_key TEXT NOT NULL UNIQUE,
+                email_key    TEXT NOT NULL UNIQUE,
+                created      INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS free_ranges (lo INTEGER PRIMARY KEY, hi INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        if legacy_json is not None:
+            self._migrate_json(legacy_json)
+
+    # ── helpers ───────────────────────────────────────────────────────────────
+    @staticmethod
+    def _user(row: Optional[Tuple[int, str, str]]) -> Optional[Dict[str, str]]:
+        if row is None:
+            return None
+        return {"id": to_bin(row[0]), "username": row[1], "email": row[2]}
+
+    def _one(self, sql: str, args: tuple) -> Optional[Dict[str, str]]:
+        with self.lock:
+            return self._user(self.conn.execute(sql, args).fetchone())
+
+    def _meta(self, key: str, default: str) -> str:
+        row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, value),
+        )
+
+    def _allocate(self) -> int:
+        """Lowest free id; call inside a write transaction."""
+        row = self.conn.execute("SELECT lo, hi FROM free_ranges ORDER BY lo LIMIT 1").fetchone()
+        if row is not None:
+            lo, hi = row
+            if lo == hi:
+                self.conn.execute("DELETE FROM free_ranges WHERE lo=?", (lo,))
+            else:
+                self.conn.execute("UPDATE free_ranges SET lo=lo+1 WHERE lo=?", (lo,))
+            return lo
+        n = int(self._meta("next_id", "0"))
+        if n >= 1 << ID_BITS:
+            raise IdSpaceExhausted()
+        self._set_meta("next_id", str(n + 1))
+        return n
+
+    def _taken(self, username_key: str, email_key: str) -> Optional[str]:
+        if self.conn.execute("SELECT 1 FROM users WHERE username_key=?", (username_key,)).fetchone():
+            return "username_taken"
+        if self.conn.execute("SELECT 1 FROM users WHERE email_key=?", (email_key,)).fetchone():
+            return "email_taken"
+        return None
+
+    # ── API ───────────────────────────────────────────────────────────────────
+    def by_id(self, uid: int) -> Optional[Dict[str, str]]:
+        return self._one("SELECT id, username, email FROM users WHERE id=?", (uid,))
+
+    def by_username(self, username: str) -> Optional[Dict[str, str]]:
+        return self._one("SELECT id, username, email FROM users WHERE username_key=?", (username.lower(),))
+
+    def by_email(self, email: str) -> Optional[Dict[str, str]]:
+        return self._one("SELECT id, username, email FROM users WHERE email_key=?", (email.lower(),))
+
+    def register(self, username: str, email: str) -> Dict[str, str]:
+        """Add a user under the lowest free id. Raises Taken / IdSpaceExhausted."""
+        ukey, ekey = username.lower(), email.lower()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")   # serialises with other processes too
+            try:
+                taken = self._taken(ukey, ekey)
+                if taken:
+                    raise Taken(taken)
+                uid = self._allocate()
+                self.conn.execute(
+                    "INSERT INTO users (id, username, email, username_key, email_key, created) VALUES (?, ?, ?, ?, ?, ?)",
+                    (uid, username, email, ukey, ekey, int(time.time())),
+                )
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        return {"id": to_bin(uid), "username": username, "email": email}
+
+    def delete(self, uid: int) -> bool:
+        """Remove a user; the id goes back to the free list."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                gone = self.conn.execute("DELETE FROM users WHERE id=?", (uid,)).rowcount > 0
+                if gone:
+                    self.conn.execute("INSERT OR IGNORE INTO free_ranges (lo, hi) VALUES (?, ?)", (uid, uid))
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        return gone
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    # ── users.json import ─────────────────────────────────────────────────────
+    def _migrate_json(self, path: Path) -> None:
+        """
+        Copy the users of an old users.json in, ids kept, and rebuild the
+        free list from the gaps. Runs once per database: the check and the
+        import share one transaction, so parallel workers cannot both do it.
+        Entries with a bad or duplicate id / username / email are skipped.
+        """
+        if not path.exists():
+            return
+        t0 = time.perf_counter()
+        imported = skipped = 0
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._meta("migrated_json", "0") == "1":
+                    self.conn.execute("ROLLBACK")
+                    return
+                for u in json.loads(path.read_text(encoding="utf-8")).get("users", []):
+                    try:
+                        uid = parse_id(u.get("id"))
+                        username, email = str(u["username"]), str(u["email"])
+                        self.conn.execute(
+                            "INSERT INTO users (id, username, email, username_key, email_key, created) VALUES (?, ?, ?, ?, ?, ?)",
+                            (uid, username, email, username.lower(), email.lower(), None),
+                        )
+                        imported += 1
+                    except (KeyError, ValueError, sqlite3.IntegrityError) as e:
+                        print(f"[auth] {path.name}: skipped {u!r}: {e}")
+                        skipped += 1
+                self._rebuild_free_ids()
+                self._set_meta("migrated_json", "1")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        print(f"[auth] imported {imported} users from {path.name} ({skipped} skipped) "
+              f"in {time.perf_counter() - t0:.2f}s; {path.name} is no longer read")
+
+    def _rebuild_free_ids(self) -> None:
+        """One free range per gap between users (and below the first): rows grow with users, not ids."""
+        top = self.conn.execute("SELECT MAX(id) FROM users").fetchone()[0]
+        nxt = max(int(self._meta("next_id", "0")), top + 1 if top is not None else 0)
+        self._set_meta("next_id", str(nxt))
+        self.conn.execute("DELETE FROM free_ranges")
+        self.conn.execute("""
+            INSERT INTO free_ranges (lo, hi)
+            SELECT prev + 1, id - 1 FROM (SELECT id, LAG(id, 1, -1) OVER (ORDER BY id) AS prev FROM users)
+            WHERE id > prev + 1
+        """)
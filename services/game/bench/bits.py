@@ -0,0 +1,78 @@
+"""
+Cell bit kernels: microbenchmark.
+
+Times the table-driven kernels in game.bits against the torch versions
+they replaced, kept below as the reference. tests/test_bits.py checks that
+both agree for every byte value 0..255. Run from services/:
+
+    python -m game.bench.bits
+"""
+import timeit
+import torch
+
+from .. import bits
+from ..settings import DTYPE, COLOR_BITS, BIT_IS_PLAYER, BIT_R0, BIT_R1, BIT_G0, BIT_G1, BIT_B0, BIT_B1
+
+
+# ── reference: the previous torch implementation ─────────────────────────────
+def ref_set_bit(v: torch.Tensor, bit: int, one: bool) -> torch.Tensor:
+    mask = torch.tensor(1 << bit, dtype=DTYPE)
+    return (v | mask) if one else (v & (~mask & torch.tensor(0xFF, dtype=DTYPE)))
+
+def ref_get2(v: torch.Tensor, b0: int, b1: int) -> torch.Tensor:
+    return ((v >> b1) & 1) * 2 + ((v >> b0) & 1)
+
+def ref_set2(v: torch.Tensor, b0: int, b1: int, x: int) -> torch.Tensor:
+    x &= 3
+    v = v & (~(torch.tensor((1 << b0) | (1 << b1), dtype=DTYPE)) & torch.tensor(0xFF, dtype=DTYPE))
+    if x & 1: v = v | torch.tensor(1 << b0, dtype=DTYPE)
+    if x & 2: v = v | torch.tensor(1 << b1, dtype=DTYPE)
+    return v
+
+def ref_inc_color(v: torch.Tensor) -> torch.Tensor:
+    for (b0, b1) in COLOR_BITS.values():
+        curr = int(ref_get2(v, b0, b1))
+        v = ref_set2(v, b0, b1, (curr + 1) % 4)
+    return v
+
+def ref_make_color(r2: int, g2: int, b2: int) -> torch.Tensor:
+    v = torch.tensor(0, dtype=DTYPE)
+    v = ref_set2(v, BIT_R0, BIT_R1, r2)
+    v = ref_set2(v, BIT_G0, BIT_G1, g2)
+    v = ref_set2(v, BIT_B0, BIT_B1, b2)
+    return v
+
+def ref_with_player(v: torch.Tensor) -> torch.Tensor:
+    return ref_set_bit(v, BIT_IS_PLAYER, True)
+
+def ref_without_player(v: torch.Tensor) -> torch.Tensor:
+    return ref_set_bit(v, BIT_IS_PLAYER, False)
+
+
+# ── microbenchmark ───────────────────────────────────────────────────────────
+def bench(n: int = 20000) -> None:
+    tv = torch.tensor(0b10110100, dtype=DTYPE)
+    iv = 0b10110100
+    board_t = torch.randint(0, 256, (64, 64), dtype=DTYPE)
+    board_n = board_t.numpy()
+
+    def per_call(stmt, number):
+        return timeit.timeit(stmt, number=number) / number * 1e6  # µs
+
+    rows = [
+        ("inc_color",      per_call(lambda: ref_inc_color(tv), n),      per_call(lambda: bits.inc_color(iv), n)),
+        ("with_player",    per_call(lambda: ref_with_player(tv), n),    per_call(lambda: bits.with_player(iv), n)),
+        ("without_player", per_call(lambda: ref_without_player(tv), n), per_call(lambda: bits.without_player(iv), n)),
+        ("make_color",     per_call(lambda: ref_make_color(1, 2, 3), n), per_call(lambda: bits.make_color(1, 2, 3), n)),
+        ("is_empty(cell)", per_call(lambda: int((board_t[5, 7] >> 0) & 1) == 0, n),
+                           per_call(lambda: not bits.is_player(int(board_n[5, 7])), n)),
+        ("inc_color 64x64", per_call(lambda: [ref_inc_color(x) for x in board_t.flatten()[:64]], 20) * 64,
+                            per_call(lambda: bits.inc_color_arr(board_n), 2000)),
+    ]
+    print(f"{'op':<18}{'torch µs':>12}{'table µs':>12}{'speedup':>10}")
+    for name, old, new in rows:
+        print(f"{name:<18}{old:>12.3f}{new:>12.3f}{old / new:>9.0f}x")
+
+
+if __name__ == "__main__":
+    bench()
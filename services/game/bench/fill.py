@@ -0,0 +1,124 @@
+"""
+Bulk edits (Hub.fill) vs painting the same cells one by one through
+_set_cell, the way color presses do (kept below as the reference).
+
+Seeds a stored world of noisy chunks, puts players inside the rectangle,
+then times fill / recolor / clear over it – cold (chunks still on disk)
+and warm – and checks every cell: ground as asked inside, untouched
+outside, players still drawn with the ground under them edited.
+Runs in a scratch data dir. Run from services/:
+
+    python -m game.bench.fill [--side 1000] [--players 50]
+"""
+import argparse, asyncio, os, sys, tempfile, time
+
+if __name__ == "__main__":
+    sys.path[:] = [os.path.abspath(p) for p in sys.path]
+    os.chdir(tempfile.mkdtemp(prefix="fill-bench-"))
+
+import numpy as np
+import torch
+
+from ..bits import COLOR_MASK
+from ..hub import Hub
+from ..ids import chunk_id_from_coords
+from ..paint import Fill
+from ..settings import W, H
+from ..storage import store
+from .shards import Sink
+
+
+async def ref_fill(hub: Hub, spec: Fill) -> None:
+    table = spec.table()
+    for cid, rows, cols in spec.spans():
+        board = await hub._ensure_chunk(cid)
+        for r in range(rows.start, rows.stop):
+            for c in range(cols.start, cols.stop):
+                v = hub._cell(board, r, c)
+                if table[v] != v:
+                    hub._set_cell(cid, board, r, c, int(table[v]))
+        hub._mark_dirty(cid)
+        hub._publish(cid)
+
+
+def world(hub: Hub, x0: int, y0: int, w: int, h: int) -> np.ndarray:
+    """The resident cells of [x0, x0+w) × [y0, y0+h) as one array."""
+    out = np.zeros((h, w), dtype=np.uint8)
+    for cid, rows, cols in Fill(x0, y0, w, h).spans():
+        cx, cy = (int(v) for v in cid.split(","))
+        oy, ox = cy * H + rows.start - y0, cx * W + cols.start - x0
+        out[oy:oy + rows.stop - rows.start, ox:ox + cols.stop - cols.start] = hub.chunks[cid].numpy()[rows, cols]
+    return out
+
+
+def players_in(hub: Hub, spec: Fill):
+    for ws, (cid, r, c) in hub.pos_by_ws.items():
+        cx, cy = (int(v) for v in cid.split(","))
+        if spec.x <= cx * W + c < spec.x + spec.w and spec.y <= cy * H + r < spec.y + spec.h:
+            yield ws, (cid, r, c)
+
+
+def check(hub: Hub, spec: Fill, before: np.ndarray, margin: int) -> bool:
+    after = world(hub, spec.x - margin, spec.y - margin, spec.w + 2 * margin, spec.h + 2 * margin)
+    inside = np.zeros(after.shape, dtype=bool)
+    inside[margin:margin + spec.h, margin:margin + spec.w] = True
+    expect = np.where(inside, spec.table()[before], before)
+    players_ok = all(
+        hub.underlying_by_ws[ws] & COLOR_MASK == spec.color
+        for ws, (cid, rows, cols) in players_in(hub, spec) if spec.op == "fill"
+    )
+    return bool(np.array_equal(after, expect)) and players_ok
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--side", type=int, default=1000, help="rectangle is side × side cells")
+    ap.add_argument("--players", type=int, default=50)
+    args = ap.parse_args()
+    side, margin = args.side, 8
+    x0 = y0 = -side // 2
+
+    rng = np.random.default_rng(5)
+    seed = Fill(x0 - margin, y0 - margin, side + 2 * margin, side + 2 * margin)
+    await store.save_chunks([
+        (cid, torch.from_numpy(rng.integers(0, 64, (H, W), dtype=np.uint8) << 2)) for cid, _, _ in seed.spans()
+    ])
+
+    hub = Hub()
+    await hub.start()
+    sinks = [Sink() for _ in range(args.players)]
+    for i, ws in enumerate(sinks):   # players spread over the rectangle
+        await hub.connect(ws, "bin", chunk_id_from_coords((x0 + i * side // args.players) // W, (y0 + side // 2) // H))
+    print(f"{side}x{side} = {side * side} cells over {len(list(Fill(x0, y0, side, side).spans()))} chunks, {args.players} players inside")
+
+    color, other = [3, 1, 0], [0, 2, 3]
+    for label, body in (
+        ("fill cold", {"op": "fill", "color": color}),
+        ("fill warm", {"op": "fill", "color": other}),
+        ("recolor", {"op": "recolor", "src": other, "color": color}),
+        ("clear", {"op": "clear"}),
+    ):
+        spec = Fill.from_dict({"x": x0, "y": y0, "w": side, "h": side, **body})
+        if label != "fill cold":
+            before = world(hub, x0 - margin, y0 - margin, side + 2 * margin, side + 2 * margin)
+        t0 = time.perf_counter()
+        result = await hub.fill(spec)
+        dt = time.perf_counter() - t0
+        ok = check(hub, spec, before, margin) if label != "fill cold" else "-"
+        print(f"  {label:<10} {dt * 1000:8.1f} ms  {result}  ok={ok}")
+
+    ref_side = min(side, 256)
+    spec = Fill.from_dict({"x": x0, "y": y0, "w": ref_side, "h": ref_side, "color": other})
+    t0 = time.perf_counter()
+    await ref_fill(hub, spec)
+    dt = (time.perf_counter() - t0) / (ref_side * ref_side) * side * side
+    print(f"  reference  {dt * 1000:8.1f} ms  (per-cell _set_cell, extrapolated from {ref_side}x{ref_side})")
+
+    for ws in sinks:
+        await hub.disconnect(ws)
+    await hub.stop()
+    store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+"""
+Input paths: one JSON text frame per key, handled one by one (the old
+endpoint loop, kept below as the reference) vs binary frames of several
+commands through InputQueue → Hub.handle_batch.
+
+Players walk and paint inside their chunk and now and then across it;
+throughput counts server-side work only (decode + apply + broadcast into
+the outboxes). Then checks the rate limit, and fuzzes both decoders with
+random bytes / text and checks that every player is still drawn exactly
+once. Runs in a scratch data dir. Run from services/:
+
+    python -m game.bench.inputs [--players 32] [--keys 2000] [--per-frame 8]
+"""
+import argparse, asyncio, json, os, random, sys, tempfile, time
+
+if __name__ == "__main__":
+    sys.path[:] = [os.path.abspath(p) for p in sys.path]
+    os.chdir(tempfile.mkdtemp(prefix="inputs-bench-"))
+
+from ..bits import PLAYER_MASK
+from ..frames import HEADER, T_ACK, ACK_DROPPED
+from ..hub import Hub
+from ..ids import chunk_id_from_coords
+from ..inputs import InputQueue, InputStats, KEY_ACTIONS, decode_input, encode_input
+from ..storage import store
+
+KEYS = ["up", "down", "left", "right", "color"]
+JSON_KEYS = ["ArrowUp", "ArrowDown", "ArrowLeft", "ArrowRight", "c"]
+
+
+class AckSink:
+    """Fake binary-format WebSocket that remembers the last ack."""
+    def __init__(self) -> None:
+        self.seq = -1
+        self.dropped = 0
+        self.acked = asyncio.Event()
+
+    async def send_bytes(self, data: bytes) -> None:
+        if data[0] == T_ACK:
+            self.seq = HEADER.unpack_from(data)[4]
+            self.dropped += ACK_DROPPED.unpack_from(data, HEADER.size)[0]
+            self.acked.set()
+
+    async def send_text(self, data: str) -> None:
+        pass
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+    async def wait_ack(self, seq: int) -> None:
+        while self.seq < seq:
+            self.acked.clear()
+            await self.acked.wait()
+
+
+async def ref_json(hub: Hub, ws, text: str) -> None:
+    data = json.loads(text)
+    action = KEY_ACTIONS.get((data.get("k") or "").lower())
+    if action:
+        await hub.handle(ws, action)
+
+
+async def players(hub: Hub, n: int):
+    sinks = [AckSink() for _ in range(n)]
+    for i, ws in enumerate(sinks):
+        await hub.connect(ws, "bin", chunk_id_from_coords(i, 0))
+    return sinks
+
+
+async def run_json(hub: Hub, sinks, keys: int) -> float:
+    msgs = [[json.dumps({"k": random.choice(JSON_KEYS)}) for _ in range(keys)] for _ in sinks]
+
+    async def one(ws, texts):
+        for text in texts:
+            await ref_json(hub, ws, text)
+            await asyncio.sleep(0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(ws, m) for ws, m in zip(sinks, msgs)))
+    return time.perf_counter() - t0
+
+
+async def run_binary(hub: Hub, sinks, keys: int, per_frame: int, stats: InputStats) -> float:
+    frames = [
+        [encode_input(s, [random.choice(KEYS) for _ in range(per_frame)]) for s in range(keys // per_frame)]
+        for _ in sinks
+    ]
+    queues = [InputQueue(hub, ws, stats, rate=0) for ws in sinks]
+
+    async def one(q, ws, fs):
+        for data in fs:
+            seq, actions = decode_input(data)
+            q.push(actions, seq)
+            await asyncio.sleep(0)
+        await ws.wait_ack(len(fs) - 1)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(q, ws, fs) for q, ws, fs in zip(queues, sinks, frames)))
+    dt = time.perf_counter() - t0
+    for q in queues:
+        await q.close()
+    return dt
+
+
+def drawn_once(hub: Hub) -> bool:
+    on_board = sum(int((hub.chunks[cid].numpy() & PLAYER_MASK).astype(bool).sum()) for cid in hub.chunks)
+    return on_board == len(hub.pos_by_ws) and all(
+        hub.chunks[cid].numpy()[r, c] & PLAYER_MASK for cid, r, c in hub.pos_by_ws.values()
+    )
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=32)
+    ap.add_argument("--keys", type=int, default=2000, help="keys per player")
+    ap.add_argument("--per-frame", type=int, default=8, help="commands per binary frame")
+    args = ap.parse_args()
+    random.seed(1)
+
+    hub = Hub()
+    await hub.start()
+    sinks = await players(hub, args.players)
+    total = args.players * args.keys
+
+    dt = await run_json(hub, sinks, args.keys)
+    print(f"  json, 1 key/frame    {total / dt:9.0f} msgs/s  {total / dt:9.0f} keys/s")
+    for per_frame in sorted({1, args.per_frame}):
+        stats = InputStats()
+        dt = await run_binary(hub, sinks, args.keys, per_frame, stats)
+        msgs = total // per_frame
+        print(f"  binary, {per_frame} keys/frame {msgs / dt:9.0f} msgs/s  {total / dt:9.0f} keys/s  "
+              f"({stats.as_dict()['actions_per_batch']} keys/batch)")
+    print("  players drawn once:", drawn_once(hub))
+
+    # rate limit: 1000 keys at once against the defaults
+    ws = sinks[0]
+    q = InputQueue(hub, ws, InputStats())
+    before = ws.dropped
+    q.push(["color"] * 1000, 10 ** 6)
+    await ws.wait_ack(10 ** 6)
+    await q.close()
+    print(f"  rate limit: 1000 keys in one frame → {ws.dropped - before} dropped")
+
+    # fuzz: random binary frames and random text through both decoders
+    stats = InputStats()
+    queues = [InputQueue(hub, s, stats, rate=0) for s in sinks]
+    bad = 0
+    for i in range(20000):
+        q = random.choice(queues)
+        data = bytes(random.getrandbits(8) for _ in range(random.randint(0, 24)))
+        try:
+            seq, actions = decode_input(data)
+        except ValueError:
+            bad += 1
+            continue
+        q.push(actions, seq)
+        if i % 64 == 0:
+            await asyncio.sleep(0)
+        text = random.choice(['{"k": "up"}', '{"k": 5}', '[]', '{"k": null}', "{", '{"k": "ArrowLEFT"}', "\x00"])
+        try:
+            await ref_json(hub, q.ws, text)
+        except (ValueError, AttributeError):
+            pass
+    for q in queues:
+        await q.close()
+    print(f"  fuzz: 20000 frames ({bad} too short), {stats.actions} actions applied, players drawn once:", drawn_once(hub))
+
+    for ws in sinks:
+        await hub.disconnect(ws)
+    await hub.stop()
+    store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,336 @@
+"""
+Load generator: N simulated clients on real WebSockets against
+game.main:app, for comparing Hub changes between commits.
+
+The server is started with uvicorn on localhost (default, its RSS measured
+on its own) or served from this process (--inproc), either way in a scratch
+dir with its own GAME_DB_PATH; --url points at a running server instead.
+Inputs are not rate limited unless --env sets GAME_INPUT_RATE.
+
+Every client connects with ?fmt=bin and, after an optional spread walk
+(--spawn spread: a few chunks away from the root in a random direction),
+loops: think (exponential, --think-ms mean), send one action drawn from
+--mix as a binary input frame, wait for it. Latency is send → ack: the ack
+is queued behind the frames the action caused, so it arrives after the
+actor's own broadcast. With GAME_TICK_HZ the ack only means "queued", so
+latency runs on to the first delta after it – the tick that applied it.
+
+Reports action latency p50/p95/p99, actions, frames and bytes received per
+second, chunk writes and commits per second (from /stats), peak RSS, and
+writes it all as JSON (--json); --compare prints the change against an
+earlier run's JSON. Run from services/:
+
+    python -m game.bench.load [--clients 50] [--duration 10] [--spawn root|spread]
+        [--mix up=1,down=1,left=1,right=1,color=1] [--think-ms 20]
+        [--env GAME_TICK_HZ=20 ...] [--inproc | --url http://host:port]
+        [--json out.json] [--compare base.json]
+"""
+import argparse, asyncio, json, os, random, resource, signal, socket, subprocess, sys, tempfile, time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SERVICES = Path(__file__).resolve().parents[2]
+CALLER_DIR = Path.cwd()   # --json / --compare paths are relative to it
+
+if __name__ == "__main__":
+    sys.path[:] = [os.path.abspath(p) for p in sys.path]
+    os.chdir(tempfile.mkdtemp(prefix="load-bench-"))
+
+import websockets
+
+# game modules are imported inside functions: --inproc has to set the
+# server's env before game.settings is first imported
+ACTION_TIMEOUT_S = 2.0   # tick mode: an action that changed nothing (blocked move) never sees a delta
+
+
+def percentile(xs: List[float], q: float) -> Optional[float]:
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q / 100 * len(xs)))]
+
+
+def get_json(base: str, path: str) -> Dict[str, Any]:
+    with urllib.request.urlopen(base + path, timeout=10) as r:
+        return json.loads(r.read())
+
+
+def db_counters(stats: Dict[str, Any]) -> Dict[str, int]:
+    """chunk_writes / commits, summed over shard workers in sharded mode."""
+    hubs = stats.get("shards", {}).get("workers") or [stats]
+    out = {"chunk_writes": 0, "commits": 0}
+    for hub in hubs:
+        for k in out:
+            out[k] += (hub.get("db") or {}).get(k, 0)
+    return out
+
+
+def peak_rss_mb(pid: int) -> float:
+    """VmHWM of `pid` plus its children (shard workers), in MiB."""
+    total, todo = 0, [pid]
+    while todo:
+        p = todo.pop()
+        try:
+            for line in Path(f"/proc/{p}/status").read_text().splitlines():
+                if line.startswith("VmHWM:"):
+                    total += int(line.split()[1])
+            for task in Path(f"/proc/{p}/task").iterdir():
+                todo.extend(int(c) for c in (task / "children").read_text().split())
+        except (FileNotFoundError, ProcessLookupError):
+            pass
+    return total / 1024
+
+
+class Client:
+    def __init__(self, i: int, args: argparse.Namespace, actions: List[str], weights: List[float], tick: bool) -> None:
+        self.rng = random.Random(i)
+        self.args = args
+        self.actions, self.weights = actions, weights
+        self.tick = tick
+        self.seq = 0
+        self.waiter: Optional[asyncio.Future] = None
+        self.await_delta = False
+        self.latencies: List[float] = []
+        self.timeouts = 0
+        self.sent = 0
+        self.counting = False
+        self.done = asyncio.Event()   # measuring over; the socket may still be closing
+        self.frames = self.broadcasts = self.bytes = 0
+
+    def _on_frame(self, msg: bytes) -> None:
+        from ..frames import HEADER, T_ACK, T_DELTA
+        if self.counting:
+            self.frames += 1
+            self.bytes += len(msg)
+        kind, _, _, _, seq = HEADER.unpack_from(msg)
+        if kind != T_ACK and self.counting:
+            self.broadcasts += 1
+        done = False
+        if kind == T_ACK and seq == self.seq:
+            if self.tick:
+                self.await_delta = True
+            else:
+                done = True
+        elif kind == T_DELTA and self.await_delta:
+            self.await_delta = False
+            done = True
+        if done and self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(time.perf_counter())
+
+    async def _read(self, ws) -> None:
+        async for msg in ws:
+            if isinstance(msg, bytes):
+                self._on_frame(msg)
+
+    async def _act(self, ws, actions: List[str]) -> Optional[float]:
+        """Send one input frame and wait for it (see the module docstring); latency or None."""
+        from ..inputs import encode_input
+        self.seq += 1
+        self.await_delta = False
+        self.waiter = asyncio.get_running_loop().create_future()
+        t0 = time.perf_counter()
+        await ws.send(encode_input(self.seq, actions))
+        try:
+            return await asyncio.wait_for(self.waiter, ACTION_TIMEOUT_S) - t0
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+
+    async def run(self, url: str, ready: asyncio.Event, start: asyncio.Event, stop_at: List[float]) -> None:
+        async with websockets.connect(f"{url}/ws?fmt=bin", max_size=None) as ws:
+            reader = asyncio.create_task(self._read(ws))
+            try:
+                if self.args.spawn == "spread":
+                    step = self.rng.choice(["up", "down", "left", "right"])
+                    for _ in range(self.args.spread_steps // 8):
+                        await self._act(ws, [step] * 8)
+                ready.set()
+                await start.wait()
+                self.counting = True
+                think = self.args.think_ms / 1000
+                while time.perf_counter() < stop_at[0]:
+                    if think > 0:
+                        await asyncio.sleep(self.rng.expovariate(1 / think))
+                    action = self.rng.choices(self.actions, self.weights)[0]
+                    dt = await self._act(ws, [action])
+                    self.sent += 1
+                    if dt is not None:
+                        self.latencies.append(dt)
+                self.counting = False
+            finally:
+                self.done.set()
+                reader.cancel()
+
+
+async def tick_mode(base: str) -> bool:
+    """Whether the server runs GAME_TICK_HZ; shard workers report their stats about once a second."""
+    for _ in range(30):
+        stats = await asyncio.to_thread(get_json, base, "/stats")
+        hubs = [h for h in stats.get("shards", {}).get("workers") or [stats] if h]
+        if hubs:
+            return float(hubs[0]["tick"]["hz"]) > 0
+        await asyncio.sleep(0.2)
+    raise RuntimeError("no hub stats from the server")
+
+
+async def drive(url: str, args: argparse.Namespace, pid: Optional[int]) -> Dict[str, Any]:
+    base = url.replace("ws://", "http://", 1)
+    wsurl = base.replace("http://", "ws://", 1)
+    tick = await tick_mode(base)
+    mix = dict(kv.split("=") for kv in args.mix.split(","))
+    actions, weights = list(mix), [float(w) for w in mix.values()]
+
+    clients = [Client(i, args, actions, weights, tick) for i in range(args.clients)]
+    readies = [asyncio.Event() for _ in clients]
+    start = asyncio.Event()
+    stop_at = [0.0]
+    tasks = [asyncio.create_task(c.run(wsurl, r, start, stop_at)) for c, r in zip(clients, readies)]
+    await asyncio.gather(*(r.wait() for r in readies))
+
+    before = await asyncio.to_thread(get_json, base, "/stats")
+    t0 = time.perf_counter()
+    stop_at[0] = t0 + args.duration
+    start.set()
+    # not the tasks: a close handshake can hang for websockets' 10 s close_timeout
+    await asyncio.gather(*(c.done.wait() for c in clients))
+    elapsed = time.perf_counter() - t0
+    after = await asyncio.to_thread(get_json, base, "/stats")
+    await asyncio.gather(*tasks)
+
+    lat = [x * 1000 for c in clients for x in c.latencies]
+    w0, w1 = db_counters(before), db_counters(after)
+    sent = sum(c.sent for c in clients)
+    return {
+        "latency_ms": {q: percentile(lat, float(q[1:])) for q in ("p50", "p95", "p99")}
+                      | {"max": max(lat, default=None), "mean": sum(lat) / len(lat) if lat else None},
+        "actions_per_s": sent / elapsed,
+        "timeouts": sum(c.timeouts for c in clients),
+        "frames_per_s": sum(c.frames for c in clients) / elapsed,
+        "broadcasts_per_s": sum(c.broadcasts for c in clients) / elapsed,
+        "bytes_per_s": sum(c.bytes for c in clients) / elapsed,
+        "chunk_writes_per_s": (w1["chunk_writes"] - w0["chunk_writes"]) / elapsed,
+        "commits_per_s": (w1["commits"] - w0["commits"]) / elapsed,
+        "rss_peak_mb": (peak_rss_mb(pid) if pid is not None
+                        else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if args.inproc else None),
+        "elapsed_s": elapsed,
+        "server": {"loop": after.get("loop"), "outbox": after.get("outbox")},
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_up(base: str, proc: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            get_json(base, "/")
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+async def run_inproc(args: argparse.Namespace) -> Dict[str, Any]:
+    import uvicorn
+    from ..main import app
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    try:
+        return await drive(f"http://127.0.0.1:{port}", args, None)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def run_spawned(args: argparse.Namespace, env: Dict[str, str]) -> Dict[str, Any]:
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "game.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **env, "PYTHONPATH": str(SERVICES)},
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        wait_up(base, proc)
+        return asyncio.run(drive(base, args, proc.pid))
+    finally:
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    print(f"vs {old.get('commit')}:")
+    rows = [("latency_ms", q) for q in ("p50", "p95", "p99")] + [
+        (k, None) for k in ("actions_per_s", "broadcasts_per_s", "bytes_per_s", "chunk_writes_per_s", "rss_peak_mb")]
+    for key, sub in rows:
+        a = old["results"].get(key)
+        b = new["results"].get(key)
+        if sub is not None:
+            a, b = (a or {}).get(sub), (b or {}).get(sub)
+        if a is None or b is None:
+            continue
+        change = f"{(b - a) / a * 100:+6.1f}%" if a else "    -"
+        print(f"  {key + ('.' + sub if sub else ''):<22} {a:12.2f} → {b:12.2f}  {change}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=50)
+    ap.add_argument("--duration", type=float, default=10)
+    ap.add_argument("--mix", default="up=1,down=1,left=1,right=1,color=1")
+    ap.add_argument("--spawn", choices=("root", "spread"), default="root")
+    ap.add_argument("--spread-steps", type=int, default=192, help="cells walked out before measuring")
+    ap.add_argument("--think-ms", type=float, default=20)
+    ap.add_argument("--env", action="append", default=[], metavar="GAME_X=V", help="server settings")
+    ap.add_argument("--inproc", action="store_true", help="serve from this process")
+    ap.add_argument("--url", help="drive a running server instead (no RSS)")
+    ap.add_argument("--json", help="write the result here")
+    ap.add_argument("--compare", help="earlier --json result to diff against")
+    args = ap.parse_args()
+
+    env = {"GAME_DB_PATH": str(Path.cwd() / "data" / "world.db"), "GAME_INPUT_RATE": "0"}
+    env.update(kv.split("=", 1) for kv in args.env)
+    if args.url:
+        results = asyncio.run(drive(args.url.rstrip("/"), args, None))
+    elif args.inproc:
+        os.environ.update(env)   # before game.settings is imported
+        results = asyncio.run(run_inproc(args))
+    else:
+        results = run_spawned(args, env)
+
+    commit = subprocess.run(["git", "-C", str(SERVICES), "rev-parse", "--short", "HEAD"],
+                            capture_output=True, text=True).stdout.strip() or None
+    out = {
+        "commit": commit,
+        "time": int(time.time()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")} | {"env": env},
+        "results": results,
+    }
+    lat = results["latency_ms"]
+    fmt = lambda x: f"{x:.2f}" if x is not None else "-"
+    print(f"{args.clients} clients, {args.spawn}, think {args.think_ms:g} ms, {results['elapsed_s']:.1f}s")
+    print(f"  latency  p50 {fmt(lat['p50'])}  p95 {fmt(lat['p95'])}  p99 {fmt(lat['p99'])} ms  ({results['timeouts']} timeouts)")
+    print(f"  actions  {results['actions_per_s']:.0f}/s   broadcasts {results['broadcasts_per_s']:.0f}/s   "
+          f"{results['bytes_per_s'] / 1024:.0f} KiB/s")
+    print(f"  db       {results['chunk_writes_per_s']:.1f} chunk writes/s in {results['commits_per_s']:.1f} commits/s   "
+          f"peak RSS {fmt(results['rss_peak_mb'])} MiB")
+    if args.json:
+        (CALLER_DIR / args.json).write_text(json.dumps(out, indent=2))
+    if args.compare:
+        compare(json.loads((CALLER_DIR / args.compare).read_text()), out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Minimap tiles: the streaming first build vs loading every chunk and then
+drawing (kept below as the reference), then the incremental path – paint
+through a Hub, flush, refresh – and what a revalidating client sees.
+
+Seeds a stored world of painted and noisy chunks, reports build time and
+peak traced memory for both builds, checks sampled pixels against a plain
+mean over the cells, and checks that only the tiles over painted chunks
+changed ETag. Runs in a scratch data dir. Run from services/:
+
+    python -m game.bench.minimap [--chunks 20000] [--noisy 0.2]
+"""
+import argparse, asyncio, os, random, sys, tempfile, time, tracemalloc
+
+if __name__ == "__main__":
+    sys.path[:] = [os.path.abspath(p) for p in sys.path]
+    os.chdir(tempfile.mkdtemp(prefix="minimap-bench-"))
+
+import numpy as np
+import torch
+
+from ..bits import decode_rgb, make_color
+from ..hub import Hub
+from ..ids import chunk_id_from_coords, coords_from_chunk_id
+from ..minimap import Minimap, TILE
+from ..settings import W, H
+from ..storage import store
+
+
+def seed(chunks: int, noisy: float) -> None:
+    rng = np.random.default_rng(3)
+    side = int(chunks ** 0.5) + 1
+    rows = []
+    for i in range(chunks):
+        if rng.random() < noisy:
+            board = rng.integers(0, 64, (H, W), dtype=np.uint8) << 2
+        else:
+            board = np.zeros((H, W), dtype=np.uint8)
+            for _ in range(rng.integers(1, 6)):
+                r, c = rng.integers(0, H), rng.integers(0, W)
+                board[r:r + rng.integers(1, 16), c:c + rng.integers(4, 64)] = rng.integers(1, 64) << 2
+        rows.append((chunk_id_from_coords(i % side - side // 2, i // side - side // 2), torch.from_numpy(board)))
+        if len(rows) == 512:
+            store.db.save_chunks(rows)
+            rows = []
+    store.db.save_chunks(rows)
+
+
+async def ref_build(minimap: Minimap) -> None:
+    boards = {cid: await store.load_chunk(cid) for cid in store.db.list_chunk_ids()}
+    for cid, board in boards.items():
+        minimap.draw(cid, board.numpy())
+
+
+def ref_pixel(board: np.ndarray, s: int, y: int, x: int):
+    cells = [decode_rgb(int(v)) for v in board[y * s:(y + 1) * s, x * s:(x + 1) * s].reshape(-1)]
+    n = len(cells)
+    return tuple((sum(ch[i] for ch in cells) * 85 + n // 2) // n for i in range(3))
+
+
+def check(minimap: Minimap, cids) -> bool:
+    for cid in cids:
+        board = store.db.load_chunk(cid)
+        board = np.zeros((H, W), np.uint8) if board is None else board.numpy()
+        cx, cy = coords_from_chunk_id(cid)
+        for s in minimap.levels:
+            ph, pw = H // s, W // s
+            ky, kx = TILE // ph, TILE // pw
+            tile = minimap.tiles.get((s, cx // kx, cy // ky))
+            y, x = random.randrange(ph), random.randrange(pw)
+            got = tuple(tile.px[(cy % ky) * ph + y, (cx % kx) * pw + x]) if tile is not None else (0, 0, 0)
+            if got != ref_pixel(board, s, y, x):
+                return False
+    return True
+
+
+async def timed(label: str, fn, minimap: Minimap) -> None:
+    t0 = time.perf_counter()
+    await fn(minimap)
+    dt = time.perf_counter() - t0
+    tracemalloc.start()
+    await fn(Minimap(minimap.levels))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {label:<10} {dt:7.2f} s  peak {peak / 2**20:8.1f} MiB  {len(minimap.tiles)} tiles")
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=20000)
+    ap.add_argument("--noisy", type=float, default=0.2)
+    ap.add_argument("--paint", type=int, default=200, help="chunks painted for the incremental run")
+    args = ap.parse_args()
+    random.seed(0)
+
+    seed(args.chunks, args.noisy)
+    cids = store.db.list_chunk_ids()
+    print(f"{len(cids)} stored chunks, {args.noisy:.0%} noisy")
+
+    minimap = Minimap()
+    await timed("streamed", lambda m: m.build(), minimap)
+    await timed("reference", ref_build, Minimap())
+    print("  pixels match:", check(minimap, random.sample(cids, 200)))
+
+    # incremental: paint through a Hub, flush, redraw what it persisted
+    hub = Hub()
+    hub.on_persist = minimap.changed
+    await hub.start()
+    etags = {key: minimap.etag(*key) for key in minimap.tiles}
+    painted = random.sample(cids, min(args.paint, len(cids)))
+    color = make_color(3, 3, 0)
+    for cid in painted:
+        board = await hub._ensure_chunk(cid)
+        board.numpy()[:H // 2, :W // 2] = color
+        hub._mark_dirty(cid)
+    await hub.flush()
+    t0 = time.perf_counter()
+    await minimap.refresh()
+    dt = time.perf_counter() - t0
+    hit = set()
+    for cid in painted:
+        cx, cy = coords_from_chunk_id(cid)
+        for s in minimap.levels:
+            k = TILE // (W // s)
+            hit.add((s, cx // k, cy // k))
+    changed = {key for key, tag in etags.items() if minimap.etag(*key) != tag}
+    print(f"  refresh    {dt * 1000:7.1f} ms for {len(painted)} chunks  "
+          f"{len(changed)} tiles changed, only painted ones: {changed <= hit}  "
+          f"pixels match: {check(minimap, painted)}")
+
+    etags = {key: minimap.etag(*key) for key in minimap.tiles}
+    minimap.changed(painted)    # persisted again, same content
+    await minimap.refresh()
+    same = all(minimap.etag(*key) == tag for key, tag in etags.items())
+
+    key = sorted(hit)[0]
+    t0 = time.perf_counter()
+    png = minimap.png(*key)
+    encode = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    minimap.png(*key)
+    cached = time.perf_counter() - t0
+    print(f"  png        {encode * 1000:7.2f} ms to encode ({len(png)} bytes), "
+          f"{cached * 1e6:.1f} µs cached; ETags kept on an identical redraw: {same}")
+
+    await hub.stop()
+    store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
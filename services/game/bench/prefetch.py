@@ -0,0 +1,79 @@
+"""
+Border crossings with and without neighbour prefetch (GAME_PREFETCH_CELLS).
+
+Each player walks straight right along its own row of stored, painted
+chunks – every 64 steps a crossing into a chunk that is not resident yet –
+moving every --step-ms like a player holding a key. Reports how long the
+crossing waited for the target chunk and how often it was already there.
+Runs in a scratch data dir. Run from services/:
+
+    python -m game.bench.prefetch [--players 32] [--chunks 12] [--step-ms 5]
+"""
+import argparse, asyncio, os, sys, tempfile, time
+
+if __name__ == "__main__":
+    sys.path[:] = [os.path.abspath(p) for p in sys.path]
+    os.chdir(tempfile.mkdtemp(prefix="prefetch-bench-"))
+
+import numpy as np
+import torch
+
+from .. import hub as hub_mod
+from ..hub import Hub
+from ..ids import chunk_id_from_coords
+from ..storage import store
+from ..settings import W, H
+from .shards import Sink
+
+
+async def seed(players: int, chunks: int) -> None:
+    rng = np.random.default_rng(3)
+    items = []
+    for p in range(players):
+        for x in range(chunks + 1):
+            board = rng.integers(0, 64, (H, W), dtype=np.uint8) << 2   # noisy: zlib, slowest to decode
+            items.append((chunk_id_from_coords(x, p), torch.from_numpy(board)))
+    await store.save_chunks(items)
+
+
+async def walk(hub: Hub, ws: Sink, steps: int, step_s: float) -> None:
+    for _ in range(steps):
+        await hub.handle(ws, "right")
+        await asyncio.sleep(step_s)
+
+
+async def run(cells: int, players: int, chunks: int, step_s: float) -> dict:
+    hub_mod.PREFETCH_CELLS = cells
+    hub = Hub()
+    await hub.start()
+    sinks = [Sink() for _ in range(players)]
+    for p, ws in enumerate(sinks):
+        await hub.connect(ws, "bin", chunk_id_from_coords(0, p))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(walk(hub, ws, chunks * W, step_s) for ws in sinks))
+    elapsed = time.perf_counter() - t0
+    out = {"prefetch_cells": cells, "elapsed_s": round(elapsed, 2), **hub.prefetch_stats.as_dict()}
+    for ws in sinks:
+        await hub.disconnect(ws)
+    await hub.stop()
+    return out
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=32)
+    ap.add_argument("--chunks", type=int, default=12, help="chunks each player walks through")
+    ap.add_argument("--step-ms", type=float, default=5)
+    args = ap.parse_args()
+
+    await seed(args.players, args.chunks)
+    for cells in (0, hub_mod.PREFETCH_CELLS or 8):
+        r = await run(cells, args.players, args.chunks, args.step_ms / 1000)
+        print(f"  prefetch {r['prefetch_cells']:2d} cells: {r['crossings']} crossings, "
+              f"hit rate {r['hit_rate']:.1%} (late {r['late']}, misses {r['misses']}), "
+              f"wait avg {r['wait_ms_avg']:.3f} ms max {r['wait_ms_max']:.3f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
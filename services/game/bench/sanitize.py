@@ -0,0 +1,78 @@
+"""
+Startup sanitizer: the old fetchall + UPDATE-per-chunk loop (kept below as
+the reference) vs ChunkDB.clear_player_bits_all, on a scratch world where
+a few chunks still carry player bits. Reports time and peak Python heap
+(tracemalloc) and checks both leave identical data. Run from services/:
+
+    python -m game.bench.sanitize [--chunks 20000] [--dirty 0.01]
+"""
+import argparse, random, shutil, tempfile, time, tracemalloc
+from pathlib import Path
+import numpy as np
+import torch
+
+from .. import codec
+from ..db import ChunkDB
+from ..settings import W, H
+
+
+def ref_clear_player_bits_all(db: ChunkDB) -> None:
+    cur = db.conn.execute("SELECT cx, cy, enc, data FROM chunks")
+    rows = cur.fetchall()
+    now = int(time.time())
+    for cx, cy, enc, blob in rows:
+        arr = codec.decode(enc, blob)
+        arr &= 0xFE
+        enc, blob = codec.encode(arr)
+        db.conn.execute("UPDATE chunks SET enc=?, data=?, last_used=? WHERE cx=? AND cy=?", (enc, blob, now, cx, cy))
+
+
+def build(path: Path, chunks: int, dirty: float) -> None:
+    db = ChunkDB(path)
+    rng = np.random.default_rng(1)
+    items = []
+    for i in range(chunks):
+        board = rng.integers(0, 256, (H, W), dtype=np.uint8) & 0xFC   # ground only
+        if random.random() < dirty:
+            board[rng.integers(0, H), rng.integers(0, W)] |= 1         # stale player
+        items.append((f"{i},0", torch.from_numpy(board)))
+        if len(items) == 1000:
+            db.save_chunks(items)
+            items = []
+    db.save_chunks(items)
+    db.conn.close()
+
+
+def measure(label: str, fn) -> None:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<10} {dt:8.3f}s  peak heap {peak / 2**20:8.1f} MiB", out if out is not None else "")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=20000)
+    ap.add_argument("--dirty", type=float, default=0.01, help="fraction of chunks with a stale player")
+    args = ap.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="sanitize-bench-"))
+    random.seed(0)
+    build(tmp / "a.db", args.chunks, args.dirty)
+    shutil.copyfile(tmp / "a.db", tmp / "b.db")
+    print(f"{args.chunks} chunks, {args.dirty:.1%} with player bits")
+
+    ref, new = ChunkDB(tmp / "a.db"), ChunkDB(tmp / "b.db")
+    measure("reference", lambda: ref_clear_player_bits_all(ref))
+    measure("streaming", lambda: "scanned/rewritten=%d/%d" % new.clear_player_bits_all())
+
+    a = ref.conn.execute("SELECT cx, cy, enc, data FROM chunks ORDER BY cx, cy").fetchall()
+    b = new.conn.execute("SELECT cx, cy, enc, data FROM chunks ORDER BY cx, cy").fetchall()
+    print("  identical:", a == b)
+
+
+if __name__ == "__main__":
+    main()
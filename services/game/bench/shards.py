@@ -0,0 +1,113 @@
+"""
+Sharding throughput: actions/s for 0 (one in-process Hub) and 1..N worker
+processes, driven through the same connect/handle API the web endpoint uses.
+
+Every player spawns in its own chunk, spread over many shard regions, and
+presses "color" M times with at most WINDOW presses unanswered; each press
+comes back as one delta, so the run ends when every delta has arrived.
+A second phase random-walks the players across chunk borders (handoffs) and
+checks that no player was lost or duplicated. Runs in a scratch data dir.
+Run from services/:
+
+    python -m game.bench.shards [--players 64] [--presses 500] [--max-shards 4]
+"""
+import argparse, asyncio, os, random, sys, tempfile, time
+
+# scratch world: settings.py puts data/ under the cwd. Spawned workers
+# inherit the cwd and re-import this module as __mp_main__ – only once here.
+if __name__ == "__main__":
+    sys.path[:] = [os.path.abspath(p) for p in sys.path]
+    os.chdir(tempfile.mkdtemp(prefix="shard-bench-"))
+
+from ..ids import chunk_id_from_coords
+from ..hub import Hub, MOVES
+from ..shard import ShardRouter
+from ..storage import store
+from ..settings import SHARD_REGION
+
+WINDOW = 16
+
+
+class Sink:
+    """Fake WebSocket that counts the frames it is sent."""
+    def __init__(self) -> None:
+        self.frames = 0
+        self.changed = asyncio.Event()
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.frames += 1
+        self.changed.set()
+
+    send_text = send_bytes
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+    async def wait_for(self, frames: int) -> None:
+        while self.frames < frames:
+            self.changed.clear()
+            await self.changed.wait()
+
+
+async def press(world, ws: Sink, presses: int) -> None:
+    await ws.wait_for(1)   # join snapshot
+    for i in range(presses):
+        await ws.wait_for(1 + i + 1 - WINDOW)
+        await world.handle(ws, "color")
+    await ws.wait_for(1 + presses)
+
+
+async def walk(world, ws: Sink, steps: int) -> None:
+    for _ in range(steps):
+        await world.handle(ws, random.choice(list(MOVES)))
+        await asyncio.sleep(0)
+
+
+async def run(shards: int, players: int, presses: int, steps: int) -> dict:
+    world = ShardRouter(shards) if shards else Hub()
+    await world.start()
+    sinks = [Sink() for _ in range(players)]
+    for i, ws in enumerate(sinks):
+        # one chunk per player, SHARD_REGION+1 apart so neighbours land in other regions
+        await world.connect(ws, "bin", chunk_id_from_coords(i * (SHARD_REGION + 1), 0))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(press(world, ws, presses) for ws in sinks))
+    elapsed = time.perf_counter() - t0
+
+    result = {"shards": shards, "actions_per_s": round(players * presses / elapsed)}
+    if shards and steps:
+        # players near region borders cross back and forth
+        await asyncio.gather(*(walk(world, ws, steps) for ws in sinks))
+        await asyncio.sleep(2.5)   # let handoffs settle and stats arrive
+        st = world.stats()["shards"]
+        held = sum(w.get("outbox", {}).get("clients", 0) for w in st["workers"])
+        result.update(handoffs=st["handoffs"], refused=st["handoffs_refused"],
+                      players_on_shards=held, ok=held == players and st["in_transit"] == 0)
+
+    for ws in sinks:
+        await world.disconnect(ws)
+    await world.stop()
+    return result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--players", type=int, default=64)
+    ap.add_argument("--presses", type=int, default=500)
+    ap.add_argument("--steps", type=int, default=400, help="random-walk steps per player (handoff check)")
+    ap.add_argument("--max-shards", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    print(f"cpus={os.cpu_count()} players={args.players} presses={args.presses}")
+    base = None
+    for n in range(0, args.max_shards + 1):
+        res = asyncio.run(run(n, args.players, args.presses, args.steps))
+        base = base or res["actions_per_s"]
+        print(f"  {n or 'in-process':>10}  {res['actions_per_s']:>8} actions/s  ×{res['actions_per_s'] / base:.2f}",
+              {k: v for k, v in res.items() if k not in ("shards", "actions_per_s")} or "")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
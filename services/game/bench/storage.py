@@ -0,0 +1,123 @@
+"""
+Chunk storage: the legacy layout (TEXT id, w/h columns, raw blob, zero
+chunks written out – kept below as the reference) vs the current schema
+(integer (cx, cy) key, RLE/zlib blobs, no rows for empty chunks) vs the
+memory-mapped region files (GAME_STORAGE=regions).
+
+The synthetic world mixes chunks that were only walked through (empty),
+painted chunks (a few solid strokes) and noisy ones (every cell a random
+color). Reports size on disk and save/load latency, then migrates the
+legacy DB in place and checks every chunk reads back unchanged.
+Run from services/:
+
+    python -m game.bench.storage [--chunks 5000] [--empty 0.6] [--noisy 0.1]
+"""
+import argparse, os, random, sqlite3, tempfile, time
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import torch
+
+from ..db import ChunkDB
+from ..regions import RegionDB
+from ..ids import chunk_id_from_coords
+from ..settings import W, H
+
+
+class LegacyDB:
+    def __init__(self, path: Path) -> None:
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE chunks (id TEXT PRIMARY KEY, w INTEGER NOT NULL, h INTEGER NOT NULL, data BLOB NOT NULL, last_used INTEGER)")
+
+    def save_chunks(self, items) -> None:
+        now = int(time.time())
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "INSERT INTO chunks VALUES (?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET data=excluded.data, last_used=excluded.last_used",
+            [(cid, W, H, t.numpy().tobytes(), now) for cid, t in items],
+        )
+        self.conn.execute("COMMIT")
+
+    def load_chunk(self, cid: str):
+        row = self.conn.execute("SELECT data, w, h FROM chunks WHERE id=?", (cid,)).fetchone()
+        if not row:
+            return None
+        return torch.tensor(np.frombuffer(row[0], dtype=np.uint8).reshape(row[2], row[1]))
+
+    def list_chunk_ids(self) -> List[str]:
+        return [r[0] for r in self.conn.execute("SELECT id FROM chunks")]
+
+
+def world(chunks: int, empty: float, noisy: float) -> Dict[str, torch.Tensor]:
+    rng = np.random.default_rng(7)
+    out = {}
+    side = int(chunks ** 0.5) + 1
+    for i in range(chunks):
+        board = np.zeros((H, W), dtype=np.uint8)
+        roll = random.random()
+        if roll >= empty + noisy:            # painted: a few solid strokes
+            for _ in range(rng.integers(1, 6)):
+                r, c = rng.integers(0, H), rng.integers(0, W)
+                board[r:r + rng.integers(1, 8), c:c + rng.integers(4, 40)] = rng.integers(1, 64) << 2
+        elif roll >= empty:                  # noisy
+            board = rng.integers(0, 64, (H, W), dtype=np.uint8) << 2
+        out[chunk_id_from_coords(i % side, i // side)] = torch.from_numpy(board)
+    return out
+
+
+def size_of(path: Path) -> int:
+    """Bytes actually allocated on disk (region files are sparse)."""
+    paths = sorted(path.iterdir()) if path.is_dir() else [path, Path(f"{path}-wal")]
+    return sum(os.stat(p).st_blocks * 512 for p in paths if p.exists())
+
+
+def bench(label: str, db, boards: Dict[str, torch.Tensor], path: Path) -> None:
+    items = list(boards.items())
+    t0 = time.perf_counter()
+    for i in range(0, len(items), 64):       # flusher-sized batches
+        db.save_chunks(items[i:i + 64])
+    save = (time.perf_counter() - t0) / len(items)
+    if hasattr(db, "conn"):
+        db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    sample: List[str] = random.sample(list(boards), min(2000, len(boards)))
+    t0 = time.perf_counter()
+    for cid in sample:
+        db.load_chunk(cid)
+    load = (time.perf_counter() - t0) / len(sample)
+    rows = len(db.list_chunk_ids())
+    print(f"  {label:<8} {size_of(path) / 2**20:8.2f} MiB  {rows:6d} rows  "
+          f"save {save * 1e6:7.1f} µs/chunk  load {load * 1e6:6.1f} µs/chunk")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=5000)
+    ap.add_argument("--empty", type=float, default=0.6)
+    ap.add_argument("--noisy", type=float, default=0.1)
+    args = ap.parse_args()
+
+    random.seed(0)
+    boards = world(args.chunks, args.empty, args.noisy)
+    tmp = Path(tempfile.mkdtemp(prefix="storage-bench-"))
+    print(f"{args.chunks} chunks: {args.empty:.0%} empty, {args.noisy:.0%} noisy, rest painted")
+
+    legacy = LegacyDB(tmp / "legacy.db")
+    bench("legacy", legacy, boards, tmp / "legacy.db")
+    bench("current", ChunkDB(tmp / "current.db"), boards, tmp / "current.db")
+    bench("regions", RegionDB(tmp / "regions"), boards, tmp / "regions")
+
+    legacy.conn.close()
+    t0 = time.perf_counter()
+    migrated = ChunkDB(tmp / "legacy.db")
+    print(f"  migration {time.perf_counter() - t0:.2f}s → {size_of(tmp / 'legacy.db') / 2**20:.2f} MiB")
+    same = all(
+        torch.equal(migrated.load_chunk(cid), t) if t.any() else migrated.load_chunk(cid) is None
+        for cid, t in boards.items()
+    )
+    print("  migrated data identical:", same)
+
+
+if __name__ == "__main__":
+    main()
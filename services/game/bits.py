@@ -1,40 +1,106 @@
-import torch
-from .settings import DTYPE, COLOR_BITS, BIT_IS_PLAYER, BIT_R0, BIT_R1, BIT_G0, BIT_G1, BIT_B0, BIT_B1
+"""
+Per-cell bit kernels (layout in settings.py).
 
-def set_bit(v: torch.Tensor, bit: int, one: bool) -> torch.Tensor:
-    mask = torch.tensor(1 << bit, dtype=DTYPE)
-    return (v | mask) if one else (v & (~mask & torch.tensor(0xFF, dtype=DTYPE)))
+Every operation on a single cell byte is a lookup in a precomputed
+256-entry table. Scalar helpers take and return plain ints (the per-move
+path); the *_arr variants apply the same tables to whole uint8 chunk arrays
+with one NumPy gather.
+"""
+from typing import Optional, Tuple
+import numpy as np
 
-def get_bit(v: torch.Tensor, bit: int) -> torch.Tensor:
+from .settings import COLOR_BITS, BIT_IS_PLAYER, BIT_R0, BIT_R1, BIT_G0, BIT_G1, BIT_B0, BIT_B1
+
+PLAYER_MASK = 1 << BIT_IS_PLAYER
+COLOR_MASK = sum(1 << b for pair in COLOR_BITS.values() for b in pair)
+
+def set_bit(v: int, bit: int, one: bool) -> int:
+    return (v | (1 << bit)) if one else (v & ~(1 << bit) & 0xFF)
+
+def get_bit(v: int, bit: int) -> int:
     return (v >> bit) & 1
 
-def get2(v: torch.Tensor, b0: int, b1: int) -> torch.Tensor:
+def get2(v: int, b0: int, b1: int) -> int:
     return ((v >> b1) & 1) * 2 + ((v >> b0) & 1)
 
-def set2(v: torch.Tensor, b0: int, b1: int, x: int) -> torch.Tensor:
+def set2(v: int, b0: int, b1: int, x: int) -> int:
     x &= 3
-    v = v & (~(torch.tensor((1 << b0) | (1 << b1), dtype=DTYPE)) & torch.tensor(0xFF, dtype=DTYPE))
-    if x & 1: v = v | torch.tensor(1 << b0, dtype=DTYPE)
-    if x & 2: v = v | torch.tensor(1 << b1, dtype=DTYPE)
+    v &= ~((1 << b0) | (1 << b1)) & 0xFF
+    if x & 1: v |= 1 << b0
+    if x & 2: v |= 1 << b1
     return v
 
-def inc_color(v: torch.Tensor) -> torch.Tensor:
+# ── tables (built once at import from the bit helpers above) ─────────────────
+def _inc_color_ref(v: int) -> int:
     for (b0, b1) in COLOR_BITS.values():
-        curr = int(get2(v, b0, b1))
-        v = set2(v, b0, b1, (curr + 1) % 4)
+        v = set2(v, b0, b1, (get2(v, b0, b1) + 1) % 4)
     return v
 
+INC_COLOR      = np.array([_inc_color_ref(v) for v in range(256)], dtype=np.uint8)
+WITH_PLAYER    = np.array([v | PLAYER_MASK for v in range(256)], dtype=np.uint8)
+WITHOUT_PLAYER = np.array([v & ~PLAYER_MASK & 0xFF for v in range(256)], dtype=np.uint8)
+R2 = np.array([get2(v, BIT_R0, BIT_R1) for v in range(256)], dtype=np.uint8)
+G2 = np.array([get2(v, BIT_G0, BIT_G1) for v in range(256)], dtype=np.uint8)
+B2 = np.array([get2(v, BIT_B0, BIT_B1) for v in range(256)], dtype=np.uint8)
+# index r2*16 + g2*4 + b2 → ground byte (no player bit)
+ENCODE_RGB = np.array(
+    [set2(set2(set2(0, BIT_R0, BIT_R1, i >> 4), BIT_G0, BIT_G1, i >> 2), BIT_B0, BIT_B1, i) for i in range(64)],
+    dtype=np.uint8,
+)
+
+# plain-list copies: indexing a list with an int beats a NumPy scalar lookup
+_INC_COLOR  = INC_COLOR.tolist()
+_R2, _G2, _B2 = R2.tolist(), G2.tolist(), B2.tolist()
+_ENCODE_RGB = ENCODE_RGB.tolist()
+
+# ── scalar kernels ───────────────────────────────────────────────────────────
+def inc_color(v: int) -> int:
+    return _INC_COLOR[v]
+
 # ── NEW: compose a pure ground color (no player bit) from 2-bit r/g/b values (0..3)
-def make_color(r2: int, g2: int, b2: int) -> torch.Tensor:
-    v = torch.tensor(0, dtype=DTYPE)
-    v = set2(v, BIT_R0, BIT_R1, r2)
-    v = set2(v, BIT_G0, BIT_G1, g2)
-    v = set2(v, BIT_B0, BIT_B1, b2)
-    return v
+def make_color(r2: int, g2: int, b2: int) -> int:
+    return _ENCODE_RGB[((r2 & 3) << 4) | ((g2 & 3) << 2) | (b2 & 3)]
+
+def decode_rgb(v: int) -> Tuple[int, int, int]:
+    return _R2[v], _G2[v], _B2[v]
 
 # ── NEW: utilities to clear/set only the player bit on an existing byte
-def with_player(v: torch.Tensor) -> torch.Tensor:
-    return set_bit(v, BIT_IS_PLAYER, True)
+def with_player(v: int) -> int:
+    return v | PLAYER_MASK
+
+def without_player(v: int) -> int:
+    return v & ~PLAYER_MASK & 0xFF
+
+def is_player(v: int) -> bool:
+    return bool(v & PLAYER_MASK)
+
+# ── batched kernels (whole uint8 arrays, e.g. board.numpy()) ─────────────────
+def inc_color_arr(a: np.ndarray) -> np.ndarray:
+    return INC_COLOR[a]
+
+def with_player_arr(a: np.ndarray) -> np.ndarray:
+    return WITH_PLAYER[a]
+
+def without_player_arr(a: np.ndarray) -> np.ndarray:
+    return WITHOUT_PLAYER[a]
+
+def decode_rgb_arr(a: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return R2[a], G2[a], B2[a]
+
+def encode_rgb_arr(r2: np.ndarray, g2: np.ndarray, b2: np.ndarray) -> np.ndarray:
+    idx = ((np.asarray(r2, dtype=np.uint8) & 3) << 4) | ((np.asarray(g2, dtype=np.uint8) & 3) << 2) | (np.asarray(b2, dtype=np.uint8) & 3)
+    return ENCODE_RGB[idx]
+
+# ── bulk edit tables (paint.py): byte → byte, applied with one gather ────────
+def recolor_table(color: int, src: Optional[int] = None) -> np.ndarray:
+    """
+    Set the ground color of every non-player byte to `color` (only where it
+    is `src`, if given). Player and link bits are kept; player bytes map to
+    themselves – the ground under a player lives in Hub.underlying_by_ws.
+    """
+    v = np.arange(256, dtype=np.uint8)
+    hit = (v & PLAYER_MASK) == 0
+    if src is not None:
+        hit &= (v & COLOR_MASK) == (src & COLOR_MASK)
+    return np.where(hit, (v & (0xFF ^ COLOR_MASK)) | (color & COLOR_MASK), v).astype(np.uint8)
 
-def without_player(v: torch.Tensor) -> torch.Tensor:
-    return set_bit(v, BIT_IS_PLAYER, False)
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+import torch
+
+from .settings import W, H, CACHE_MAX_CHUNKS, CACHE_MAX_BYTES, SESSION_HISTORY
+
+# Measured sizes of what a resident chunk carries besides its board (Hub):
+SPAWN_INDEX_BYTES = 4 * W * H      # FreeCells: two int16 tables, spawn chunks only
+SNAPSHOT_BYTES = 5 * W * H         # cached JSON matrix, ~4.6 bytes per cell (bin: ~1)
+HISTORY_ENTRY_BYTES = 300          # one (base, version, cells) delta of the resume history
+
+
+def chunk_footprint() -> int:
+    """Upper estimate of the bytes one resident chunk holds: board, spawn index, snapshot, history."""
+    return W * H + SPAWN_INDEX_BYTES + SNAPSHOT_BYTES + SESSION_HISTORY * HISTORY_ENTRY_BYTES
+
+
+def capacity_from_settings() -> int:
+    """Cache capacity in chunks; the byte limit (if set) wins when smaller."""
+    cap = CACHE_MAX_CHUNKS
+    if CACHE_MAX_BYTES > 0:
+        cap = min(cap, max(1, CACHE_MAX_BYTES // chunk_footprint()))
+    return cap
+
+
+class ChunkCache:
+    """
+    Resident chunks in LRU order (oldest first).
+
+    Only get() counts as a use – it is what Hub._ensure_chunk calls. Plain
+    indexing is for internal bookkeeping (flush, eviction) and leaves the
+    order alone. Which chunks may go is Hub's decision (see Hub._evict).
+    """
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._boards: "OrderedDict[str, torch.Tensor]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, cid: str) -> Optional[torch.Tensor]:
+        board = self._boards.get(cid)
+        if board is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._boards.move_to_end(cid)
+        return board
+
+    def __getitem__(self, cid: str) -> torch.Tensor:
+        return self._boards[cid]
+
+    def __setitem__(self, cid: str, board: torch.Tensor) -> None:
+        self._boards[cid] = board
+        self._boards.move_to_end(cid)
+
+    def __contains__(self, cid: str) -> bool:
+        return cid in self._boards
+
+    def __len__(self) -> int:
+        return len(self._boards)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._boards)
+
+    def over_capacity(self) -> int:
+        return len(self._boards) - self.capacity
+
+    def lru(self) -> List[str]:
+        return list(self._boards)
+
+    def evict(self, cid: str) -> torch.Tensor:
+        self.evictions += 1
+        return self._boards.pop(cid)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "resident": len(self._boards),
+            "capacity": self.capacity,
+            "board_bytes": len(self._boards) * W * H,   # Hub.stats adds "bytes", everything resident
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
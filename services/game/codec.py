@@ -0,0 +1,59 @@
+"""
+Chunk blob encodings for the chunks table (db.py).
+
+Each chunk is stored in whichever of these is smallest:
+  RAW  – the H×W bytes as they are
+  RLE  – runs of equal bytes in row-major order, one "<HB" (length, value)
+         pair per run; painted chunks are mostly long runs of one color
+  ZLIB – zlib of the raw bytes; wins on noisy chunks with short runs
+All-zero chunks are not stored at all (see ChunkDB.save_chunks).
+"""
+import zlib
+from typing import Tuple
+import numpy as np
+
+from .settings import W, H
+
+ENC_RAW, ENC_RLE, ENC_ZLIB = 0, 1, 2
+ZLIB_LEVEL = 6
+RLE_ALWAYS = 96   # bytes; below this RLE is used without trying zlib
+
+_RUN = np.dtype([("n", "<u2"), ("v", "u1")])
+
+
+def _rle(flat: np.ndarray, starts: np.ndarray) -> bytes:
+    bounds = np.concatenate(([0], starts, [flat.size]))
+    rle = np.empty(len(bounds) - 1, dtype=_RUN)
+    rle["n"] = np.diff(bounds)
+    rle["v"] = flat[bounds[:-1]]
+    return rle.tobytes()
+
+
+def encode(board: np.ndarray) -> Tuple[int, bytes]:
+    """(encoding, blob) for a uint8 H×W board, whichever encoding is smallest."""
+    flat = board.reshape(-1)
+    starts = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    rle_size = (len(starts) + 1) * _RUN.itemsize
+    if rle_size <= RLE_ALWAYS:
+        return ENC_RLE, _rle(flat, starts)   # a handful of runs: not worth trying zlib
+    raw = flat.tobytes()
+    z = zlib.compress(raw, ZLIB_LEVEL)
+    if rle_size < min(len(z), len(raw)):
+        return ENC_RLE, _rle(flat, starts)
+    if len(z) < len(raw):
+        return ENC_ZLIB, z
+    return ENC_RAW, raw
+
+
+def decode(enc: int, blob: bytes) -> np.ndarray:
+    """Writable uint8 H×W array from an encoded blob."""
+    if enc == ENC_RLE:
+        rle = np.frombuffer(blob, dtype=_RUN)
+        flat = np.repeat(rle["v"], rle["n"])
+    elif enc == ENC_ZLIB:
+        flat = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).copy()
+    elif enc == ENC_RAW:
+        flat = np.frombuffer(blob, dtype=np.uint8).copy()
+    else:
+        raise ValueError(f"unknown chunk encoding {enc}")
+    return flat.reshape(H, W)
@@ -0,0 +1,52 @@
+"""
+Copy a world between storage backends (see GAME_STORAGE in settings.py).
+Run from services/ with the server stopped:
+
+    python -m game.convert --to regions            # data/world.db → data/regions/
+    python -m game.convert --to sqlite             # data/regions/ → data/world.db
+    python -m game.convert --to regions --sqlite other.db --regions /tmp/r
+
+Chunks are copied in batches of --batch; empty chunks are skipped (both
+backends treat a missing chunk as empty). The source is left untouched.
+"""
+import argparse, time
+from pathlib import Path
+
+from .settings import DB_PATH, REGION_DIR
+from .db import ChunkDB
+from .regions import RegionDB
+
+
+def convert(src, dst, batch: int = 256) -> int:
+    cids = src.list_chunk_ids()
+    copied = 0
+    for i in range(0, len(cids), batch):
+        items = []
+        for cid in cids[i:i + batch]:
+            board = src.load_chunk(cid)
+            if board is not None and board.any():
+                items.append((cid, board))
+        dst.save_chunks(items)
+        copied += len(items)
+    return copied
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--to", choices=("regions", "sqlite"), required=True)
+    ap.add_argument("--sqlite", type=Path, default=DB_PATH)
+    ap.add_argument("--regions", type=Path, default=REGION_DIR)
+    ap.add_argument("--batch", type=int, default=256)
+    args = ap.parse_args()
+
+    sqlite, regions = ChunkDB(args.sqlite), RegionDB(args.regions)
+    src, dst = (sqlite, regions) if args.to == "regions" else (regions, sqlite)
+    t0 = time.perf_counter()
+    n = convert(src, dst, args.batch)
+    # a converted world starts unclean: the next start runs the sanitizer
+    dst.set_meta("clean_shutdown", "0")
+    print(f"copied {n} chunks to {args.to} in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,99 +1,281 @@
 import sqlite3, time
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List, Iterable, Tuple, Union
 import numpy as np
 import torch
 
-from .settings import DB_PATH, W, H, DTYPE
+from .settings import DB_PATH, STORAGE, SANITIZE, SANITIZE_BATCH
+from .bits import PLAYER_MASK, without_player_arr
+from .ids import chunk_id_from_coords, coords_from_chunk_id
+from . import codec
+from .regions import RegionDB
+
+SCHEMA_VERSION = 2   # PRAGMA user_version; 0 = legacy chunks(id TEXT, w, h, raw data)
 
 class ChunkDB:
     """
     SQLite persistence for 64x64 uint8 chunks.
     Table:
       chunks(
-        id TEXT PRIMARY KEY,
-        w  INTEGER NOT NULL,
-        h  INTEGER NOT NULL,
+        cx INTEGER NOT NULL,
+        cy INTEGER NOT NULL,
+        enc  INTEGER NOT NULL,     -- codec.ENC_* (raw / RLE / zlib)
         data BLOB NOT NULL,
-        last_used INTEGER
-      )
+        last_used INTEGER,
+        PRIMARY KEY (cx, cy)
+      ) WITHOUT ROWID
+      meta(key TEXT PRIMARY KEY, value TEXT)    -- e.g. clean_shutdown
+    All-zero chunks have no row: a missing chunk *is* an empty chunk.
     """
     def __init__(self, db_path: Path = DB_PATH) -> None:
-        # autocommit so we won't keep long transactions
-        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        # autocommit so we won't keep long transactions; the connection is
+        # driven from the ChunkStore thread (one user at a time)
+        self.conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
         try:
             self.conn.execute("PRAGMA journal_mode=WAL")
         except Exception:
             pass
-        self.conn.execute("""
-        CREATE TABLE IF NOT EXISTS chunks (
-          id TEXT PRIMARY KEY,
-          w INTEGER NOT NULL,
-          h INTEGER NOT NULL,
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._migrate()
+        # GAME_SANITIZE=lazy: stale player bits are stripped as chunks load
+        self.strip_players_on_load = SANITIZE == "lazy"
+        self.chunk_writes = 0   # rows upserted or deleted by save_chunks
+        self.commits = 0
+
+    _CREATE = """
+        CREATE TABLE {name} (
+          cx INTEGER NOT NULL,
+          cy INTEGER NOT NULL,
+          enc INTEGER NOT NULL,
           data BLOB NOT NULL,
-          last_used INTEGER
-        )
-        """)
+          last_used INTEGER,
+          PRIMARY KEY (cx, cy)
+        ) WITHOUT ROWID
+        """
 
-    def save_chunk(self, cid: str, data_t: torch.Tensor) -> None:
-        """Insert/update a chunk row."""
+    def _migrate(self) -> None:
+        """Create the current schema, or convert a legacy `chunks` table in place."""
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        self.conn.execute("BEGIN IMMEDIATE")   # one process migrates, the others wait
+        try:
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                self.conn.execute("COMMIT")
+                return
+            legacy = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='chunks'").fetchone()
+            kept = dropped = 0
+            if legacy:
+                self.conn.execute(self._CREATE.format(name="chunks_v2"))
+                cur = self.conn.cursor()
+                cur.execute("SELECT id, data, last_used FROM chunks")
+                while True:
+                    rows = cur.fetchmany(SANITIZE_BATCH)
+                    if not rows:
+                        break
+                    out = []
+                    for cid, blob, last_used in rows:
+                        arr = np.frombuffer(blob, dtype=np.uint8)
+                        if not arr.any():
+                            dropped += 1
+                            continue
+                        cx, cy = coords_from_chunk_id(cid)
+                        enc, data = codec.encode(arr)
+                        out.append((cx, cy, enc, data, last_used))
+                    self.conn.executemany("INSERT INTO chunks_v2 VALUES (?, ?, ?, ?, ?)", out)
+                    kept += len(out)
+                cur.close()
+                self.conn.execute("DROP TABLE chunks")
+                self.conn.execute("ALTER TABLE chunks_v2 RENAME TO chunks")
+            else:
+                self.conn.execute(self._CREATE.format(name="chunks"))
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        if legacy:
+            self.conn.execute("VACUUM")   # give the old raw rows' pages back
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            print(f"[db] migrated to schema {SCHEMA_VERSION}: {kept} chunks kept, {dropped} empty dropped")
+
+    _UPSERT = """
+        INSERT INTO chunks (cx, cy, enc, data, last_used)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(cx, cy) DO UPDATE SET
+          enc=excluded.enc,
+          data=excluded.data,
+          last_used=excluded.last_used
+        """
+    _DELETE = "DELETE FROM chunks WHERE cx=? AND cy=?"
+
+    @staticmethod
+    def _to_row(cid: str, data_t: torch.Tensor, now: int) -> Optional[tuple]:
+        """Upsert parameters for a chunk, or None if it is all zeros."""
         assert data_t.dtype == torch.uint8
-        # torch -> numpy view (no copy), then bytes
-        arr = data_t.numpy().astype(np.uint8, copy=False)
-        blob = arr.tobytes(order="C")
+        arr = data_t.numpy()   # view, no copy
+        if not arr.any():
+            return None
+        cx, cy = coords_from_chunk_id(cid)
+        enc, blob = codec.encode(arr)
+        return (cx, cy, enc, blob, now)
+
+    def is_mapped(self, cid: str, data_t: torch.Tensor) -> bool:
+        """Boards are always copies of their row (see RegionDB.is_mapped)."""
+        return False
+
+    def save_chunk(self, cid: str, data_t: torch.Tensor) -> None:
+        """Insert/update a chunk row (delete it if the chunk is empty)."""
+        self.save_chunks([(cid, data_t)])
+
+    def save_chunks(self, items: Iterable[Tuple[str, torch.Tensor]]) -> None:
+        """Insert/update many chunk rows in a single transaction; empty chunks are deleted."""
         now = int(time.time())
-        self.conn.execute(
-            """
-            INSERT INTO chunks (id, w, h, data, last_used)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(id) DO UPDATE SET
-              w=excluded.w,
-              h=excluded.h,
-              data=excluded.data,
-              last_used=excluded.last_used
-            """,
-            (cid, W, H, blob, now),
-        )
+        upserts, deletes = [], []
+        for cid, t in items:
+            row = self._to_row(cid, t, now)
+            if row is None:
+                deletes.append(coords_from_chunk_id(cid))
+            else:
+                upserts.append(row)
+        if not upserts and not deletes:
+            return
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(self._UPSERT, upserts)
+            self.conn.executemany(self._DELETE, deletes)
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        self.chunk_writes += len(upserts) + len(deletes)
+        self.commits += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "sqlite", "chunk_writes": self.chunk_writes, "commits": self.commits}
 
     def load_chunk(self, cid: str) -> Optional[torch.Tensor]:
-        """Load a chunk row to torch uint8 tensor HxW, or None if not exists."""
-        cur = self.conn.execute("SELECT data, w, h FROM chunks WHERE id=?", (cid,))
+        """Load a chunk row to torch uint8 tensor HxW, or None if not stored (= empty)."""
+        cur = self.conn.execute("SELECT enc, data FROM chunks WHERE cx=? AND cy=?", coords_from_chunk_id(cid))
         row = cur.fetchone()
         if not row:
             return None
-        blob, w, h = row
-        arr = np.frombuffer(blob, dtype=np.uint8, count=w*h).reshape(h, w)
-        # touch last_used
-        self.conn.execute("UPDATE chunks SET last_used=? WHERE id=?", (int(time.time()), cid))
-        return torch.tensor(arr, dtype=DTYPE)
+        arr = codec.decode(*row)
+        if self.strip_players_on_load:
+            # a chunk is only (re)loaded while nobody stands in it, so any
+            # player bit in the stored blob is left over from a crash
+            arr = without_player_arr(arr)
+        # last_used is bumped on save and when the chunk leaves the cache (touch)
+        return torch.from_numpy(arr)
+
+    def touch(self, cids: Iterable[str]) -> None:
+        """Bump last_used for chunks that were in use but not rewritten."""
+        now = int(time.time())
+        self.conn.executemany(
+            "UPDATE chunks SET last_used=? WHERE cx=? AND cy=?",
+            [(now, *coords_from_chunk_id(cid)) for cid in cids],
+        )
 
     # Optional utilities used by startup sanitizer
     def list_chunk_ids(self) -> List[str]:
-        cur = self.conn.execute("SELECT id FROM chunks")
-        return [r[0] for r in cur.fetchall()]
+        cur = self.conn.execute("SELECT cx, cy FROM chunks")
+        return [chunk_id_from_coords(cx, cy) for cx, cy in cur.fetchall()]
 
-    def clear_player_bits_all(self) -> None:
-        """Clear bit0 (player bit) in every cell of every chunk."""
-        cur = self.conn.execute("SELECT id, data, w, h FROM chunks")
+    def read_chunks(self, cids: Iterable[str]) -> List[Tuple[str, Optional[np.ndarray]]]:
+        """Stored bytes of each chunk as-is (None = not stored), for readers outside the Hub."""
+        out = []
+        for cid in cids:
+            row = self.conn.execute("SELECT enc, data FROM chunks WHERE cx=? AND cy=?", coords_from_chunk_id(cid)).fetchone()
+            out.append((cid, codec.decode(*row) if row else None))
+        return out
+
+    def scan_chunks(self, after: Optional[Tuple[int, int]] = None,
+                    batch: int = SANITIZE_BATCH) -> Tuple[List[Tuple[str, np.ndarray]], Optional[Tuple[int, int]]]:
+        """
+        One page of stored chunks in key order, starting past `after`
+        (None = from the start). Returns (chunks, key to pass next time),
+        the key being None after the last page. Keyset paging: nothing is
+        held open between pages, so writes can go on in between.
+        """
+        if after is None:
+            cur = self.conn.execute("SELECT cx, cy, enc, data FROM chunks ORDER BY cx, cy LIMIT ?", (batch,))
+        else:
+            cur = self.conn.execute(
+                "SELECT cx, cy, enc, data FROM chunks WHERE (cx, cy) > (?, ?) ORDER BY cx, cy LIMIT ?",
+                (*after, batch),
+            )
         rows = cur.fetchall()
+        out = [(chunk_id_from_coords(cx, cy), codec.decode(enc, blob)) for cx, cy, enc, blob in rows]
+        return out, ((rows[-1][0], rows[-1][1]) if len(rows) == batch else None)
+
+    def clear_player_bits_all(self, batch: int = SANITIZE_BATCH) -> Tuple[int, int]:
+        """
+        Clear bit0 (player bit) in every cell of every chunk.
+        Streams the table `batch` rows at a time and only rewrites chunks
+        that have a player bit set, all in one transaction.
+        Returns (chunks scanned, chunks rewritten).
+        """
         now = int(time.time())
-        for cid, blob, w, h in rows:
-            arr = np.frombuffer(blob, dtype=np.uint8).copy()  # copy so we can mutate
-            arr &= 0xFE  # clear bit 0 everywhere
-            new_blob = arr.tobytes(order="C")
-            self.conn.execute(
-                "UPDATE chunks SET data=?, last_used=? WHERE id=?",
-                (new_blob, now, cid),
-            )
+        scanned = rewritten = 0
+        # a second cursor reads while the connection writes inside the transaction
+        cur = self.conn.cursor()
+        self.conn.execute("BEGIN")
+        try:
+            cur.execute("SELECT cx, cy, enc, data FROM chunks")
+            while True:
+                rows = cur.fetchmany(batch)
+                if not rows:
+                    break
+                scanned += len(rows)
+                upserts, deletes = [], []
+                for cx, cy, enc, blob in rows:
+                    arr = codec.decode(enc, blob)
+                    if not (arr & PLAYER_MASK).any():
+                        continue
+                    row = self._to_row(chunk_id_from_coords(cx, cy), torch.from_numpy(without_player_arr(arr)), now)
+                    if row is None:
+                        deletes.append((cx, cy))
+                    else:
+                        upserts.append(row)
+                self.conn.executemany(self._UPSERT, upserts)
+                self.conn.executemany(self._DELETE, deletes)
+                rewritten += len(upserts) + len(deletes)
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            cur.close()
+        self.conn.execute("COMMIT")
+        return scanned, rewritten
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, value),
+        )
+
+def open_backend(kind: str = STORAGE) -> Union[ChunkDB, RegionDB]:
+    """The chunk store named by GAME_STORAGE ("sqlite" or "regions")."""
+    if kind == "regions":
+        return RegionDB()
+    if kind == "sqlite":
+        return ChunkDB()
+    raise ValueError(f"unknown GAME_STORAGE {kind!r}")
 
 # Singleton-ish instance and thin wrappers (keeps old API)
-_db = ChunkDB()
+_db = open_backend()
 
 def save_chunk(cid: str, data: torch.Tensor) -> None:
     _db.save_chunk(cid, data)
 
+def save_chunks(items: Iterable[Tuple[str, torch.Tensor]]) -> None:
+    _db.save_chunks(items)
+
 def load_chunk(cid: str) -> Optional[torch.Tensor]:
     return _db.load_chunk(cid)
 
-def clear_player_bits_all() -> None:
-    _db.clear_player_bits_all()
+def clear_player_bits_all() -> Tuple[int, int]:
+    return _db.clear_player_bits_all()
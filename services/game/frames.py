@@ -0,0 +1,118 @@
+"""
+Outgoing chunk frames.
+
+A client picks its wire format once, at /ws connect (?fmt=...):
+  "json"  – text frames, the original protocol (default, old clients)
+  "bin"   – binary frames
+  "binz"  – binary frames, snapshots deflate-compressed
+
+Binary layout (little endian):
+  header  <B B i i I>   type, flags, cx, cy, version
+  matrix  body = H*W uint8 cells, row-major (zlib stream if FLAG_ZLIB)
+  delta   body = <I base> + n × <H idx, B value>   (idx = r*W + c)
+  view    no body; cx, cy = centre chunk, version = radius
+  ack     body = <I dropped>; cx = cy = 0, version = seq   (see inputs.py)
+  session body = resume token (ASCII); cx = cy = 0, version = grace seconds
+
+A "view" frame (Hub.set_view) tells a client which chunks it now watches:
+every chunk within `radius` of the centre in both axes. Chunks outside it
+get no more frames and can be dropped.
+
+A "session" frame (sessions.py) hands the client the token to reconnect
+with within the grace period, along with the chunk versions it holds:
+/ws?resume=<token>&seen=<cx>,<cy>:<version>;<cx>,<cy>:<version>...
+
+Frames are encoded once per broadcast and the same object is sent to every
+watcher using that format.
+"""
+
+import json, struct, zlib
+from typing import Dict, Optional, Union
+import torch
+
+from .settings import W, H
+from .ids import coords_from_chunk_id
+
+Frame = Union[str, bytes]
+
+FORMATS = ("json", "bin", "binz")
+
+T_MATRIX = 1
+T_DELTA  = 2
+T_VIEW   = 3
+T_ACK    = 4
+T_SESSION = 5
+
+FLAG_ZLIB = 1
+
+HEADER = struct.Struct("<BBiiI")
+DELTA_BASE = struct.Struct("<I")
+DELTA_CELL = struct.Struct("<HB")
+ACK_DROPPED = struct.Struct("<I")
+
+ZLIB_LEVEL = 1  # snapshots are mostly runs of zeros; level 1 already gets most of it
+
+
+def parse_format(fmt: Optional[str]) -> str:
+    fmt = (fmt or "json").lower()
+    return fmt if fmt in FORMATS else "json"
+
+
+def encode_matrix(fmt: str, cid: str, version: int, board: torch.Tensor) -> Frame:
+    if fmt == "json":
+        return json.dumps({
+            "type": "matrix",
+            "w": W, "h": H,
+            "data": board.flatten().tolist(),
+            "chunk_id": cid,
+            "version": version,
+        })
+    cx, cy = coords_from_chunk_id(cid)
+    body = board.numpy().tobytes(order="C")
+    flags = 0
+    if fmt == "binz":
+        body = zlib.compress(body, ZLIB_LEVEL)
+        flags |= FLAG_ZLIB
+    return HEADER.pack(T_MATRIX, flags, cx, cy, version) + body
+
+
+def encode_delta(fmt: str, cid: str, base: int, version: int, cells: Dict[int, int]) -> Frame:
+    if fmt == "json":
+        return json.dumps({
+            "type": "delta",
+            "chunk_id": cid,
+            "base": base,
+            "version": version,
+            "cells": [[i // W, i % W, v] for i, v in cells.items()],
+        })
+    cx, cy = coords_from_chunk_id(cid)
+    parts = [HEADER.pack(T_DELTA, 0, cx, cy, version), DELTA_BASE.pack(base)]
+    parts.extend(DELTA_CELL.pack(i, v) for i, v in cells.items())
+    return b"".join(parts)
+
+
+def encode_view(fmt: str, cid: str, radius: int) -> Frame:
+    if fmt == "json":
+        return json.dumps({"type": "view", "chunk_id": cid, "r": radius})
+    cx, cy = coords_from_chunk_id(cid)
+    return HEADER.pack(T_VIEW, 0, cx, cy, radius)
+
+
+def encode_ack(fmt: str, seq: int, dropped: int) -> Frame:
+    if fmt == "json":
+        return json.dumps({"type": "ack", "seq": seq, "dropped": dropped})
+    return HEADER.pack(T_ACK, 0, 0, 0, seq) + ACK_DROPPED.pack(dropped)
+
+
+
+def encode_session(fmt: str, token: str, grace_s: float) -> Frame:
+    if fmt == "json":
+        return json.dumps({"type": "session", "token": token, "grace_s": grace_s})
+    return HEADER.pack(T_SESSION, 0, 0, 0, int(grace_s)) + token.encode("ascii")
+
+
+def is_snapshot(frame: Frame) -> bool:
+    """Whether an encoded frame is a matrix (shard.py tells snapshots from deltas without decoding)."""
+    if isinstance(frame, bytes):
+        return frame[0] == T_MATRIX
+    return frame.startswith('{"type": "matrix"')
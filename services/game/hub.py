@@ -1,57 +1,459 @@
-import asyncio, json, random
-from typing import Dict, Tuple, Set, Optional
+import asyncio, itertools, random, time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Sequence, Tuple, Set, Optional
+import numpy as np
 import torch
 from fastapi import WebSocket
 
-from .settings import W, H, DTYPE, BIT_IS_PLAYER
-from .bits import set_bit, get_bit, inc_color, make_color, with_player, without_player
+from .settings import W, H, DTYPE, FLUSH_INTERVAL_MS, FLUSH_MAX_CHANGES, TICK_HZ, TICK_MAX_INTENTS, JOURNAL
+from .settings import PREFETCH_CELLS, PREFETCH_MAX_INFLIGHT, VIEW_MAX_RADIUS, SESSION_GRACE_S, SESSION_HISTORY
+from .bits import inc_color, make_color, with_player, without_player, is_player
 from .ids import chunk_id_from_coords, coords_from_chunk_id
-from .db import save_chunk, load_chunk
+from .storage import store
+from .journal import Journal
+from .cache import ChunkCache, HISTORY_ENTRY_BYTES, capacity_from_settings
+from .locks import LockTable
+from .outbox import Outbox, OutboxStats
+from .tick import TickStats
+from .prefetch import PrefetchStats
+from .occupancy import FreeCells, spiral
+from .paint import Fill, BATCH_CHUNKS
+from .frames import Frame, DELTA_CELL, encode_matrix, encode_delta, encode_view, encode_ack, encode_session
+from .sessions import Sessions
+from .metrics import BROADCAST, ENCODE, FILL, FLUSH, INPUT, collect, counter, distribution, gauge
+
+MOVES = {"up": (-1, 0), "down": (+1, 0), "left": (0, -1), "right": (0, +1)}
+WATCHER_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
 
 class Hub:
     """
     Infinite world of 64×64 chunks.
     Player color is fixed for the whole session.
     Pressing "C" paints the ground color of the current cell (persists in the board).
+
+    In sharded mode (shard.py) a Hub only owns part of the world: `owns`
+    says which chunks, and a move into a chunk it does not own is passed to
+    `handoff(ws, cid, r, c)` instead of being applied here.
     """
-    def __init__(self) -> None:
-        self.chunks: Dict[str, torch.Tensor] = {}         # cid -> tensor(H,W)
+    def __init__(
+        self,
+        owns: Optional[Callable[[str], bool]] = None,
+        handoff: Optional[Callable[[WebSocket, str, int, int], None]] = None,
+    ) -> None:
+        self.chunks = ChunkCache(capacity_from_settings())  # cid -> tensor(H,W), LRU
         self.watchers: Dict[str, Set[WebSocket]] = {}     # cid -> set(ws)
 
+        # Area of interest: a socket watches its own chunk plus, once it asked
+        # for a view radius, every chunk within it. `watchers` is the shared
+        # index a broadcast walks; `viewing` is the same thing per socket.
+        self.view_by_ws: Dict[WebSocket, int] = {}        # radius asked for
+        self.viewing: Dict[WebSocket, Set[str]] = {}      # ws -> cids it watches
+        self._view_tasks: Dict[WebSocket, asyncio.Task] = {}
+
+        # Delta protocol: every published change bumps the chunk version;
+        # cells written since the last publish wait in `changes`.
+        self.versions: Dict[str, int] = {}                # cid -> version
+        self.changes: Dict[str, Dict[int, int]] = {}      # cid -> {r*W+c: byte}
+        # the last SESSION_HISTORY published deltas, (base, version, cells),
+        # so a resumed session catches up without a snapshot
+        self.history: Dict[str, Deque[Tuple[int, int, Dict[int, int]]]] = {}
+        # snapshots of the current version, encoded once per format
+        self._snapshots: Dict[str, Dict[str, Frame]] = {}
+
+        # Spectators (/spectate): read-only sockets subscribed to any chunks.
+        # No player, no locks, no per-socket versions – they are sent every
+        # frame of a chunk from a snapshot on, all of them shared encodings.
+        self.spectators: Dict[str, Set[WebSocket]] = {}   # cid -> spectator sockets
+        self.spectating: Dict[WebSocket, Set[str]] = {}   # spectator -> cids
+
+        # Write-behind: chunks changed since the last flush (see settings.py);
+        # with GAME_JOURNAL every cell write is also recorded in the journal
+        self.dirty: Set[str] = set()
+        self.journal: Optional[Journal] = Journal() if JOURNAL else None
+        self._dirty_marks = 0
+        self._flush_now = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._loading: Dict[str, asyncio.Task] = {}       # cid -> in-flight load
+        self.free: Dict[str, FreeCells] = {}              # cid -> empty cells, built by the first spawn there
+        self._evicting: Optional[asyncio.Task] = None
+        self._flushing: Dict[str, int] = {}   # cid -> flush writes in flight with its snapshot
+        self.fill_cells = 0                   # cells changed by bulk fills (/metrics)
+        # called with the cids of every batch of chunks written to the store
+        # (minimap.py redraws them); journal mode only writes at checkpoints
+        self.on_persist: Optional[Callable[[List[str]], None]] = None
+        self._prefetching: Set[str] = set()               # cids loading ahead of a crossing
+        self.prefetch_stats = PrefetchStats()
+
         self.root_cid = chunk_id_from_coords(0, 0)
-        self._ensure_chunk(self.root_cid)
 
         self.sockets: Set[WebSocket] = set()
         self.pos_by_ws: Dict[WebSocket, Tuple[str, int, int]] = {}
-        self.val_by_ws: Dict[WebSocket, torch.Tensor] = {}  # kept for compatibility (unused for color logic)
+        self.val_by_ws: Dict[WebSocket, int] = {}  # kept for compatibility (unused for color logic)
         # NEW:
-        self.player_color: Dict[WebSocket, torch.Tensor] = {}     # fixed color (no player bit)
-        self.underlying_by_ws: Dict[WebSocket, torch.Tensor] = {} # ground byte under the player (no player bit)
+        self.player_color: Dict[WebSocket, int] = {}              # fixed color (no player bit)
+        self.underlying_by_ws: Dict[WebSocket, int] = {}          # ground byte under the player (no player bit)
+        self.seen_version: Dict[WebSocket, Dict[str, int]] = {}   # cid -> last version the client holds
+        self.fmt_by_ws: Dict[WebSocket, str] = {}                 # wire format, see frames.py
+        self.outbox: Dict[WebSocket, Outbox] = {}                 # per-client send queue
+        self.outbox_stats = OutboxStats()
+
+        # Tick mode (TICK_HZ > 0): intents wait here and every publish is
+        # deferred to the end of the tick (one broadcast per changed chunk).
+        self.seq_by_ws: Dict[WebSocket, int] = {}          # join order
+        self._join_seq = itertools.count()
+        self._intents: Dict[WebSocket, List[str]] = {}
+        self._touched: Set[str] = set()
+        self._ticker: Optional[asyncio.Task] = None
+        self.tick_stats = TickStats()
 
-        self.lock = asyncio.Lock()
+        # one lock per chunk (see LockTable); a border crossing holds two
+        self.locks = LockTable()
+
+        # Sharding: players waiting for another shard to accept them
+        self.owns: Callable[[str], bool] = owns or (lambda cid: True)
+        self._handoff = handoff
+        self._leaving: Set[WebSocket] = set()
+
+        # Resumable sessions (sessions.py): a dropped player stays on its cell
+        # and keeps its watches, only its outbox is gone. With shards the
+        # front holds sessions instead (ShardRouter), so workers issue none.
+        self.sessions: Optional[Sessions] = (
+            Sessions(SESSION_GRACE_S, self.disconnect) if SESSION_GRACE_S > 0 and handoff is None else None
+        )
 
     # ── chunks ────────────────────────────────────────────────────────────────
-    def _ensure_chunk(self, cid: str) -> torch.Tensor:
-        if cid in self.chunks:
-            return self.chunks[cid]
-        loaded = load_chunk(cid)
+    async def _ensure_chunk(self, cid: str) -> torch.Tensor:
+        board = self.chunks.get(cid)
+        if board is not None:
+            return board
+        board = await asyncio.shield(self._start_load(cid))
+        if self.chunks.over_capacity() > 0:
+            self._schedule_evict()
+        return board
+
+    def _start_load(self, cid: str) -> asyncio.Future:
+        # one load per chunk even if several coroutines ask at once
+        task = self._loading.get(cid)
+        if task is None:
+            task = self._loading[cid] = asyncio.ensure_future(self._load_chunk(cid))
+            task.add_done_callback(lambda _: self._loading.pop(cid, None))
+        return task
+
+    async def _load_chunk(self, cid: str) -> torch.Tensor:
+        loaded = await store.load_chunk(cid)
         if loaded is None:
+            # not stored = empty; it only gets a row once something is drawn
             loaded = torch.zeros((H, W), dtype=DTYPE)
-            save_chunk(cid, loaded)
         self.chunks[cid] = loaded
         self.watchers.setdefault(cid, set())
+        # back after an eviction: its version starts over, so spectators need it whole
+        for s in self.spectators.get(cid, ()):
+            self.outbox[s].push(cid, self._encoded_snapshot(cid, self.fmt_by_ws[s]), snapshot=True)
         return loaded
 
-    def _is_empty(self, board: torch.Tensor, r: int, c: int) -> bool:
-        return int(get_bit(board[r, c], BIT_IS_PLAYER)) == 0
+    def _prefetch_near(self, cid: str, r: int, c: int) -> None:
+        """
+        Start loading the chunk across any edge within PREFETCH_CELLS of
+        (r, c), so that crossing it later finds the chunk resident. Fire
+        and forget; past PREFETCH_MAX_INFLIGHT loads new ones are skipped,
+        not queued – the player has usually moved on by then.
+        """
+        k = PREFETCH_CELLS
+        if k <= 0:
+            return
+        for direction, near in (("up", r < k), ("down", r >= H - k), ("left", c < k), ("right", c >= W - k)):
+            if not near:
+                continue
+            ncid = self.neighbor_cid(cid, direction)
+            if ncid in self.chunks or ncid in self._loading or not self.owns(ncid):
+                continue
+            if len(self._prefetching) >= PREFETCH_MAX_INFLIGHT:
+                self.prefetch_stats.skipped += 1
+                return
+            self._prefetching.add(ncid)
+            self.prefetch_stats.issued += 1
+            self._start_load(ncid).add_done_callback(lambda t, ncid=ncid: self._prefetched(ncid, t))
+
+    def _prefetched(self, cid: str, task: asyncio.Future) -> None:
+        self._prefetching.discard(cid)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.prefetch_stats.failed += 1
+            print(f"[hub] prefetch {cid} failed: {task.exception()!r}")
+        elif self.chunks.over_capacity() > 0:
+            self._schedule_evict()
+
+    def _schedule_load(self, cid: str) -> None:
+        # fire and forget, for spectators of an evicted chunk: _load_chunk sends it
+        if cid not in self.chunks and cid not in self._loading:
+            self._start_load(cid).add_done_callback(lambda t: self._loaded_for_spectators(cid, t))
+
+    def _loaded_for_spectators(self, cid: str, task: asyncio.Future) -> None:
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            print(f"[hub] load {cid} for spectators failed: {task.exception()!r}")
+        elif self.chunks.over_capacity() > 0:
+            self._schedule_evict()
+
+    def _schedule_evict(self) -> None:
+        # run as its own task: by the time it runs, whoever asked for the
+        # new chunk has attached to it (watcher / pending change)
+        if self._evicting is None or self._evicting.done():
+            self._evicting = asyncio.create_task(self._evict())
+
+    async def _evict(self) -> None:
+        """
+        Drop least-recently-used chunks nobody is watching until the cache
+        is back under capacity. Dirty victims are written out first; a
+        later _ensure_chunk reloads them from the store.
+        """
+        over = self.chunks.over_capacity()
+        if over <= 0:
+            return
+        victims = []
+        for cid in self.chunks.lru():
+            if len(victims) >= over:
+                break
+            # spectators do not pin a chunk: _load_chunk sends them the reload
+            if (cid == self.root_cid or self.watchers.get(cid)
+                    or cid in self.changes or self.locks.in_use(cid) or cid in self._flushing):
+                continue
+            victims.append(cid)
+
+        # detach synchronously so nothing can touch a victim mid-write
+        dirty, clean = [], []
+        for cid in victims:
+            board = self.chunks.evict(cid)
+            self.watchers.pop(cid, None)
+            self.versions.pop(cid, None)
+            self.history.pop(cid, None)
+            self._snapshots.pop(cid, None)
+            self.free.pop(cid, None)
+            self.locks.forget(cid)
+            if cid in self.dirty:
+                self.dirty.discard(cid)
+                dirty.append((cid, board))
+            else:
+                clean.append(cid)
+        try:
+            if dirty:
+                await store.save_chunks(dirty)
+                self._persisted([cid for cid, _ in dirty])
+            if clean:
+                await store.touch(clean)
+        except Exception as e:
+            print(f"[hub] evict failed: {e!r}")
+            for cid, board in dirty:   # take them back unless reloaded meanwhile
+                if cid not in self.chunks:
+                    self.chunks[cid] = board
+                    self.watchers.setdefault(cid, set())
+                    self._mark_dirty(cid)
+
+    def _mark_dirty(self, cid: str) -> None:
+        self.dirty.add(cid)
+        self._dirty_marks += 1
+        if FLUSH_INTERVAL_MS <= 0 or self._dirty_marks >= FLUSH_MAX_CHANGES:
+            self._flush_now.set()
+
+    async def flush(self, checkpoint: bool = False) -> None:
+        """
+        Persist what changed since the last call, off the event loop: every
+        dirty chunk in one transaction – or, in journal mode, only the new
+        journal records, plus a checkpoint of the dirty chunks when one is
+        due (or `checkpoint` is set), which also empties the log.
+        """
+        journal = self.journal
+        if journal is not None and not (checkpoint or journal.checkpoint_due()):
+            data = journal.take()
+            if data:
+                try:
+                    await asyncio.shield(store.append_journal(journal, data))
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    journal.restore(data)
+                    raise
+            return
+        if not self.dirty and (journal is None or not journal.size):
+            if journal is not None:
+                journal.last_checkpoint = time.monotonic()
+            return
+        cids, self.dirty = self.dirty, set()
+        self._dirty_marks = 0
+        covered = journal.take() if journal is not None else b""   # the snapshots include these
+        try:
+            # snapshotted right here by the store call; shield so a
+            # cancelled flusher still lets the queued write finish
+            boards = [(cid, self.chunks[cid]) for cid in cids]
+            if journal is None:
+                write = asyncio.ensure_future(store.save_chunks(boards))
+            else:
+                journal.last_checkpoint = time.monotonic()
+                write = asyncio.ensure_future(store.checkpoint(boards, journal))
+            # _evict keeps its hands off these until the write lands: it would
+            # take them for clean, and a reload could overtake the write
+            for cid in cids:
+                self._flushing[cid] = self._flushing.get(cid, 0) + 1
+            write.add_done_callback(lambda _: self._flushed(cids))
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.dirty |= cids   # keep them for the next attempt
+            if covered:
+                journal.restore(covered)
+            raise
+        self._persisted(list(cids))
+
+    def _flushed(self, cids: Set[str]) -> None:
+        for cid in cids:
+            n = self._flushing.pop(cid) - 1
+            if n:
+                self._flushing[cid] = n
 
-    def _random_empty_cell(self, board: torch.Tensor) -> Tuple[int, int]:
-        for _ in range(4096):
-            r = random.randrange(H)
-            c = random.randrange(W)
-            if self._is_empty(board, r, c):
-                return r, c
-        return H // 2, W // 2
+    def _persisted(self, cids: List[str]) -> None:
+        if self.on_persist is not None and cids:
+            self.on_persist(cids)
+
+    async def _flush_loop(self) -> None:
+        # FLUSH_INTERVAL_MS=0: no timer, every change wakes the flusher
+        timeout = FLUSH_INTERVAL_MS / 1000 if FLUSH_INTERVAL_MS > 0 else None
+        while True:
+            # not wait_for: on 3.11 a cancel (Hub.stop) that lands while the
+            # event fires and the timeout expires after a stalled loop
+            # iteration is lost, and stop() waits forever
+            waiter = asyncio.ensure_future(self._flush_now.wait())
+            try:
+                await asyncio.wait((waiter,), timeout=timeout)
+            finally:
+                waiter.cancel()
+            self._flush_now.clear()
+            t0 = time.perf_counter()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[hub] flush failed: {e!r}")
+            FLUSH.observe(time.perf_counter() - t0)
+
+    async def start(self) -> None:
+        if self.owns(self.root_cid):
+            await self._ensure_chunk(self.root_cid)
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if TICK_HZ > 0 and self._ticker is None:
+            self._ticker = asyncio.create_task(self._tick_loop())
+
+    async def stop(self) -> bool:
+        """Stop the flusher and persist everything still dirty (True once done)."""
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush(checkpoint=True)
+        await store.touch(list(self.chunks))
+        if self.journal is not None:
+            await store.close_journal(self.journal)
+        return True
+
+    def resident_bytes(self) -> int:
+        """Memory held for the resident chunks: boards, spawn indexes, cached snapshots, resume history."""
+        return (len(self.chunks) * W * H
+                + sum(f.nbytes for f in self.free.values())
+                + sum(len(frame) for frames in self._snapshots.values() for frame in frames.values())
+                + sum(len(h) for h in self.history.values()) * HISTORY_ENTRY_BYTES)
+
+    def stats(self) -> Dict[str, object]:
+        depths = [len(b) for b in self.outbox.values()]
+        return {
+            "cache": {**self.chunks.stats(), "bytes": self.resident_bytes()},
+            "db": store.stats(),
+            "tick": {"hz": TICK_HZ, **self.tick_stats.as_dict()},
+            "locks": self.locks.stats(),
+            "view": {
+                "clients": len(self.view_by_ws),
+                "watching": sum(len(v) for v in self.viewing.values()),
+            },
+            "spectators": {
+                "sockets": len(self.spectating),
+                "watching": sum(len(v) for v in self.spectating.values()),
+                "chunks": sum(1 for v in self.spectators.values() if v),
+            },
+            "prefetch": {"cells": PREFETCH_CELLS, "inflight": len(self._prefetching), **self.prefetch_stats.as_dict()},
+            "journal": self.journal.stats() if self.journal is not None else None,
+            "sessions": {
+                "grace_s": SESSION_GRACE_S, "active": len(self.sessions), "held": self.sessions.held,
+                **self.sessions.stats.as_dict(),
+            } if self.sessions is not None else None,
+            "outbox": {
+                **self.outbox_stats.as_dict(),
+                "clients": len(depths),
+                "queued": sum(depths),
+                "max_depth": max(depths, default=0),
+            },
+        }
+
+    def metric_families(self) -> List[Tuple[Dict[str, str], list]]:
+        """(labels, families) for /metrics: the timing histograms plus current state."""
+        return [({}, collect() + self.gauges())]
+
+    def gauges(self) -> list:
+        db = store.stats()
+        return [
+            gauge("game_chunks_loaded", "Chunks in memory", len(self.chunks)),
+            gauge("game_chunks_dirty", "Chunks changed since the last flush", len(self.dirty)),
+            gauge("game_cache_bytes", "Memory held for the resident chunks (Hub.resident_bytes)", self.resident_bytes()),
+            gauge("game_sockets", "Connected sockets", len(self.sockets)),
+            gauge("game_spectators", "Connected spectator sockets", len(self.spectating)),
+            gauge("game_sessions_held", "Dropped players kept for a resume",
+                  self.sessions.held if self.sessions is not None else 0),
+            distribution("game_chunk_watchers", "Watchers per loaded chunk",
+                         (len(self.watchers.get(cid, ())) for cid in self.chunks), WATCHER_BUCKETS),
+            gauge("game_outbox_queued", "Frames waiting in socket outboxes", sum(len(b) for b in self.outbox.values())),
+            counter("game_frames_sent_total", "Frames sent to sockets", self.outbox_stats.frames_sent),
+            counter("game_bytes_sent_total", "Bytes sent to sockets", self.outbox_stats.bytes_sent),
+            counter("game_clients_dropped_total", "Sockets kicked for lagging", self.outbox_stats.dropped_clients),
+            counter("game_chunk_writes_total", "Chunk rows written to the DB", db["chunk_writes"]),
+            counter("game_db_commits_total", "DB transactions committed", db["commits"]),
+            counter("game_fill_cells_total", "Cells changed by bulk fills", self.fill_cells),
+        ]
+
+    # Cell access goes through the board's NumPy view (shares memory) and
+    # plain ints – a torch 0-d tensor per cell op is far slower.
+    def _cell(self, board: torch.Tensor, r: int, c: int) -> int:
+        return int(board.numpy()[r, c])
+
+    def _set_cell(self, cid: str, board: torch.Tensor, r: int, c: int, value: int) -> None:
+        """Write one cell and record it for the next delta of this chunk."""
+        board.numpy()[r, c] = value
+        i = r * W + c
+        self.changes.setdefault(cid, {})[i] = value
+        if self.journal is not None:
+            self.journal.append(cid, i, value, self.versions.get(cid, 0) + 1)
+        free = self.free.get(cid)
+        if free is not None:
+            if is_player(value):
+                free.discard(i)
+            else:
+                free.add(i)
+
+    def _free(self, cid: str) -> FreeCells:
+        # spawn index, built on first use: most loaded chunks never see a spawn
+        free = self.free.get(cid)
+        if free is None:
+            free = self.free[cid] = FreeCells(self.chunks[cid].numpy())
+        return free
+
+    def _is_empty(self, board: torch.Tensor, r: int, c: int) -> bool:
+        return not is_player(self._cell(board, r, c))
 
     # ── neighbors (computed, not stored) ──────────────────────────────────────
     def neighbor_cid(self, cid: str, direction: str) -> str:
@@ -62,75 +464,496 @@ class Hub:
         if direction == "right": cx += 1
         return chunk_id_from_coords(cx, cy)
 
+    # ── area of interest ─────────────────────────────────────────────────────
+    def _view_cids(self, cid: str, radius: int) -> Set[str]:
+        """Chunks within `radius` of `cid` in both axes that this Hub owns."""
+        cx, cy = coords_from_chunk_id(cid)
+        out = {cid}
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                other = chunk_id_from_coords(cx + dx, cy + dy)
+                if self.owns(other):
+                    out.add(other)
+        return out
+
+    def _watch(self, ws: WebSocket, cids: Set[str]) -> Set[str]:
+        """Make `cids` exactly the chunks ws watches; returns the ones it did not watch before."""
+        had = self.viewing.get(ws, set())
+        seen = self.seen_version.get(ws, {})
+        for cid in had - cids:
+            self.watchers.get(cid, set()).discard(ws)
+            seen.pop(cid, None)
+        for cid in cids - had:
+            self.watchers.setdefault(cid, set()).add(ws)
+        self.viewing[ws] = cids
+        return cids - had
+
+    async def set_view(self, ws: WebSocket, radius: int) -> None:
+        """{"k": "view", "r": R}: watch every chunk within R (capped) of the player's."""
+        if ws not in self.sockets:
+            return
+        self.view_by_ws[ws] = max(0, min(int(radius), VIEW_MAX_RADIUS))
+        self._send_view(ws)
+        self._schedule_view(ws)
+
+    def _schedule_view(self, ws: WebSocket) -> None:
+        # one refresh per socket at a time; a running one re-reads the
+        # position after every load, so it also covers later moves
+        if ws not in self.view_by_ws:
+            return
+        task = self._view_tasks.get(ws)
+        if task is None or task.done():
+            self._view_tasks[ws] = asyncio.create_task(self._refresh_view(ws))
+
+    async def _refresh_view(self, ws: WebSocket) -> None:
+        """
+        Bring ws's watched set in line with its position and radius: stop
+        watching chunks that left the view, snapshot the ones that entered.
+        Chunks still loading are watched as they arrive.
+        """
+        try:
+            while ws in self.pos_by_ws and ws not in self._leaving:
+                want = self._view_cids(self.pos_by_ws[ws][0], self.view_by_ws.get(ws, 0))
+                resident = {cid for cid in want if cid in self.chunks}
+                for cid in sorted(self._watch(ws, resident)):
+                    self._send_snapshot(ws, cid)
+                missing = want - resident
+                if not missing:
+                    return
+                await asyncio.gather(*(self._ensure_chunk(cid) for cid in missing))
+        except Exception as e:
+            print(f"[hub] view refresh failed: {e!r}")
+        finally:
+            if self._view_tasks.get(ws) is asyncio.current_task():
+                del self._view_tasks[ws]
+
+    # ── spectators ───────────────────────────────────────────────────────────
+    async def spectate(self, ws: WebSocket, fmt: str, cids: Sequence[str]) -> None:
+        """
+        Make `cids` exactly the chunks spectator ws watches (the first call
+        registers it). Each newly watched chunk is sent as its shared
+        snapshot, loaded first if needed; from then on ws gets every delta
+        of it. Spectators do not keep chunks loaded: one evicted meanwhile
+        cannot change, and is sent again whole when it comes back.
+        """
+        if ws not in self.spectating:
+            self.spectating[ws] = set()
+            self.fmt_by_ws[ws] = fmt
+            self.outbox[ws] = Outbox(ws, self.outbox_stats, self._resync, self._drop_spectator)
+        want = {cid for cid in cids if self.owns(cid)}
+        for cid in self.spectating[ws] - want:
+            self._unwatch_spectator(ws, cid)
+        box = self.outbox[ws]
+        missing = []
+        for cid in sorted(want - self.spectating[ws]):
+            self.spectators.setdefault(cid, set()).add(ws)
+            self.spectating[ws].add(cid)
+            if cid in self.chunks:
+                box.push(cid, self._encoded_snapshot(cid, fmt), snapshot=True)
+            else:
+                missing.append(cid)   # _load_chunk sends the snapshot
+        await asyncio.gather(*(self._ensure_chunk(cid) for cid in missing))
+
+    def spectator_snapshot(self, ws: WebSocket, cid: str) -> None:
+        """Send spectator ws the current snapshot of cid again (shard.py: a feed gained a socket)."""
+        box = self.outbox.get(ws)
+        if box is None or cid not in self.spectating.get(ws, ()):
+            return
+        if cid in self.chunks:
+            box.push(cid, self._encoded_snapshot(cid, self.fmt_by_ws[ws]), snapshot=True)
+        else:
+            self._schedule_load(cid)
+
+    def _unwatch_spectator(self, ws: WebSocket, cid: str) -> None:
+        self.spectating[ws].discard(cid)
+        watching = self.spectators.get(cid)
+        if watching is not None:
+            watching.discard(ws)
+            if not watching:
+                del self.spectators[cid]
+
+    def unspectate(self, ws: WebSocket) -> None:
+        for cid in list(self.spectating.get(ws, ())):
+            self._unwatch_spectator(ws, cid)
+        self.spectating.pop(ws, None)
+        self.fmt_by_ws.pop(ws, None)
+        box = self.outbox.pop(ws, None)
+        if box is not None:
+            box.close()
+
+    def _drop_spectator(self, ws: WebSocket) -> None:
+        """Outbox callback for a spectator that fell behind."""
+        self.unspectate(ws)
+        asyncio.create_task(self._close_quietly(ws, 1013))
+
     # ── connect / disconnect ─────────────────────────────────────────────────
-    async def connect(self, ws: WebSocket) -> None:
+    def _register(self, ws: WebSocket, fmt: str) -> None:
         self.sockets.add(ws)
-        async with self.lock:
-            cid = self.root_cid
-            board = self._ensure_chunk(cid)
-            r, c = self._random_empty_cell(board)
+        self.fmt_by_ws[ws] = fmt
+        self.outbox[ws] = Outbox(ws, self.outbox_stats, self._resync, self._drop)
+        self.seq_by_ws[ws] = next(self._join_seq)
+
+    def _place(self, ws: WebSocket, cid: str, board: torch.Tensor, r: int, c: int, pcolor: int) -> None:
+        """Put a player on an empty cell (chunk lock held)."""
+        self.player_color[ws] = pcolor
+
+        # Save underlying ground and draw the player on top
+        underlying = without_player(self._cell(board, r, c)) # store ground (no player bit)
+        self.underlying_by_ws[ws] = underlying
+
+        self._set_cell(cid, board, r, c, with_player(pcolor))  # cell shows the player with his fixed color
+        self._mark_dirty(cid)
+
+        self.val_by_ws[ws] = with_player(pcolor)  # compatibility
+        self.pos_by_ws[ws] = (cid, r, c)
+        self._watch(ws, {cid})
+
+        # newcomer has no version yet → gets a snapshot; others get a delta
+        self._publish(cid)
+        self._prefetch_near(cid, r, c)
+        self._schedule_view(ws)
+
+    async def connect(self, ws: WebSocket, fmt: str = "json", home: Optional[str] = None) -> None:
+        self._register(ws, fmt)
+        # Spawn in the root chunk (or `home`); when it is full, spiral outwards
+        # to the nearest chunk with room instead of stacking players on one cell.
+        hx, hy = coords_from_chunk_id(home or self.root_cid)
+        for cx, cy in spiral(hx, hy):
+            cid = chunk_id_from_coords(cx, cy)
+            if not self.owns(cid):
+                continue
+            async with self.locks.hold(cid):
+                board = await self._ensure_chunk(cid)
+                spot = self._free(cid).pick()
+                if spot is None:
+                    continue
+                r, c = spot
 
-            # Pick a fixed player color once (2-bit per channel 0..3)
-            pr = random.randint(0, 3)
-            pg = random.randint(0, 3)
-            pb = random.randint(0, 3)
-            pcolor = make_color(pr, pg, pb)         # no player bit
-            self.player_color[ws] = pcolor
+                # Pick a fixed player color once (2-bit per channel 0..3)
+                pr = random.randint(0, 3)
+                pg = random.randint(0, 3)
+                pb = random.randint(0, 3)
+                pcolor = make_color(pr, pg, pb)         # no player bit
+                self._place(ws, cid, board, r, c, pcolor)
+                if self.sessions is not None:
+                    self._new_session(ws)
+                return
 
-            # Save underlying ground and draw the player on top
-            underlying = without_player(board[r, c]) # store ground (no player bit)
-            self.underlying_by_ws[ws] = underlying
+    async def adopt(self, ws: WebSocket, fmt: str, cid: str, r: int, c: int, pcolor: int) -> bool:
+        """
+        Take over a player another shard is handing off, at (cid, r, c).
+        False if the cell is taken; the player then stays where it was.
+        """
+        async with self.locks.hold(cid):
+            board = await self._ensure_chunk(cid)
+            if not self._is_empty(board, r, c):
+                return False
+            self._register(ws, fmt)
+            self._place(ws, cid, board, r, c, pcolor)
+            return True
 
-            board[r, c] = with_player(pcolor)       # cell shows the player with his fixed color
-            save_chunk(cid, board)
+    def handoff_aborted(self, ws: WebSocket) -> None:
+        """The target shard refused the player: it may move again."""
+        self._leaving.discard(ws)
 
-            self.val_by_ws[ws] = with_player(pcolor).clone()  # compatibility
-            self.pos_by_ws[ws] = (cid, r, c)
-            self.watchers[cid].add(ws)
+    async def resume(self, ws: WebSocket, fmt: str, token: str, seen: Optional[Dict[str, int]] = None) -> bool:
+        """
+        /ws?resume=<token>: hand ws the player of that session – held since
+        its socket dropped, or still on a socket that has not noticed yet,
+        which is closed. Every chunk it watches is brought up to date from
+        the version the client says it holds (`seen`, cid -> version):
+        nothing, one merged delta from the chunk's history, or a snapshot.
+        False if the token is unknown or spent.
+        """
+        if self.sessions is None:
+            return False
+        taken = self.sessions.take(token)
+        if taken is None:
+            return False
+        old, _, held = taken
+        while old in self.pos_by_ws:
+            cid = self.pos_by_ws[old][0]
+            async with self.locks.hold(cid):
+                if self.pos_by_ws.get(old, ("",))[0] != cid:
+                    continue   # crossed while we waited for the lock
+                self._rebind(old, ws, fmt)
+                self._new_session(ws)
+                self._send_view(ws)
+                claims = seen or {}
+                self._catch_up(ws, cid, claims.get(cid))
+                for other in sorted(self.viewing.get(ws, set()) - {cid}):
+                    self._catch_up(ws, other, claims.get(other))
+                break
+        else:
+            return False   # left meanwhile
+        if not held:
+            asyncio.create_task(self._close_quietly(old, 4000))   # session resumed on another socket
+        return True
 
+    async def resumed_remote(self, ws: WebSocket, fmt: str) -> None:
+        """
+        Sharded mode: the front resumed this player on a new socket and
+        dropped every frame meanwhile. Send everything again, in `fmt`.
+        """
+        if ws not in self.pos_by_ws:
+            return
+        self.fmt_by_ws[ws] = fmt
+        self.seen_version[ws] = {}
         await self._send_chunk(ws)
 
-    async def disconnect(self, ws: WebSocket) -> None:
-        async with self.lock:
-            if ws in self.pos_by_ws:
-                cid, r, c = self.pos_by_ws.pop(ws)
-                board = self._ensure_chunk(cid)
+    def _rebind(self, old: WebSocket, new: WebSocket, fmt: str) -> None:
+        """Move a player from socket `old` to `new` (resume; chunk lock held)."""
+        for by_ws in (self.pos_by_ws, self.val_by_ws, self.player_color, self.underlying_by_ws,
+                      self.seq_by_ws, self.view_by_ws, self.viewing):
+            if old in by_ws:
+                by_ws[new] = by_ws.pop(old)
+        for cid in self.viewing.get(new, ()):
+            watching = self.watchers.setdefault(cid, set())
+            watching.discard(old)
+            watching.add(new)
+        task = self._view_tasks.pop(old, None)
+        if task is not None:
+            task.cancel()
+        self.seen_version.pop(old, None)
+        self.seen_version[new] = {}        # filled by _catch_up
+        self.fmt_by_ws.pop(old, None)
+        self._intents.pop(old, None)
+        self._leaving.discard(old)
+        box = self.outbox.pop(old, None)
+        if box is not None:
+            box.close()
+        self.sockets.discard(old)
+        self.sockets.add(new)
+        self.fmt_by_ws[new] = fmt
+        self.outbox[new] = Outbox(new, self.outbox_stats, self._resync, self._drop)
+        self._schedule_view(new)
+
+    def _catch_up(self, ws: WebSocket, cid: str, have: Optional[int]) -> None:
+        """Bring a resumed client's copy of cid from version `have` to the current one."""
+        if cid not in self.chunks:
+            return   # still loading: the view refresh snapshots it
+        version = self.versions.get(cid, 0)
+        if have == version:
+            self.seen_version[ws][cid] = version
+            self.sessions.stats.current += 1
+            return
+        cells = self._changes_since(cid, have) if have is not None else None
+        if cells is None:
+            self._send_snapshot(ws, cid)
+            self.sessions.stats.snapshots += 1
+            return
+        self.outbox[ws].push(cid, encode_delta(self.fmt_by_ws[ws], cid, have, version, cells))
+        self.seen_version[ws][cid] = version
+        self.sessions.stats.caught_up += 1
+
+    def _changes_since(self, cid: str, have: int) -> Optional[Dict[int, int]]:
+        """Cells published after version `have`, merged; None if the history does not reach back (or a snapshot is smaller)."""
+        merged: Dict[int, int] = {}
+        at = have
+        for base, version, cells in self.history.get(cid, ()):
+            if version <= have:
+                continue
+            if base != at:
+                return None
+            merged.update(cells)
+            at = version
+        if at != self.versions.get(cid, 0) or len(merged) * DELTA_CELL.size >= H * W:
+            return None
+        return merged
+
+    def _new_session(self, ws: WebSocket) -> None:
+        fmt = self.fmt_by_ws.get(ws, "json")
+        token = self.sessions.issue(ws, fmt)
+        self.outbox[ws].push("session", encode_session(fmt, token, SESSION_GRACE_S), snapshot=True)
+
+    async def _close_quietly(self, ws: WebSocket, code: int) -> None:
+        try:
+            await ws.close(code=code)
+        except Exception:
+            pass
+
+    async def disconnect(self, ws: WebSocket, hold: bool = False) -> None:
+        """
+        Take the player off the board. With `hold` (the socket dropped without
+        a clean close) and sessions on, it stays for the grace period instead
+        and only its outbox goes; a resume or the expiry finishes the job.
+        """
+        if hold and self.sessions is not None and ws in self.pos_by_ws and self.sessions.hold(ws):
+            box = self.outbox.pop(ws, None)
+            if box is not None:
+                box.close()
+            self._intents.pop(ws, None)
+            return
+        if self.sessions is not None:
+            self.sessions.forget(ws)
+        while ws in self.pos_by_ws:
+            cid, r, c = self.pos_by_ws[ws]
+            async with self.locks.hold(cid):
+                if self.pos_by_ws.get(ws) != (cid, r, c):
+                    continue   # moved while we waited for the lock
+                del self.pos_by_ws[ws]
+                board = await self._ensure_chunk(cid)
 
                 # Restore the ground color under the player when leaving
-                underlying = self.underlying_by_ws.pop(ws, torch.tensor(0, dtype=DTYPE))
-                board[r, c] = underlying
-                save_chunk(cid, board)
+                underlying = self.underlying_by_ws.pop(ws, 0)
+                self._set_cell(cid, board, r, c, underlying)
+                self._mark_dirty(cid)
 
-                self.watchers.get(cid, set()).discard(ws)
-                await self._broadcast_chunk(cid)
+                self._watch(ws, set())
+                self._publish(cid)
 
-            self.val_by_ws.pop(ws, None)
-            self.player_color.pop(ws, None)
+        self.val_by_ws.pop(ws, None)
+        self.viewing.pop(ws, None)
+        self.view_by_ws.pop(ws, None)
+        self.player_color.pop(ws, None)
+        self.seen_version.pop(ws, None)
+        self.fmt_by_ws.pop(ws, None)
+        self.seq_by_ws.pop(ws, None)
+        self._intents.pop(ws, None)
+        self._leaving.discard(ws)
+        box = self.outbox.pop(ws, None)
+        if box is not None:
+            box.close()
         self.sockets.discard(ws)
 
+    # ── input / tick ──────────────────────────────────────────────────────────
+    async def handle(self, ws: WebSocket, action: str) -> None:
+        """Entry point for one decoded key: "up"/"down"/"left"/"right"/"color"/"whereami"."""
+        if action == "whereami":
+            await self._send_chunk(ws)
+        elif TICK_HZ > 0:
+            q = self._intents.setdefault(ws, [])
+            if len(q) < TICK_MAX_INTENTS:
+                q.append(action)
+            else:
+                self.tick_stats.intents_dropped += 1
+        else:
+            await self._apply(ws, action)
+
+    async def handle_batch(self, ws: WebSocket, actions: Sequence[str], ack: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Several queued actions of one socket (inputs.InputQueue), in order.
+        A run of them that stays inside the player's chunk is applied under
+        one hold of its lock and published as one delta; a border crossing
+        or a whereami goes the usual way. `ack` = (seq, dropped) is answered
+        once all of them were applied.
+        """
+        t0 = time.perf_counter()
+        if TICK_HZ > 0:
+            for action in actions:
+                await self.handle(ws, action)
+        else:
+            i = 0
+            while i < len(actions) and ws in self.pos_by_ws and ws not in self._leaving:
+                j = await self._apply_run(ws, actions, i)
+                if j == i:   # crossing, whereami, or moved meanwhile
+                    await self.handle(ws, actions[i])
+                    j = i + 1
+                i = j
+        INPUT.observe(time.perf_counter() - t0)
+        if ack is not None:
+            self._send_ack(ws, *ack)
+
+    async def _apply_run(self, ws: WebSocket, actions: Sequence[str], i: int) -> int:
+        """Apply actions[i:] while they stay in the player's chunk; index of the first one left."""
+        cid, r, c = pos = self.pos_by_ws[ws]
+        async with self.locks.hold(cid):
+            if self.pos_by_ws.get(ws) != pos:
+                return i
+            board = await self._ensure_chunk(cid)
+            changed = False
+            while i < len(actions):
+                action = actions[i]
+                if action == "color":
+                    self._paint(ws, cid, board, r, c)
+                    changed = True
+                elif action in MOVES:
+                    dr, dc = MOVES[action]
+                    nr, nc = r + dr, c + dc
+                    if not (0 <= nr < H and 0 <= nc < W):
+                        break
+                    if self._step(ws, cid, board, r, c, nr, nc):
+                        r, c = nr, nc
+                        changed = True
+                else:
+                    break
+                i += 1
+            if changed:
+                self._mark_dirty(cid)
+                self._publish(cid)
+                self._prefetch_near(cid, r, c)
+        return i
+
+    async def _apply(self, ws: WebSocket, action: str) -> None:
+        if action == "color":
+            await self.color_plus_plus(ws)
+        elif action in MOVES:
+            dr, dc = MOVES[action]
+            await self.move(ws, dr, dc)
+
+    def _publish(self, cid: str) -> None:
+        if TICK_HZ > 0:
+            self._touched.add(cid)
+        else:
+            self._broadcast_chunk(cid)
+
+    async def _tick_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        period = 1 / TICK_HZ
+        deadline = loop.time() + period
+        while True:
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            try:
+                await self._tick()
+            except Exception as e:
+                print(f"[hub] tick failed: {e!r}")
+            deadline += period
+            if loop.time() > deadline:     # fell behind: skip, don't burst
+                self.tick_stats.overruns += 1
+                deadline = loop.time() + period
+
+    async def _tick(self) -> None:
+        """
+        Apply queued intents in a deterministic order: round k applies every
+        player's k-th intent, players in join order. When two players go for
+        the same empty cell, the earlier joiner gets it and the other's move
+        is blocked, exactly as if it had arrived second.
+        """
+        intents, self._intents = self._intents, {}
+        t0 = time.perf_counter()
+        order = sorted((ws for ws in intents if ws in self.seq_by_ws), key=self.seq_by_ws.__getitem__)
+        n = 0
+        for k in range(max((len(intents[ws]) for ws in order), default=0)):
+            for ws in order:
+                q = intents[ws]
+                if k < len(q):
+                    await self._apply(ws, q[k])
+                    n += 1
+        t1 = time.perf_counter()
+        touched, self._touched = self._touched, set()
+        for cid in sorted(touched):
+            self._broadcast_chunk(cid)
+        t2 = time.perf_counter()
+        self.tick_stats.record(t1 - t0, t2 - t1, n, len(touched))
+
     # ── actions ───────────────────────────────────────────────────────────────
+    # A player's entries in pos_by_ws / underlying_by_ws / player_color only
+    # change while holding the lock of the chunk the player stands in. Callers
+    # read the position, take the lock(s), then re-check it and retry if a
+    # concurrent disconnect/move got there first.
     async def move(self, ws: WebSocket, dr: int, dc: int) -> None:
-        async with self.lock:
-            cid, r, c = self.pos_by_ws[ws]
-            board = self._ensure_chunk(cid)
-            pcolor = self.player_color[ws]
-
+        if ws in self._leaving:
+            return   # handoff to another shard in flight
+        while ws in self.pos_by_ws:
+            cid, r, c = pos = self.pos_by_ws[ws]
             nr, nc = r + dr, c + dc
+
             # within same chunk
             if 0 <= nr < H and 0 <= nc < W:
-                if self._is_empty(board, nr, nc):
-                    # leave old cell: restore its ground
-                    old_under = self.underlying_by_ws[ws]
-                    board[r, c] = old_under
-
-                    # enter new cell: remember its ground, then draw player color
-                    new_under = without_player(board[nr, nc])
-                    self.underlying_by_ws[ws] = new_under
-                    board[nr, nc] = with_player(pcolor)
-
-                    self.pos_by_ws[ws] = (cid, nr, nc)
-                    save_chunk(cid, board)
-                    await self._broadcast_chunk(cid)
+                async with self.locks.hold(cid):
+                    if self.pos_by_ws.get(ws) != pos:
+                        continue
+                    await self._move_within(ws, cid, r, c, nr, nc)
                 return
 
             # crossing chunk border
@@ -141,88 +964,307 @@ class Hub:
             elif nc >= W:     direction = "right"
 
             new_cid = self.neighbor_cid(cid, direction or "right")
-            new_board = self._ensure_chunk(new_cid)
-            if direction == "up":
-                tr, tc = H - 1, c
-            elif direction == "down":
-                tr, tc = 0, c
-            elif direction == "left":
-                tr, tc = r, W - 1
-            else:
-                tr, tc = r, 0
+            if not self.owns(new_cid):
+                self._hand_off(ws, new_cid, nr % H, nc % W)
+                return
+            async with self.locks.hold(cid, new_cid):
+                if self.pos_by_ws.get(ws) != pos:
+                    continue
+                await self._move_across(ws, cid, r, c, new_cid, direction)
+            self._schedule_view(ws)
+            return
+
+    def _hand_off(self, ws: WebSocket, new_cid: str, tr: int, tc: int) -> None:
+        """
+        Two-phase handoff: the owning shard tries to place the player at
+        (new_cid, tr, tc); only once it has, the front tells us to release
+        the player (Hub.disconnect, which restores the ground under it).
+        Until then the player stays drawn here and ignores further moves.
+        """
+        if self._handoff is None:
+            return
+        self._leaving.add(ws)
+        self._handoff(ws, new_cid, tr, tc)
+
+    async def _move_within(self, ws: WebSocket, cid: str, r: int, c: int, nr: int, nc: int) -> None:
+        board = await self._ensure_chunk(cid)
+        if self._step(ws, cid, board, r, c, nr, nc):
+            self._mark_dirty(cid)
+            self._publish(cid)
+            self._prefetch_near(cid, nr, nc)
+
+    def _step(self, ws: WebSocket, cid: str, board: torch.Tensor, r: int, c: int, nr: int, nc: int) -> bool:
+        """Move one cell inside a chunk (lock held), unpublished; False if the target is taken."""
+        if not self._is_empty(board, nr, nc):
+            return False
+        # leave old cell: restore its ground
+        old_under = self.underlying_by_ws[ws]
+        self._set_cell(cid, board, r, c, old_under)
+
+        # enter new cell: remember its ground, then draw player color
+        new_under = without_player(self._cell(board, nr, nc))
+        self.underlying_by_ws[ws] = new_under
+        self._set_cell(cid, board, nr, nc, with_player(self.player_color[ws]))
 
-            if self._is_empty(new_board, tr, tc):
-                # leave old chunk cell: restore ground
-                old_under = self.underlying_by_ws[ws]
-                board[r, c] = old_under
-                save_chunk(cid, board)
+        self.pos_by_ws[ws] = (cid, nr, nc)
+        return True
 
-                # enter new chunk cell: remember ground and draw player
-                new_under = without_player(new_board[tr, tc])
-                self.underlying_by_ws[ws] = new_under
-                new_board[tr, tc] = with_player(pcolor)
-                save_chunk(new_cid, new_board)
+    async def _move_across(self, ws: WebSocket, cid: str, r: int, c: int, new_cid: str, direction: Optional[str]) -> None:
+        board = await self._ensure_chunk(cid)
+        if new_cid in self.chunks:
+            kind = "hits"
+        else:
+            kind = "late" if new_cid in self._prefetching else "misses"
+        t0 = time.perf_counter()
+        new_board = await self._ensure_chunk(new_cid)
+        self.prefetch_stats.crossing(kind, time.perf_counter() - t0)
+        if direction == "up":
+            tr, tc = H - 1, c
+        elif direction == "down":
+            tr, tc = 0, c
+        elif direction == "left":
+            tr, tc = r, W - 1
+        else:
+            tr, tc = r, 0
 
-                self.pos_by_ws[ws] = (new_cid, tr, tc)
+        if self._is_empty(new_board, tr, tc):
+            # leave old chunk cell: restore ground
+            old_under = self.underlying_by_ws[ws]
+            self._set_cell(cid, board, r, c, old_under)
+            self._mark_dirty(cid)
 
-                self.watchers[cid].discard(ws)
-                self.watchers.setdefault(new_cid, set()).add(ws)
+            # enter new chunk cell: remember ground and draw player
+            new_under = without_player(self._cell(new_board, tr, tc))
+            self.underlying_by_ws[ws] = new_under
+            self._set_cell(new_cid, new_board, tr, tc, with_player(self.player_color[ws]))
+            self._mark_dirty(new_cid)
 
-                await self._broadcast_chunk(cid)
-                await self._broadcast_chunk(new_cid)
-            # else: target blocked → no move
+            self.pos_by_ws[ws] = (new_cid, tr, tc)
+
+            # keep what is still in view; the rest of the new view follows
+            # in _refresh_view once loaded
+            keep = self.viewing.get(ws, set()) & self._view_cids(new_cid, self.view_by_ws.get(ws, 0))
+            self._watch(ws, keep | {new_cid})
+            self._send_view(ws)
+
+            self._publish(cid)
+            self._publish(new_cid)
+            self._prefetch_near(new_cid, tr, tc)
+        # else: target blocked → no move
 
 
     async def color_plus_plus(self, ws: WebSocket) -> None:
-     """
-     צובע מייד את התא שעליו עומד השחקן, וגם שומר את הקרקע כך שהצבע יישאר
-     לאחר שהשחקן יזוז מהתא.
-     """
-     async with self.lock:
-         cid, r, c = self.pos_by_ws[ws]
-         board = self._ensure_chunk(cid)
+        """
+        צובע מייד את התא שעליו עומד השחקן, וגם שומר את הקרקע כך שהצבע יישאר
+        לאחר שהשחקן יזוז מהתא.
+        """
+        while ws in self.pos_by_ws:
+            cid, r, c = pos = self.pos_by_ws[ws]
+            async with self.locks.hold(cid):
+                if self.pos_by_ws.get(ws) != pos:
+                    continue
+                board = await self._ensure_chunk(cid)
+                self._paint(ws, cid, board, r, c)
+
+                # 3) התמדה ושידור
+                self._mark_dirty(cid)
+                self._publish(cid)
+            return
 
-         # 1) עדכן את צבע הקרקע השמור (ללא ביט שחקן)
-         under = self.underlying_by_ws.get(ws, torch.tensor(0, dtype=DTYPE))
-         under = inc_color(under)             # מעלה את r,g,b (2 ביט לכל ערוץ)
-         self.underlying_by_ws[ws] = under    # נשמר כדי שכאשר נצא מהתא, הקרקע הזו תישאר
+    def _paint(self, ws: WebSocket, cid: str, board: torch.Tensor, r: int, c: int) -> None:
+        """One color press on the player's cell (lock held), unpublished."""
+        # 1) עדכן את צבע הקרקע השמור (ללא ביט שחקן)
+        under = self.underlying_by_ws.get(ws, 0)
+        under = inc_color(under)             # מעלה את r,g,b (2 ביט לכל ערוץ)
+        self.underlying_by_ws[ws] = under    # נשמר כדי שכאשר נצא מהתא, הקרקע הזו תישאר
 
-         # 2) כתוב מיידית לתא את הקרקע *עם* ביט השחקן, כדי שהשינוי ייראה עכשיו
-         board[r, c] = with_player(under)
+        # 2) כתוב מיידית לתא את הקרקע *עם* ביט השחקן, כדי שהשינוי ייראה עכשיו
+        self._set_cell(cid, board, r, c, with_player(under))
 
-         # 3) התמדה ושידור
-         save_chunk(cid, board)
 
-     await self._broadcast_chunk(cid)
+    # ── bulk edits ────────────────────────────────────────────────────────────
+    async def fill(self, spec: Fill) -> Dict[str, int]:
+        """
+        Apply a bulk edit (paint.py) to the chunks of its rectangle this Hub
+        owns, BATCH_CHUNKS at a time: lock the batch (which also keeps it
+        from being evicted), load it, rewrite each chunk's slice with one
+        table gather. A chunk that changed is marked dirty and broadcast
+        once, as a snapshot. In journal mode the edit is not journalled
+        cell by cell; a checkpoint at the end persists it instead.
+        """
+        t0 = time.perf_counter()
+        table = spec.table()
+        spans = [s for s in spec.spans() if self.owns(s[0])]
+        changed = cells = 0
+        for i in range(0, len(spans), BATCH_CHUNKS):
+            batch = spans[i:i + BATCH_CHUNKS]
+            async with self.locks.hold(*(cid for cid, _, _ in batch)):
+                await asyncio.gather(*(self._ensure_chunk(cid) for cid, _, _ in batch))
+                for cid, rows, cols in batch:
+                    n = self._fill_chunk(cid, rows, cols, table)
+                    if n:
+                        changed += 1
+                        cells += n
+        if changed and self.journal is not None:
+            await self.flush(checkpoint=True)
+        if spans:   # no print: fills come from sockets too, see game_fill_* in /metrics
+            FILL.observe(time.perf_counter() - t0)
+            self.fill_cells += cells
+        return {"chunks": len(spans), "chunks_changed": changed, "cells_changed": cells}
 
+    def _fill_chunk(self, cid: str, rows: slice, cols: slice, table: np.ndarray) -> int:
+        """Rewrite one chunk's slice (chunk lock held); returns the number of cells changed."""
+        sub = self.chunks[cid].numpy()[rows, cols]
+        new = table[sub]
+        n = int(np.count_nonzero(new != sub))
+        # players in the slice keep their cell; the ground under them changes
+        for ws in self.watchers.get(cid, ()):
+            pos = self.pos_by_ws.get(ws)
+            if (pos is not None and pos[0] == cid
+                    and rows.start <= pos[1] < rows.stop and cols.start <= pos[2] < cols.stop):
+                self.underlying_by_ws[ws] = int(table[self.underlying_by_ws[ws]])
+        if n:
+            sub[...] = new
+            self._mark_dirty(cid)
+            self._broadcast_snapshot(cid)
+        return n
 
     # ── send/broadcast ───────────────────────────────────────────────────────
+    # Nothing here awaits a socket: frames go into the client's Outbox and its
+    # writer task sends them, so broadcasting under a chunk lock is cheap.
     async def _send_chunk(self, ws: WebSocket) -> None:
+        """Full snapshot of what the player sees (whereami, resync): its chunk, then the rest of its view."""
         if ws not in self.pos_by_ws:
             return
         cid, _, _ = self.pos_by_ws[ws]
-        board = self._ensure_chunk(cid)
-        payload = {
-            "type": "matrix",
-            "w": W, "h": H,
-            "data": board.flatten().tolist(),
-            "chunk_id": cid,
-        }
-        await ws.send_text(json.dumps(payload))
-
-    async def _broadcast_chunk(self, cid: str) -> None:
-        board = self._ensure_chunk(cid)
-        payload = {
-            "type": "matrix",
-            "w": W, "h": H,
-            "data": board.flatten().tolist(),
-            "chunk_id": cid,
-        }
-        dead: Set[WebSocket] = set()
-        for s in list(self.watchers.get(cid, set())):
-            try:
-                await s.send_text(json.dumps(payload))
-            except Exception:
-                dead.add(s)
-        for s in dead:
-            await self.disconnect(s)
+        await self._ensure_chunk(cid)
+        self._send_view(ws)
+        self._send_snapshot(ws, cid)
+        for other in sorted(self.viewing.get(ws, set()) - {cid}):
+            if other in self.chunks:
+                self._send_snapshot(ws, other)
+
+    def _send_ack(self, ws: WebSocket, seq: int, dropped: int) -> None:
+        box = self.outbox.get(ws)
+        if box is not None:
+            box.push("ack", encode_ack(self.fmt_by_ws.get(ws, "json"), seq, dropped), snapshot=True)
+
+    def _send_view(self, ws: WebSocket) -> None:
+        """Tell a client that asked for a view which chunks it now watches."""
+        box = self.outbox.get(ws)
+        if box is None or ws not in self.view_by_ws or ws not in self.pos_by_ws:
+            return
+        fmt = self.fmt_by_ws.get(ws, "json")
+        box.push("view", encode_view(fmt, self.pos_by_ws[ws][0], self.view_by_ws[ws]), snapshot=True)
+
+    def _encoded_snapshot(self, cid: str, fmt: str) -> Frame:
+        """
+        The current version of cid as a snapshot in `fmt`, encoded once and
+        shared by everyone who needs it until the version moves on (joins,
+        resyncs, view changes, spectators).
+        """
+        by_fmt = self._snapshots.get(cid)
+        if by_fmt is None:
+            by_fmt = self._snapshots[cid] = {}
+        frame = by_fmt.get(fmt)
+        if frame is None:
+            t0 = time.perf_counter()
+            frame = by_fmt[fmt] = encode_matrix(fmt, cid, self.versions.get(cid, 0), self.chunks[cid])
+            ENCODE.labels("snapshot").observe(time.perf_counter() - t0)
+        return frame
+
+    def _snapshot_frame(self, ws: WebSocket, cid: str) -> Frame:
+        """Current snapshot in ws's format; ws now holds the current version."""
+        frame = self._encoded_snapshot(cid, self.fmt_by_ws.get(ws, "json"))
+        self.seen_version.setdefault(ws, {})[cid] = self.versions.get(cid, 0)
+        return frame
+
+    def _send_snapshot(self, ws: WebSocket, cid: str) -> None:
+        box = self.outbox.get(ws)
+        if box is not None:
+            box.push(cid, self._snapshot_frame(ws, cid), snapshot=True)
+
+    def _resync(self, ws: WebSocket, cid: str) -> Optional[Frame]:
+        """Outbox callback: the snapshot that replaces a coalesced backlog."""
+        if ws in self.spectating:
+            if cid not in self.spectating[ws]:
+                return None
+            if cid not in self.chunks:   # evicted: the reload sends it
+                self._schedule_load(cid)
+                return None
+            return self._encoded_snapshot(cid, self.fmt_by_ws.get(ws, "json"))
+        if cid not in self.chunks:
+            return None
+        if ws not in self.watchers.get(cid, ()):
+            return None   # client moved on meanwhile
+        return self._snapshot_frame(ws, cid)
+
+    def _drop(self, ws: WebSocket) -> None:
+        """Outbox callback: the socket is dead or hopelessly behind."""
+        asyncio.create_task(self._kick(ws))
+
+    async def _kick(self, ws: WebSocket) -> None:
+        try:
+            await ws.close(code=1013)   # "try again later"
+        except Exception:
+            pass
+        await self.disconnect(ws)
+
+    def _broadcast_snapshot(self, cid: str) -> None:
+        """New version of a chunk as a snapshot to every watcher (bulk edits: cheaper than a huge delta)."""
+        self.changes.pop(cid, None)   # included in the snapshot
+        self.versions[cid] = self.versions.get(cid, 0) + 1
+        self.history.pop(cid, None)   # no delta covers this version
+        self._snapshots.pop(cid, None)
+        for s in list(self.watchers.get(cid, ())):
+            self._send_snapshot(s, cid)
+        for s in self.spectators.get(cid, ()):
+            self.outbox[s].push(cid, self._encoded_snapshot(cid, self.fmt_by_ws[s]), snapshot=True)
+
+    def _broadcast_chunk(self, cid: str) -> None:
+        """
+        Publish the cells changed since the last call as one delta.
+        Watchers holding the previous version get the delta; anyone else
+        (just joined, switched chunk, missed a frame) gets a snapshot.
+        Each frame is encoded at most once per format.
+        """
+        cells = self.changes.pop(cid, None)
+        if not cells:
+            return
+        t0 = time.perf_counter()
+        base = self.versions.get(cid, 0)
+        version = base + 1
+        self.versions[cid] = version
+        self._snapshots.pop(cid, None)
+        if self.sessions is not None:
+            hist = self.history.get(cid)
+            if hist is None:
+                hist = self.history[cid] = deque(maxlen=SESSION_HISTORY)
+            hist.append((base, version, cells))
+
+        deltas: Dict[str, Frame] = {}
+
+        def delta(fmt: str) -> Frame:
+            frame = deltas.get(fmt)
+            if frame is None:
+                t1 = time.perf_counter()
+                frame = deltas[fmt] = encode_delta(fmt, cid, base, version, cells)
+                ENCODE.labels("delta").observe(time.perf_counter() - t1)
+            return frame
+
+        for s in list(self.watchers.get(cid, ())):
+            box = self.outbox.get(s)
+            if box is None or box.resyncing(cid):
+                continue   # a fresh snapshot is already on its way
+            seen = self.seen_version.get(s)
+            if seen is not None and seen.get(cid) == base:
+                seen[cid] = version
+                box.push(cid, delta(self.fmt_by_ws.get(s, "json")))
+            else:
+                self._send_snapshot(s, cid)
+        # spectators got every version since their snapshot: the delta fits
+        for s in self.spectators.get(cid, ()):
+            box = self.outbox[s]
+            if not box.resyncing(cid):
+                box.push(cid, delta(self.fmt_by_ws[s]))
+        BROADCAST.observe(time.perf_counter() - t0)
@@ -0,0 +1,150 @@
+"""
+Client input: decoding, rate limiting and per-socket batching.
+
+Binary input frame (little endian), one or more commands per frame:
+
+    <I seq>  then one byte per command:
+             1 up   2 down   3 left   4 right   5 color   6 whereami
+
+Unknown command bytes are skipped. Once a frame's commands are applied the
+server answers with an ack frame (frames.encode_ack) carrying the highest
+seq applied and how many commands the rate limit dropped since the last
+ack. JSON text frames ({"k": "up"}, see KEY_ACTIONS) still work and share
+the same queue; they just get no acks.
+
+Each socket has an InputQueue. The receive loop only decodes and pushes;
+a drain task hands everything that piled up since the last apply to
+Hub.handle_batch in one go, so a burst of keys costs one lock hold and one
+delta per chunk instead of one per key.
+"""
+import asyncio, struct, time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import WebSocket
+
+from .settings import INPUT_RATE, INPUT_BURST, INPUT_QUEUE_MAX
+
+SEQ = struct.Struct("<I")
+COMMANDS = {1: "up", 2: "down", 3: "left", 4: "right", 5: "color", 6: "whereami"}
+_BY_BYTE = [COMMANDS.get(b) for b in range(256)]
+
+# key aliases sent by JSON clients → Hub actions
+KEY_ACTIONS = {
+    "arrowup": "up", "up": "up",
+    "arrowdown": "down", "down": "down",
+    "arrowleft": "left", "left": "left",
+    "arrowright": "right", "right": "right",
+    "c": "color", "color": "color", "color++": "color",
+    "whereami": "whereami",
+}
+
+
+def decode_input(data: bytes) -> Tuple[int, List[str]]:
+    """(seq, actions) of a binary input frame; ValueError if it is too short."""
+    if len(data) < SEQ.size:
+        raise ValueError("input frame shorter than its seq")
+    (seq,) = SEQ.unpack_from(data)
+    return seq, [a for a in map(_BY_BYTE.__getitem__, data[SEQ.size:]) if a is not None]
+
+
+def encode_input(seq: int, actions: Sequence[str]) -> bytes:
+    """What a client sends (bench/inputs.py, tools)."""
+    codes = {a: b for b, a in COMMANDS.items()}
+    return SEQ.pack(seq) + bytes(codes[a] for a in actions)
+
+
+class TokenBucket:
+    """`rate` tokens/s, holding at most `burst`; rate <= 0 never limits."""
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.t = time.monotonic()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.t) * self.rate)
+        self.t = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class InputStats:
+    """Counters shared by every InputQueue."""
+    def __init__(self) -> None:
+        self.frames = 0
+        self.actions = 0
+        self.dropped = 0        # rate limit or full queue
+        self.batches = 0
+        self.max_batch = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "actions": self.actions,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "actions_per_batch": round(self.actions / max(self.batches, 1), 2),
+            "max_batch": self.max_batch,
+        }
+
+
+class InputQueue:
+    """
+    Actions of one socket waiting for the Hub (or ShardRouter), applied in
+    order by a drain task. close() lets the batch in progress finish.
+    """
+    def __init__(self, world, ws: WebSocket, stats: InputStats,
+                 rate: float = INPUT_RATE, burst: int = INPUT_BURST) -> None:
+        self.world = world
+        self.ws = ws
+        self.stats = stats
+        self._bucket = TokenBucket(rate, burst)
+        self._actions: List[str] = []
+        self._seq: Optional[int] = None   # highest seq not acked yet
+        self._dropped = 0                 # since the last ack
+        self._wake = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.create_task(self._drain())
+
+    def push(self, actions: Sequence[str], seq: Optional[int] = None) -> None:
+        self.stats.frames += 1
+        for action in actions:
+            if len(self._actions) < INPUT_QUEUE_MAX and self._bucket.take():
+                self._actions.append(action)
+            else:
+                self._dropped += 1
+                self.stats.dropped += 1
+        if seq is not None:
+            self._seq = seq
+        self._wake.set()
+
+    async def _drain(self) -> None:
+        while not self._closed:
+            await self._wake.wait()
+            self._wake.clear()
+            batch, self._actions = self._actions, []
+            ack = None
+            if self._seq is not None:
+                ack, self._seq, self._dropped = (self._seq, self._dropped), None, 0
+            if not batch and ack is None:
+                continue
+            self.stats.actions += len(batch)
+            self.stats.batches += 1
+            self.stats.max_batch = max(self.stats.max_batch, len(batch))
+            try:
+                await self.world.handle_batch(self.ws, batch, ack)
+            except Exception as e:
+                print(f"[hub] input batch failed: {e!r}")
+
+    async def close(self) -> None:
+        self._closed = True
+        self._wake.set()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,114 @@
+"""
+Append-only edit journal (GAME_JOURNAL=1).
+
+Every cell write becomes one fixed-size record
+
+    "<iiHBI"   cx, cy, cell index r*W+c, new byte, chunk version
+
+buffered by the Hub and appended to data/journal/journal-<pid>.log on each
+flush – a move costs a couple of records instead of whole chunks. Chunks
+themselves are only written at checkpoints (every JOURNAL_CHECKPOINT_S or
+at JOURNAL_MAX_BYTES of log), after which the log is emptied: everything in
+it is now in the chunk store.
+
+Records hold absolute values, so replaying a log in order on top of chunks
+that are at least as new as its start gives the latest state. replay()
+does that at startup for every log left behind, saves the chunks and
+deletes the logs. A torn last record (crash mid-write) is ignored.
+"""
+import os, struct, time
+from pathlib import Path
+from typing import Dict, Tuple
+import torch
+
+from .settings import W, H, DTYPE, JOURNAL_DIR, JOURNAL_CHECKPOINT_S, JOURNAL_MAX_BYTES
+from .ids import chunk_id_from_coords, coords_from_chunk_id
+
+REC = struct.Struct("<iiHBI")
+
+
+class Journal:
+    """One process's log. append/take/restore run on the loop; write/truncate on the DB thread."""
+    def __init__(self, directory: Path = JOURNAL_DIR) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"journal-{os.getpid()}.log"
+        self._fd = -1
+        self._buf = bytearray()
+        self._coords: Dict[str, Tuple[int, int]] = {}
+        self.size = 0                 # bytes in the file since the last checkpoint
+        self.last_checkpoint = time.monotonic()
+        self.records = 0
+        self.bytes_written = 0
+        self.checkpoints = 0
+
+    def append(self, cid: str, idx: int, value: int, version: int) -> None:
+        xy = self._coords.get(cid)
+        if xy is None:
+            xy = self._coords[cid] = coords_from_chunk_id(cid)
+        self._buf += REC.pack(xy[0], xy[1], idx, value, version)
+        self.records += 1
+
+    def take(self) -> bytes:
+        data, self._buf = bytes(self._buf), bytearray()
+        return data
+
+    def restore(self, data: bytes) -> None:
+        """Put taken records back in front (their write or checkpoint failed)."""
+        self._buf[:0] = data
+
+    def checkpoint_due(self) -> bool:
+        return (self.size + len(self._buf) >= JOURNAL_MAX_BYTES
+                or time.monotonic() - self.last_checkpoint >= JOURNAL_CHECKPOINT_S)
+
+    def write(self, data: bytes) -> None:
+        if self._fd < 0:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.write(self._fd, data)
+        os.fdatasync(self._fd)
+        self.size += len(data)
+        self.bytes_written += len(data)
+
+    def truncate(self) -> None:
+        if self._fd >= 0:
+            os.ftruncate(self._fd, 0)
+        self.size = 0
+        self.checkpoints += 1
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        if self.path.exists() and self.path.stat().st_size == 0:
+            self.path.unlink()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "records": self.records,
+            "bytes_written": self.bytes_written,
+            "log_bytes": self.size,
+            "checkpoints": self.checkpoints,
+        }
+
+
+def replay(db, directory: Path = JOURNAL_DIR) -> Tuple[int, int, int]:
+    """Apply every log in `directory` to the chunk store, then delete them. (files, records, chunks)"""
+    files = sorted(directory.glob("journal-*.log")) if directory.exists() else []
+    boards: Dict[str, torch.Tensor] = {}
+    records = 0
+    for path in files:
+        data = path.read_bytes()
+        data = data[:len(data) - len(data) % REC.size]   # drop a torn tail
+        for cx, cy, idx, value, _ in REC.iter_unpack(data):
+            cid = chunk_id_from_coords(cx, cy)
+            board = boards.get(cid)
+            if board is None:
+                board = db.load_chunk(cid)
+                board = torch.zeros((H, W), dtype=DTYPE) if board is None else board.clone()
+                boards[cid] = board
+            board.numpy().reshape(-1)[idx] = value
+            records += 1
+    if boards:
+        db.save_chunks(boards.items())
+    for path in files:
+        path.unlink()
+    return len(files), records, len(boards)
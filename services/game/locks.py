@@ -0,0 +1,98 @@
+import asyncio, time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+from .ids import coords_from_chunk_id
+from .metrics import LOCK_WAIT
+
+
+class LockStats:
+    __slots__ = ("acquired", "contended", "wait_s", "max_wait_s")
+
+    def __init__(self) -> None:
+        self.acquired = 0
+        self.contended = 0
+        self.wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "wait_ms": round(self.wait_s * 1000, 3),
+            "max_wait_ms": round(self.max_wait_s * 1000, 3),
+        }
+
+
+class LockTable:
+    """
+    One asyncio.Lock per chunk id, created on first use and dropped again
+    once nobody holds or waits for it.
+
+    hold(*cids) takes several chunk locks at once, always in (cx, cy)
+    order, so two border crossings in opposite directions cannot deadlock.
+    """
+    def __init__(self) -> None:
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}      # holders + waiters per lock
+        self._stats: Dict[str, LockStats] = {}
+
+    def in_use(self, cid: str) -> bool:
+        return self._users.get(cid, 0) > 0
+
+    def forget(self, cid: str) -> None:
+        """Drop the stats of a chunk that left memory."""
+        if not self.in_use(cid):
+            self._stats.pop(cid, None)
+
+    @asynccontextmanager
+    async def hold(self, *cids: str) -> AsyncIterator[None]:
+        order = sorted(set(cids), key=coords_from_chunk_id)
+        for cid in order:
+            self._users[cid] = self._users.get(cid, 0) + 1
+        acquired: List[asyncio.Lock] = []
+        try:
+            for cid in order:
+                lock = self._locks.setdefault(cid, asyncio.Lock())
+                st = self._stats.get(cid)
+                if st is None:
+                    st = self._stats[cid] = LockStats()
+                if lock.locked():
+                    st.contended += 1
+                    t0 = time.perf_counter()
+                    await lock.acquire()
+                    waited = time.perf_counter() - t0
+                    st.wait_s += waited
+                    if waited > st.max_wait_s:
+                        st.max_wait_s = waited
+                    LOCK_WAIT.observe(waited)
+                else:
+                    await lock.acquire()
+                    LOCK_WAIT.observe(0.0)
+                st.acquired += 1
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+            for cid in order:
+                n = self._users[cid] - 1
+                if n:
+                    self._users[cid] = n
+                else:
+                    del self._users[cid]
+                    del self._locks[cid]
+
+    def stats(self, top: int = 10) -> Dict[str, object]:
+        total = LockStats()
+        for st in self._stats.values():
+            total.acquired += st.acquired
+            total.contended += st.contended
+            total.wait_s += st.wait_s
+            total.max_wait_s = max(total.max_wait_s, st.max_wait_s)
+        hot = sorted(self._stats.items(), key=lambda kv: kv[1].wait_s, reverse=True)[:top]
+        return {
+            **total.as_dict(),
+            "held": len(self._locks),
+            "hot": [{"chunk_id": cid, **st.as_dict()} for cid, st in hot if st.contended],
+        }
@@ -0,0 +1,49 @@
+import asyncio, time
+from typing import Dict, Optional
+
+
+class LoopLagMonitor:
+    """
+    Measures how long the event loop was blocked.
+
+    A task sleeps for `interval` seconds in a loop; any extra time before it
+    wakes up is time the loop spent running something else without yielding
+    (synchronous SQLite, big JSON dumps, ...).
+    """
+    def __init__(self, interval: float = 0.02, threshold: float = 0.005) -> None:
+        self.interval = interval
+        self.threshold = threshold   # lag below this is scheduler noise
+        self.samples = 0
+        self.stalls = 0
+        self.blocked_s = 0.0
+        self.max_lag_s = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - t0 - self.interval
+            self.samples += 1
+            if lag > self.threshold:
+                self.stalls += 1
+                self.blocked_s += lag
+            if lag > self.max_lag_s:
+                self.max_lag_s = lag
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "blocked_ms": round(self.blocked_s * 1000, 2),
+            "max_lag_ms": round(self.max_lag_s * 1000, 2),
+        }
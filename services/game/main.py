@@ -44,59 +44,267 @@
 
 
 # server/main.py
-import os, json
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import os, json, hmac
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Body, Header, Response
+from fastapi.responses import PlainTextResponse
 import uvicorn
 
-from .settings import W, H
+from .settings import W, H, SHARDS, ADMIN_TOKEN, MINIMAP, PROFILE, SPECTATORS_MAX, SPECTATE_MAX_CHUNKS
 from .hub import Hub
-from .db import clear_player_bits_all   # NEW
+from .shard import ShardRouter
+from .storage import store
+from .frames import parse_format
+from .paint import Fill
+from .minimap import Minimap
+from .inputs import InputQueue, InputStats, KEY_ACTIONS, decode_input
+from .sessions import parse_seen
+from .ids import chunk_id_from_coords
+from .loopmon import LoopLagMonitor
+from .metrics import counter, gauge, render
+from .profiler import Profiler, render_folded
 
 app = FastAPI(title="Voxel Server")
-hub = Hub()
+# GAME_SHARDS>0: the world lives in worker processes, see shard.py
+hub = ShardRouter(SHARDS) if SHARDS > 0 else Hub()
+loop_monitor = LoopLagMonitor()
+input_stats = InputStats()
+minimap = Minimap() if MINIMAP else None
+profiler = Profiler()   # this process's loop; shard workers run their own
 
 # NEW: בעת עליית האפליקציה - ניקוי ביטי שחקן היסטוריים מכל הצ'אנקים
 @app.on_event("startup")
 async def startup_event():
-    clear_player_bits_all()
+    loop_monitor.start()
+    if PROFILE:
+        profiler.start()
+    if not ADMIN_TOKEN:
+        print("[hub] GAME_ADMIN_TOKEN not set: /admin/fill, /admin/profile and the fill command are off")
+    await store.replay_journal()   # edits a crash left in the journal, then…
+    await store.sanitize()         # …streaming scan, skipped after a clean shutdown
+    await hub.start()
+    if minimap is not None:
+        hub.on_persist = minimap.changed
+        minimap.start()            # first build streams the store in the background
 
 # NEW (רשות אך מומלץ): בעת כיבוי - ניתוק מסודר כדי לשחזר קרקע בתאים הנוכחיים
 @app.on_event("shutdown")
 async def shutdown_event():
+    if minimap is not None:
+        await minimap.stop()
     # נעתיק לרשימה כדי לא להתנגש בשינוי תוך כדי איטרציה
-    for ws in list(hub.pos_by_ws.keys()):
+    clean = True
+    for ws in list(hub.sockets):
         try:
             await hub.disconnect(ws)
         except Exception:
-            pass
+            clean = False
+    # flush everything still in the write-behind window
+    if await hub.stop() and clean:
+        await store.mark_clean_shutdown()
+    store.close()
+    loop_monitor.stop()
+    profiler.stop()
 
 @app.get("/")
 def root():
     return {"ok": True, "w": W, "h": H}
 
+@app.get("/stats")
+def stats():
+    return {
+        "loop": loop_monitor.snapshot(),
+        "input": input_stats.as_dict(),
+        "minimap": minimap.stats.as_dict() if minimap is not None else None,
+        **hub.stats(),
+    }
+
+# Prometheus text, see metrics.py. async: the gauges read hub state on the loop
+@app.get("/metrics")
+async def metrics():
+    sources = hub.metric_families()
+    labels, families = sources[0]
+    sources[0] = (labels, families + [
+        counter("game_loop_stalls_total", "Event loop lags over the LoopLagMonitor threshold", loop_monitor.stalls),
+        counter("game_loop_blocked_seconds_total", "Time the event loop was blocked", loop_monitor.blocked_s),
+        gauge("game_loop_max_lag_seconds", "Longest event loop lag seen", loop_monitor.max_lag_s),
+        counter("game_input_actions_total", "Actions received from sockets", input_stats.actions),
+        counter("game_input_dropped_total", "Actions dropped by the rate limit or a full queue", input_stats.dropped),
+    ])
+    return PlainTextResponse(render(sources), media_type="text/plain; version=0.0.4")
+
+# World overview tiles, see minimap.py. async: tiles are only touched on the loop
+@app.get("/minimap")
+async def minimap_index():
+    if minimap is None:
+        raise HTTPException(404, "minimap_off")
+    return minimap.index()
+
+@app.get("/minimap/{level}/{tx}/{ty}.png")
+async def minimap_tile(level: int, tx: int, ty: int, if_none_match: Optional[str] = Header(None)):
+    if minimap is None or level not in minimap.levels:
+        raise HTTPException(404, "no_such_level")
+    etag = minimap.etag(level, tx, ty)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+        minimap.stats.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(minimap.png(level, tx, ty), media_type="image/png", headers=headers)
+
+def admin_ok(token: Optional[str]) -> bool:
+    # no GAME_ADMIN_TOKEN: admin commands are off, not open
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(str(token or ""), ADMIN_TOKEN)
+
+def require_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(403, "admin_disabled")
+    if not admin_ok(token):
+        raise HTTPException(403, "bad_admin_token")
+
+# Bulk terrain edit over a world rectangle, see paint.py for the body
+@app.post("/admin/fill")
+async def admin_fill(data: Dict[str, Any] = Body(...), x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        spec = Fill.from_dict(data)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"ok": True, **await hub.fill(spec)}
+
+# Sampling profiler, see profiler.py: {"on": true, "hz": 97} / {"on": false};
+# GET returns folded stacks (?reset=1 starts over), per shard when sharded
+@app.post("/admin/profile")
+async def admin_profile(data: Dict[str, Any] = Body(...), x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        hz = float(data.get("hz") or profiler.hz)
+    except (TypeError, ValueError):
+        raise HTTPException(400, "bad_hz")
+    if not 1 <= hz <= 1000:
+        raise HTTPException(400, "bad_hz")
+    if data.get("on"):
+        profiler.start(hz)
+    else:
+        profiler.stop()
+    if SHARDS > 0:
+        hub.profile(bool(data.get("on")), hz)
+    return {"ok": True, **profiler.status()}
+
+@app.get("/admin/profile")
+async def admin_profile_dump(reset: bool = False, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    stacks = profiler.folded(reset)
+    if SHARDS > 0:
+        stacks = {f"front;{k}": v for k, v in stacks.items()}
+        for i, shard in enumerate(await hub.profiles(reset)):
+            stacks.update((f"shard-{i};{k}", v) for k, v in shard.items())
+    return PlainTextResponse(render_folded(stacks))
+
 @app.websocket("/ws")
 async def ws_endpoint(ws: WebSocket):
     await ws.accept()
-    await hub.connect(ws)
+    # ?fmt=bin / ?fmt=binz opt into binary frames; JSON stays the default
+    fmt = parse_format(ws.query_params.get("fmt"))
+    # ?resume=<token>&seen=...: take over a dropped session, see sessions.py
+    token = ws.query_params.get("resume")
+    if not (token and await hub.resume(ws, fmt, token, parse_seen(ws.query_params.get("seen")))):
+        await hub.connect(ws, fmt)
+    # keys go through a per-socket queue (rate limit, batching), see inputs.py
+    inputs = InputQueue(hub, ws, input_stats)
+    code = None   # None: the connection broke; the session is held for a resume
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                code = msg.get("code")
+                break
+            if msg.get("bytes") is not None:
+                # binary input: <I seq> + one byte per command
+                try:
+                    seq, actions = decode_input(msg["bytes"])
+                except ValueError:
+                    continue
+                inputs.push(actions, seq)
+                continue
+            try:
+                data = json.loads(msg.get("text") or "")
+            except ValueError:
+                continue
+            if not isinstance(data, dict):
+                continue
+            k = str(data.get("k") or "").lower()
+            if k == "view":
+                # {"k": "view", "r": R}: also watch the chunks within R of ours
+                try:
+                    radius = int(data.get("r") or 0)
+                except (TypeError, ValueError):
+                    continue
+                await hub.set_view(ws, radius)
+                continue
+            if k == "fill":
+                # same body as POST /admin/fill, plus "token"
+                if admin_ok(data.get("token")):
+                    try:
+                        await hub.fill(Fill.from_dict(data))
+                    except ValueError as e:
+                        print(f"[hub] fill rejected: {e}")
+                continue
+            action = KEY_ACTIONS.get(k)
+            if action:
+                inputs.push((action,))
+    except WebSocketDisconnect as e:
+        code = e.code
+    except RuntimeError:
+        # receive after a failed send already closed the socket
+        pass
+    finally:
+        await inputs.close()
+        # a clean close (1000 normal, 1001 going away) ends the session
+        await hub.disconnect(ws, hold=code not in (1000, 1001))
+
+def parse_chunks(items) -> Optional[List[str]]:
+    """["cx,cy", [cx, cy], ...] -> chunk ids; None if malformed or longer than SPECTATE_MAX_CHUNKS."""
+    if not isinstance(items, list) or len(items) > SPECTATE_MAX_CHUNKS:
+        return None
+    out: Dict[str, None] = {}   # ordered set
+    for item in items:
+        try:
+            cx, cy = (int(v) for v in (item.split(",") if isinstance(item, str) else item))
+        except (TypeError, ValueError):
+            return None
+        out[chunk_id_from_coords(cx, cy)] = None
+    return list(out)
+
+# Read-only watch mode: ?chunks=<cx>,<cy>;... and/or {"k": "watch", "chunks": [...]}
+# later; frames as on /ws (?fmt=), no player, no input
+@app.websocket("/spectate")
+async def spectate_endpoint(ws: WebSocket):
+    await ws.accept()
+    if len(hub.spectating) >= SPECTATORS_MAX:
+        await ws.close(code=1013)
+        return
+    fmt = parse_format(ws.query_params.get("fmt"))
+    query = ws.query_params.get("chunks")
     try:
+        # maxsplit: an oversized list stays oversized without splitting all of it
+        await hub.spectate(ws, fmt, parse_chunks(query.split(";", SPECTATE_MAX_CHUNKS) if query else []) or [])
         while True:
-            msg = await ws.receive_text()
-            data = json.loads(msg)
-            k = (data.get("k") or "").lower()
-            if k in ("arrowup", "up"):
-                await hub.move(ws, -1, 0)
-            elif k in ("arrowdown", "down"):
-                await hub.move(ws, +1, 0)
-            elif k in ("arrowleft", "left"):
-                await hub.move(ws, 0, -1)
-            elif k in ("arrowright", "right"):
-                await hub.move(ws, 0, +1)
-            elif k in ("c", "color", "color++"):
-                await hub.color_plus_plus(ws)
-            elif k in ("whereami",):
-                await hub._send_chunk(ws)
-    except WebSocketDisconnect:
-        await hub.disconnect(ws)
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            try:
+                data = json.loads(msg.get("text") or "")
+            except ValueError:
+                continue
+            if not isinstance(data, dict) or str(data.get("k") or "").lower() != "watch":
+                continue
+            cids = parse_chunks(data.get("chunks"))
+            if cids is not None:
+                await hub.spectate(ws, fmt, cids)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        hub.unspectate(ws)
 
 if __name__ == "__main__":
     uvicorn.run("server.main:app",
@@ -0,0 +1,138 @@
+"""
+Hot-path instrumentation, served as Prometheus text at GET /metrics.
+
+Timing histograms are defined here and observed where the time goes: lock
+waits (locks.py), ChunkStore calls including the wait for the DB thread
+(storage.py), frame encoding and broadcast fan-out, flushes, input
+batches and bulk fills (hub.py), and per-socket queueing and sends (outbox.py). observe()
+is a bisect and three additions, so they stay on all the time.
+
+Gauges describing current state – loaded / dirty chunks, sockets, watchers
+per chunk, totals kept by the existing *Stats classes – are not tracked
+continuously; Hub.metric_families() reads them when /metrics is scraped.
+
+A family is a plain tuple, so shard workers can ship theirs to the front
+with their stats (shard.py); the front renders them with shard="<i>".
+
+    (kind, name, help, samples)   kind: "counter" | "gauge" | "histogram"
+    samples: [(labels, value)]  or, for histograms,
+             [(labels, (bounds, bucket counts, sum, count))]
+"""
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Family = Tuple[str, str, str, list]
+
+# seconds: 10 µs (a cached lock) … 5 s (a stalled disk)
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float] = BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)   # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class HistogramFamily:
+    """A histogram, or one per value of a single label."""
+    def __init__(self, name: str, help: str, label: Optional[str] = None, bounds: Sequence[float] = BUCKETS) -> None:
+        self.name, self.help, self.label, self.bounds = name, help, label, bounds
+        self._children: Dict[str, Histogram] = {}
+        self._plain = Histogram(bounds) if label is None else None
+
+    def observe(self, v: float) -> None:
+        self._plain.observe(v)
+
+    def labels(self, value: str) -> Histogram:
+        h = self._children.get(value)
+        if h is None:
+            h = self._children[value] = Histogram(self.bounds)
+        return h
+
+    def family(self) -> Family:
+        items = [({}, self._plain)] if self._plain is not None else [
+            ({self.label: v}, h) for v, h in sorted(self._children.items())]
+        return ("histogram", self.name, self.help,
+                [(labels, (h.bounds, list(h.counts), h.sum, h.count)) for labels, h in items])
+
+
+REGISTRY: List[HistogramFamily] = []
+
+def histogram(name: str, help: str, label: Optional[str] = None) -> HistogramFamily:
+    fam = HistogramFamily(name, help, label)
+    REGISTRY.append(fam)
+    return fam
+
+
+LOCK_WAIT   = histogram("game_lock_wait_seconds", "Time to acquire a chunk lock in LockTable.hold")
+STORE       = histogram("game_store_seconds", "ChunkStore call, including the wait for the DB thread", "op")
+ENCODE      = histogram("game_encode_seconds", "Encoding one frame (once per format per broadcast)", "kind")
+BROADCAST   = histogram("game_broadcast_seconds", "Hub._broadcast_chunk: one delta to every watcher of a chunk")
+FLUSH       = histogram("game_flush_seconds", "Hub.flush: one write-behind flush or checkpoint")
+INPUT       = histogram("game_input_batch_seconds", "Hub.handle_batch: one socket's queued actions")
+FILL        = histogram("game_fill_seconds", "Hub.fill: one bulk edit, locks and loads included")
+OUTBOX_WAIT = histogram("game_outbox_wait_seconds", "Time a frame sat in a socket's outbox before its send")
+SEND        = histogram("game_socket_send_seconds", "One WebSocket send")
+
+
+def collect() -> List[Family]:
+    return [fam.family() for fam in REGISTRY]
+
+
+# ── families read at scrape time ─────────────────────────────────────────────
+def gauge(name: str, help: str, value: float) -> Family:
+    return ("gauge", name, help, [({}, value)])
+
+def counter(name: str, help: str, value: float) -> Family:
+    return ("counter", name, help, [({}, value)])
+
+def distribution(name: str, help: str, values: Iterable[float], bounds: Sequence[float]) -> Family:
+    """A histogram of current values (e.g. watchers per chunk), built on the spot."""
+    h = Histogram(bounds)
+    for v in values:
+        h.observe(v)
+    return ("histogram", name, help, [({}, (h.bounds, h.counts, h.sum, h.count))])
+
+
+# ── text format ──────────────────────────────────────────────────────────────
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+def _num(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+def render(sources: Iterable[Tuple[Dict[str, str], List[Family]]]) -> str:
+    """Prometheus text format 0.0.4; `sources` = (extra labels, families), e.g. one per shard."""
+    merged: Dict[str, Tuple[str, str, list]] = {}
+    for extra, families in sources:
+        for kind, name, help, samples in families:
+            entry = merged.setdefault(name, (kind, help, []))
+            entry[2].extend(({**extra, **labels}, value) for labels, value in samples)
+    out: List[str] = []
+    for name, (kind, help, samples) in merged.items():
+        out.append(f"# HELP {name} {help}")
+        out.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if kind != "histogram":
+                out.append(f"{name}{_labels(labels)} {_num(value)}")
+                continue
+            bounds, counts, total, count = value
+            cum = 0
+            for le, n in zip(list(bounds) + ["+Inf"], counts):
+                cum += n
+                out.append(f"{name}_bucket{_labels({**labels, 'le': le if le == '+Inf' else _num(le)})} {cum}")
+            out.append(f"{name}_sum{_labels(labels)} {_num(total)}")
+            out.append(f"{name}_count{_labels(labels)} {count}")
+    return "\n".join(out) + "\n"
@@ -0,0 +1,217 @@
+"""
+World overview tiles (GAME_MINIMAP=1).
+
+A pyramid of TILE×TILE px RGB tiles, one layer per entry of MINIMAP_LEVELS
+(cells per pixel side: 4 → a tile spans 16×16 chunks, 64 → one pixel per
+chunk and 256×256 chunks per tile). A pixel is the mean ground color of its
+cells, 2-bit channels scaled to 0..255; the player bit is ignored. Tiles
+only exist where something was drawn – anywhere else is the blank tile.
+
+The first build streams the chunk store page by page (ChunkStore.iter_chunks)
+in the background, so a big world never sits in memory. After that the Hub
+reports every chunk it persisted (Hub.on_persist → changed()), and every
+MINIMAP_REFRESH_S those chunks are read back from the store and redrawn.
+Reading the store rather than the Hub's boards works the same for shard
+workers, which live in other processes.
+
+Each tile carries a version, bumped when a redraw changed its pixels, and
+caches its PNG until then; the ETag is built from it, so a client revalidating
+an unchanged tile gets a 304 without anything being encoded.
+"""
+import asyncio, struct, time, zlib
+from typing import Dict, Iterable, Optional, Set, Tuple
+import numpy as np
+
+from .settings import W, H, MINIMAP_LEVELS, MINIMAP_REFRESH_S, MINIMAP_BATCH
+from .bits import R2, G2, B2
+from .ids import coords_from_chunk_id
+from .storage import store
+
+TILE = 256
+BLANK_ETAG = '"blank"'
+RGB2 = np.stack([R2, G2, B2], axis=1)   # byte -> (r, g, b) 0..3; pixels scale the mean by 85
+
+
+def encode_png(px: np.ndarray) -> bytes:
+    """8-bit RGB PNG of an (h, w, 3) uint8 array, no filtering."""
+    h, w, _ = px.shape
+    raw = np.zeros((h, 1 + w * 3), dtype=np.uint8)   # filter byte 0 per row
+    raw[:, 1:] = px.reshape(h, -1)
+
+    def part(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    return (b"\x89PNG\r\n\x1a\n"
+            + part(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+            + part(b"IDAT", zlib.compress(raw.tobytes(), 6))
+            + part(b"IEND", b""))
+
+
+_blank_png: Optional[bytes] = None
+
+def blank_png() -> bytes:
+    global _blank_png
+    if _blank_png is None:
+        _blank_png = encode_png(np.zeros((TILE, TILE, 3), dtype=np.uint8))
+    return _blank_png
+
+
+class Tile:
+    __slots__ = ("px", "version", "_png")
+
+    def __init__(self) -> None:
+        self.px = np.zeros((TILE, TILE, 3), dtype=np.uint8)
+        self.version = 0
+        self._png: Optional[bytes] = None
+
+    def png(self) -> bytes:
+        if self._png is None:
+            self._png = encode_png(self.px)
+        return self._png
+
+
+class MinimapStats:
+    def __init__(self) -> None:
+        self.build_s: Optional[float] = None   # None until the first build is done
+        self.scanned = 0       # chunks read by the first build
+        self.redrawn = 0       # chunks redrawn after a persist
+        self.tiles_changed = 0
+        self.encoded = 0       # PNGs encoded
+        self.served = 0
+        self.not_modified = 0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "built": self.build_s is not None,
+            "build_s": round(self.build_s, 3) if self.build_s is not None else None,
+            "scanned": self.scanned,
+            "redrawn": self.redrawn,
+            "tiles_changed": self.tiles_changed,
+            "encoded": self.encoded,
+            "served": self.served,
+            "not_modified": self.not_modified,
+        }
+
+
+class Minimap:
+    """Tiles keyed (level, tx, ty); everything here runs on the event loop."""
+    def __init__(self, levels: Iterable[int] = MINIMAP_LEVELS) -> None:
+        self.levels: Tuple[int, ...] = tuple(sorted(set(levels)))
+        for s in self.levels:
+            if s <= 0 or W % s or H % s or TILE % (W // s) or TILE % (H // s):
+                raise ValueError(f"minimap level {s} does not tile {H}x{W} chunks")
+        self.tiles: Dict[Tuple[int, int, int], Tile] = {}
+        self.epoch = f"{int(time.time()):x}"   # a restart rebuilds tiles from version 0
+        self.stats = MinimapStats()
+        self._pending: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    # ── drawing ───────────────────────────────────────────────────────────────
+    def draw(self, cid: str, arr: Optional[np.ndarray]) -> None:
+        """Redraw chunk `cid` (None = not stored, i.e. empty) in every level."""
+        cx, cy = coords_from_chunk_id(cid)
+        # per-level sums of the 2-bit channels, each from the level below
+        # when the sizes nest (4 → 16 → 64), else from the cells
+        cells = np.take(RGB2, arr.reshape(-1), axis=0).reshape(H, W, 3) if arr is not None else None
+        sums, step = cells, 1
+        for s in self.levels:
+            ph, pw = H // s, W // s                  # the chunk's pixels at this level
+            ky, kx = TILE // ph, TILE // pw          # chunks per tile side
+            if cells is None:
+                px = np.zeros((ph, pw, 3), dtype=np.uint8)
+            else:
+                if s % step:
+                    sums, step = cells, 1
+                f = s // step
+                sums = np.add.reduce(np.add.reduce(sums.reshape(ph, f, pw, f, 3), axis=1, dtype=np.uint16), axis=2)
+                step, n = s, s * s
+                px = ((sums.astype(np.uint32) * 85 + n // 2) // n).astype(np.uint8)
+            tile = self.tiles.get((s, cx // kx, cy // ky))
+            if tile is None:
+                if not px.any():
+                    continue   # still blank
+                tile = self.tiles[(s, cx // kx, cy // ky)] = Tile()
+            y0, x0 = (cy % ky) * ph, (cx % kx) * pw
+            dst = tile.px[y0:y0 + ph, x0:x0 + pw]
+            if not np.array_equal(dst, px):
+                dst[...] = px
+                tile.version += 1
+                tile._png = None
+                self.stats.tiles_changed += 1
+
+    def changed(self, cids: Iterable[str]) -> None:
+        """Hub.on_persist: these chunks were written to the store."""
+        self._pending.update(cids)
+
+    async def build(self) -> None:
+        t0 = time.perf_counter()
+        async for page in store.iter_chunks(MINIMAP_BATCH):
+            for cid, arr in page:
+                self.draw(cid, arr)
+            self.stats.scanned += len(page)
+        self.stats.build_s = time.perf_counter() - t0
+        print(f"[minimap] {self.stats.scanned} chunks → {len(self.tiles)} tiles "
+              f"in {self.stats.build_s:.2f}s")
+
+    async def refresh(self) -> None:
+        """Redraw everything persisted since the last call."""
+        cids, self._pending = sorted(self._pending), set()
+        for i in range(0, len(cids), MINIMAP_BATCH):
+            try:
+                page = await store.read_chunks(cids[i:i + MINIMAP_BATCH])
+            except Exception:
+                self._pending.update(cids[i:])   # retried next time
+                raise
+            for cid, arr in page:
+                self.draw(cid, arr)
+            self.stats.redrawn += len(page)
+
+    async def _run(self) -> None:
+        await self.build()
+        while True:
+            await asyncio.sleep(MINIMAP_REFRESH_S)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"[minimap] refresh failed: {e!r}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    # ── serving ───────────────────────────────────────────────────────────────
+    def etag(self, level: int, tx: int, ty: int) -> str:
+        tile = self.tiles.get((level, tx, ty))
+        if tile is None:
+            return BLANK_ETAG
+        return f'"{self.epoch}-{level}-{tx}-{ty}-{tile.version}"'
+
+    def png(self, level: int, tx: int, ty: int) -> bytes:
+        self.stats.served += 1
+        tile = self.tiles.get((level, tx, ty))
+        if tile is None:
+            return blank_png()
+        if tile._png is None:
+            self.stats.encoded += 1
+        return tile.png()
+
+    def index(self) -> Dict[str, object]:
+        """Tile size and, per level, the range of tiles that exist."""
+        levels: Dict[int, Dict[str, object]] = {}
+        for s in self.levels:
+            keys = [(tx, ty) for (lv, tx, ty) in self.tiles if lv == s]
+            levels[s] = {
+                "chunks_per_tile": TILE // (W // s),
+                "tiles": len(keys),
+                "x": [min(k[0] for k in keys), max(k[0] for k in keys)] if keys else None,
+                "y": [min(k[1] for k in keys), max(k[1] for k in keys)] if keys else None,
+            }
+        return {"tile": TILE, "levels": levels, **self.stats.as_dict(), "pending": len(self._pending)}
@@ -0,0 +1,73 @@
+import random
+from typing import Iterator, Optional, Tuple
+import numpy as np
+
+from .settings import W, H
+from .bits import PLAYER_MASK
+
+
+class FreeCells:
+    """
+    Empty (no player bit) cells of one chunk as flat indices r*W + c.
+
+    A dense array (the first _n entries) plus a position table gives O(1)
+    add, discard and uniform random pick; both are int16, 2 * 2 * H*W bytes
+    per chunk. Hub._set_cell keeps it in sync with the board.
+    """
+    def __init__(self, board: np.ndarray) -> None:
+        free = np.flatnonzero((board.reshape(-1) & PLAYER_MASK) == 0)
+        self._cells = np.empty(H * W, dtype=np.int16)
+        self._cells[:len(free)] = free
+        self._n = len(free)
+        self._pos = np.full(H * W, -1, dtype=np.int16)
+        self._pos[free] = np.arange(len(free), dtype=np.int16)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        return self._cells.nbytes + self._pos.nbytes
+
+    def __contains__(self, cell: int) -> bool:
+        return self._pos[cell] >= 0
+
+    def add(self, cell: int) -> None:
+        if self._pos[cell] < 0:
+            self._pos[cell] = self._n
+            self._cells[self._n] = cell
+            self._n += 1
+
+    def discard(self, cell: int) -> None:
+        i = int(self._pos[cell])
+        if i < 0:
+            return
+        self._n -= 1
+        last = int(self._cells[self._n])
+        if last != cell:            # move the last entry into the hole
+            self._cells[i] = last
+            self._pos[last] = i
+        self._pos[cell] = -1
+
+    def pick(self) -> Optional[Tuple[int, int]]:
+        """A uniformly random free (r, c), or None when the chunk is full."""
+        if not self._n:
+            return None
+        cell = int(self._cells[random.randrange(self._n)])
+        return divmod(cell, W)
+
+
+def spiral(cx: int, cy: int) -> Iterator[Tuple[int, int]]:
+    """Chunk coords ring by ring around (cx, cy): the center, then radius 1, 2, …"""
+    yield cx, cy
+    k = 1
+    while True:
+        for x in range(cx - k, cx + k + 1):
+            yield x, cy - k
+        for y in range(cy - k + 1, cy + k + 1):
+            yield cx + k, y
+        for x in range(cx + k - 1, cx - k - 1, -1):
+            yield x, cy + k
+        for y in range(cy + k - 1, cy - k, -1):
+            yield cx - k, y
+        k += 1
@@ -0,0 +1,134 @@
+import asyncio, time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Set
+
+from fastapi import WebSocket
+
+from .frames import Frame
+from .metrics import OUTBOX_WAIT, SEND
+from .settings import OUTBOX_COALESCE_AT, OUTBOX_MAX, OUTBOX_MAX_LAG_S
+
+
+class OutboxStats:
+    """Counters shared by every Outbox of one Hub."""
+    def __init__(self) -> None:
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.coalesced = 0        # queued frames replaced by a later snapshot
+        self.dropped_clients = 0  # kicked for lagging past the limits
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "coalesced": self.coalesced,
+            "dropped_clients": self.dropped_clients,
+        }
+
+
+class _Item:
+    __slots__ = ("cid", "frame", "t")
+
+    def __init__(self, cid: str, frame: Optional[Frame], t: float) -> None:
+        self.cid = cid
+        self.frame = frame   # None = resync marker, encoded when it is sent
+        self.t = t
+
+
+class Outbox:
+    """
+    Bounded send queue for one socket, drained by its own writer task, so a
+    slow client only ever delays itself.
+
+    Once more than OUTBOX_COALESCE_AT frames are waiting, everything queued
+    for a chunk collapses into one resync marker; the writer turns it into a
+    snapshot of the chunk as it is *when sent* (via `resync`), and further
+    deltas for that chunk are skipped until then. A client that still has
+    OUTBOX_MAX frames waiting, or whose oldest frame is older than
+    OUTBOX_MAX_LAG_S, is dropped via `on_drop` – as is one whose send fails.
+    """
+    def __init__(
+        self,
+        ws: WebSocket,
+        stats: OutboxStats,
+        resync: Callable[[WebSocket, str], Optional[Frame]],
+        on_drop: Callable[[WebSocket], Any],
+    ) -> None:
+        self.ws = ws
+        self.stats = stats
+        self._resync = resync
+        self._on_drop = on_drop
+        self._q: Deque[_Item] = deque()
+        self._resyncing: Set[str] = set()   # cids with a pending marker
+        self._wake = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.create_task(self._writer())
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+    def resyncing(self, cid: str) -> bool:
+        return cid in self._resyncing
+
+    def push(self, cid: str, frame: Frame, snapshot: bool = False) -> None:
+        if self._closed:
+            return
+        now = time.monotonic()
+        if self._q and (len(self._q) >= OUTBOX_MAX or now - self._q[0].t > OUTBOX_MAX_LAG_S):
+            self.stats.dropped_clients += 1
+            self.close()
+            self._on_drop(self.ws)
+            return
+        if snapshot:
+            self._drop_pending(cid)          # superseded by this snapshot
+            self._q.append(_Item(cid, frame, now))
+        elif len(self._q) >= OUTBOX_COALESCE_AT:
+            self._drop_pending(cid)
+            self._resyncing.add(cid)
+            self._q.append(_Item(cid, None, now))
+        else:
+            self._q.append(_Item(cid, frame, now))
+        self._wake.set()
+
+    def _drop_pending(self, cid: str) -> None:
+        before = len(self._q)
+        self._q = deque(it for it in self._q if it.cid != cid)
+        self.stats.coalesced += before - len(self._q)
+        self._resyncing.discard(cid)
+
+    async def _writer(self) -> None:
+        while not self._closed:
+            if not self._q:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            item = self._q.popleft()
+            frame = item.frame
+            if frame is None:
+                self._resyncing.discard(item.cid)
+                frame = self._resync(self.ws, item.cid)
+                if frame is None:
+                    continue
+            t0 = time.monotonic()
+            OUTBOX_WAIT.observe(t0 - item.t)
+            try:
+                if isinstance(frame, bytes):
+                    await self.ws.send_bytes(frame)
+                else:
+                    await self.ws.send_text(frame)
+            except Exception:
+                self.close()
+                self._on_drop(self.ws)
+                return
+            SEND.observe(time.monotonic() - t0)
+            self.stats.frames_sent += 1
+            self.stats.bytes_sent += len(frame)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._q.clear()
+        self._resyncing.clear()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
@@ -0,0 +1,79 @@
+"""
+Bulk terrain edits over a world rectangle (Hub.fill).
+
+World cell coordinates: x = cx*W + c, y = cy*H + r. A request covers the
+cells [x, x+w) × [y, y+h) and is one of
+
+    fill      ground color := color
+    recolor   ground color := color, where it is `src`
+    clear     ground color := 0
+
+given as {"x", "y", "w", "h", "op", "color": [r, g, b], "src": [r, g, b]}
+with 2-bit channels, as in bits.make_color. Only color bits change: player
+and link bits are kept, and a player standing in the rectangle stays drawn
+– the edit applies to the ground under it, which comes back when it leaves.
+
+Every op is one 256-entry table (bits.recolor_table); each chunk's part of
+the rectangle is rewritten with one gather.
+"""
+from typing import Any, Dict, Iterator, Optional, Tuple
+import numpy as np
+
+from .settings import W, H, FILL_MAX_CELLS
+from .bits import make_color, recolor_table
+from .ids import chunk_id_from_coords
+
+OPS = ("fill", "recolor", "clear")
+BATCH_CHUNKS = 64   # chunks locked, loaded and rewritten together
+
+
+def _color(value: Any, name: str) -> int:
+    if not isinstance(value, (list, tuple)) or len(value) != 3:
+        raise ValueError(f"{name} must be [r, g, b]")
+    r, g, b = (int(x) for x in value)
+    if not all(0 <= x <= 3 for x in (r, g, b)):
+        raise ValueError(f"{name} channels are 0..3")
+    return make_color(r, g, b)
+
+
+class Fill:
+    """One validated bulk edit; plain attributes, so it pickles to shard workers."""
+    def __init__(self, x: int, y: int, w: int, h: int, op: str = "fill", color: int = 0, src: Optional[int] = None) -> None:
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.op = op
+        self.color = color
+        self.src = src
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Fill":
+        """Parse a request body / socket message; ValueError says what is wrong."""
+        try:
+            x, y, w, h = (int(data[k]) for k in ("x", "y", "w", "h"))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("x, y, w, h must be integers")
+        if w <= 0 or h <= 0:
+            raise ValueError("w and h must be positive")
+        if w * h > FILL_MAX_CELLS:
+            raise ValueError(f"at most {FILL_MAX_CELLS} cells per request")
+        op = str(data.get("op") or "fill").lower()
+        if op not in OPS:
+            raise ValueError(f"op must be one of {', '.join(OPS)}")
+        color = _color(data.get("color"), "color") if op != "clear" else 0
+        src = _color(data.get("src"), "src") if op == "recolor" else None
+        return cls(x, y, w, h, op, color, src)
+
+    def table(self) -> np.ndarray:
+        return recolor_table(self.color, self.src)
+
+    def spans(self) -> Iterator[Tuple[str, slice, slice]]:
+        """(cid, rows, cols): the part of the rectangle inside each chunk, row by row of chunks."""
+        for cy in range(self.y // H, (self.y + self.h - 1) // H + 1):
+            r0 = max(self.y - cy * H, 0)
+            r1 = min(self.y + self.h - cy * H, H)
+            for cx in range(self.x // W, (self.x + self.w - 1) // W + 1):
+                c0 = max(self.x - cx * W, 0)
+                c1 = min(self.x + self.w - cx * W, W)
+                yield chunk_id_from_coords(cx, cy), slice(r0, r1), slice(c0, c1)
+
+    def __repr__(self) -> str:
+        return f"{self.op} {self.w}x{self.h} at ({self.x}, {self.y})"
@@ -0,0 +1,36 @@
+from typing import Dict
+
+
+class PrefetchStats:
+    """Neighbour prefetch (Hub._prefetch_near) and how border crossings found their chunk."""
+    def __init__(self) -> None:
+        self.issued = 0
+        self.skipped = 0       # over PREFETCH_MAX_INFLIGHT
+        self.failed = 0
+        self.crossings = 0
+        self.hits = 0          # target chunk already resident
+        self.late = 0          # prefetch still in flight: waited for the rest of it
+        self.misses = 0        # loaded on the spot
+        self.wait_s = 0.0
+        self.max_wait_s = 0.0
+
+    def crossing(self, kind: str, wait_s: float) -> None:
+        self.crossings += 1
+        setattr(self, kind, getattr(self, kind) + 1)
+        self.wait_s += wait_s
+        self.max_wait_s = max(self.max_wait_s, wait_s)
+
+    def as_dict(self) -> Dict[str, float]:
+        n = max(self.crossings, 1)
+        return {
+            "issued": self.issued,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "crossings": self.crossings,
+            "hits": self.hits,
+            "late": self.late,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / n, 4),
+            "wait_ms_avg": round(self.wait_s / n * 1000, 3),
+            "wait_ms_max": round(self.max_wait_s * 1000, 3),
+        }
@@ -0,0 +1,241 @@
+"""
+Memory-mapped region files: the GAME_STORAGE=regions backend.
+
+Chunks are grouped REGION×REGION per file (data/regions/r.<rx>.<ry>.region).
+Every file is created at its full size – sparse, so only written slots take
+disk space – and mapped once, MAP_SHARED:
+
+    0      header   "<8sII"  magic, slots in use, bytes per chunk
+    16     table    REGION*REGION × uint32: slot+1 of each chunk, 0 = not stored
+    8192   slots    REGION*REGION × H*W raw bytes, handed out in write order
+
+load_chunk returns a torch view straight into the mapping: no query, no
+blob, no copy. The Hub mutates boards in place, so changes reach the file
+as soon as they are made. Such a board is saved as is (is_mapped): copying
+an older snapshot over it would undo whatever changed since, so save_chunks
+only msyncs its region, which is what makes a flush durable. Boards that
+are not in a mapping yet (new chunks) are copied into their slot.
+
+Slot allocation is the only read-modify-write of shared state and runs
+under flock(), so shard processes can share region files.
+"""
+import fcntl, json, mmap, os, struct
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import torch
+
+from .settings import W, H, REGION_DIR, SANITIZE
+from .bits import PLAYER_MASK
+from .ids import chunk_id_from_coords, coords_from_chunk_id
+
+REGION = 32
+SLOTS = REGION * REGION
+CHUNK_BYTES = H * W
+MAGIC = b"VOXREG01"
+_HEAD = struct.Struct("<8sII")
+TABLE_OFF = 16
+DATA_OFF = 8192
+FILE_SIZE = DATA_OFF + SLOTS * CHUNK_BYTES
+
+
+class _Region:
+    def __init__(self, path: Path) -> None:
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._locked():
+            if os.fstat(self.fd).st_size < FILE_SIZE:
+                os.ftruncate(self.fd, FILE_SIZE)
+            self.mm = mmap.mmap(self.fd, FILE_SIZE)
+            magic, _, chunk_bytes = _HEAD.unpack_from(self.mm, 0)
+            if magic == b"\0" * 8:
+                _HEAD.pack_into(self.mm, 0, MAGIC, 0, CHUNK_BYTES)
+            elif magic != MAGIC or chunk_bytes != CHUNK_BYTES:
+                raise ValueError(f"{path}: not a region file for {H}x{W} chunks")
+        self.table = np.frombuffer(self.mm, dtype="<u4", count=SLOTS, offset=TABLE_OFF)
+        self.data = np.frombuffer(self.mm, dtype=np.uint8, count=SLOTS * CHUNK_BYTES, offset=DATA_OFF).reshape(SLOTS, H, W)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    @property
+    def used(self) -> int:
+        return _HEAD.unpack_from(self.mm, 0)[1]
+
+    def slot(self, local: int, create: bool = False) -> int:
+        """Slot of chunk `local` (index in the region), -1 if not stored."""
+        s = int(self.table[local])
+        if s or not create:
+            return s - 1
+        with self._locked():
+            s = int(self.table[local])   # another process may have won
+            if not s:
+                s = self.used + 1
+                _HEAD.pack_into(self.mm, 0, MAGIC, s, CHUNK_BYTES)
+                self.table[local] = s
+        return s - 1
+
+    def flush(self) -> None:
+        self.mm.flush()
+
+
+class RegionDB:
+    """Same interface as db.ChunkDB, backed by region files."""
+    def __init__(self, root: Path = REGION_DIR) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._regions: Dict[Tuple[int, int], _Region] = {}
+        # GAME_SANITIZE=lazy: stale player bits are stripped as chunks load
+        self.strip_players_on_load = SANITIZE == "lazy"
+        self.chunk_writes = 0   # slots written by save_chunks
+        self.commits = 0        # save_chunks calls that msynced something
+
+    def _path(self, rx: int, ry: int) -> Path:
+        return self.root / f"r.{rx}.{ry}.region"
+
+    def _region(self, rx: int, ry: int, create: bool) -> Optional[_Region]:
+        reg = self._regions.get((rx, ry))
+        if reg is None:
+            path = self._path(rx, ry)
+            if not create and not path.exists():
+                return None
+            reg = self._regions[(rx, ry)] = _Region(path)
+        return reg
+
+    def _all_regions(self) -> Iterator[Tuple[int, int, _Region]]:
+        for path in sorted(self.root.glob("r.*.region")):
+            _, rx, ry, _ = path.name.split(".")
+            yield int(rx), int(ry), self._region(int(rx), int(ry), create=True)
+
+    @staticmethod
+    def _locate(cid: str) -> Tuple[int, int, int]:
+        cx, cy = coords_from_chunk_id(cid)
+        return cx // REGION, cy // REGION, (cy % REGION) * REGION + cx % REGION
+
+    def is_mapped(self, cid: str, data_t: torch.Tensor) -> bool:
+        """Whether data_t is cid's slot itself (a load_chunk view), not a copy."""
+        rx, ry, local = self._locate(cid)
+        reg = self._regions.get((rx, ry))
+        slot = reg.slot(local) if reg is not None else -1
+        return slot >= 0 and np.shares_memory(reg.data[slot], data_t.numpy())
+
+    def save_chunk(self, cid: str, data_t: torch.Tensor) -> None:
+        self.save_chunks([(cid, data_t)])
+
+    def save_chunks(self, items: Iterable[Tuple[str, torch.Tensor]]) -> None:
+        """Copy each board into its slot, then msync the regions touched."""
+        touched = set()
+        for cid, t in items:
+            assert t.dtype == torch.uint8
+            arr = t.numpy()
+            rx, ry, local = self._locate(cid)
+            empty = not arr.any()
+            reg = self._region(rx, ry, create=not empty)
+            if reg is None:
+                continue   # empty and never stored: nothing to do
+            slot = reg.slot(local, create=not empty)
+            if slot < 0:
+                continue
+            dst = reg.data[slot]
+            if not np.shares_memory(dst, arr):
+                dst[...] = arr
+            touched.add(reg)
+            self.chunk_writes += 1
+        for reg in touched:
+            reg.flush()
+        if touched:
+            self.commits += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {"backend": "regions", "chunk_writes": self.chunk_writes, "commits": self.commits}
+
+    def load_chunk(self, cid: str) -> Optional[torch.Tensor]:
+        """Zero-copy view of a stored chunk, or None if not stored (= empty)."""
+        rx, ry, local = self._locate(cid)
+        reg = self._region(rx, ry, create=False)
+        if reg is None:
+            return None
+        slot = reg.slot(local)
+        if slot < 0:
+            return None
+        view = reg.data[slot]
+        if self.strip_players_on_load and (view & PLAYER_MASK).any():
+            np.bitwise_and(view, 0xFF ^ PLAYER_MASK, out=view)   # fixed in the file too
+        return torch.from_numpy(view)
+
+    def touch(self, cids: Iterable[str]) -> None:
+        """Region files keep no last_used."""
+
+    def list_chunk_ids(self) -> List[str]:
+        out = []
+        for rx, ry, reg in self._all_regions():
+            for local in np.flatnonzero(reg.table):
+                ly, lx = divmod(int(local), REGION)
+                out.append(chunk_id_from_coords(rx * REGION + lx, ry * REGION + ly))
+        return out
+
+    def read_chunks(self, cids: Iterable[str]) -> List[Tuple[str, Optional[np.ndarray]]]:
+        """Views of the stored chunks (None = not stored); unlike load_chunk never strips anything."""
+        out = []
+        for cid in cids:
+            rx, ry, local = self._locate(cid)
+            reg = self._region(rx, ry, create=False)
+            slot = reg.slot(local) if reg is not None else -1
+            out.append((cid, reg.data[slot] if slot >= 0 else None))
+        return out
+
+    def scan_chunks(self, after: Optional[Tuple[int, int, int]] = None,
+                    batch: int = 256) -> Tuple[List[Tuple[str, np.ndarray]], Optional[Tuple[int, int, int]]]:
+        """
+        Same paging as ChunkDB.scan_chunks, keyed by (rx, ry, local): region
+        files in (rx, ry) order, chunks in table order. The arrays are views
+        into the mappings.
+        """
+        out: List[Tuple[str, np.ndarray]] = []
+        for rx, ry, reg in sorted(self._all_regions(), key=lambda t: t[:2]):
+            if after is not None and (rx, ry) < after[:2]:
+                continue
+            locals_ = np.flatnonzero(reg.table)
+            if after is not None and (rx, ry) == after[:2]:
+                locals_ = locals_[locals_ > after[2]]
+            for local in locals_:
+                ly, lx = divmod(int(local), REGION)
+                out.append((chunk_id_from_coords(rx * REGION + lx, ry * REGION + ly), reg.data[reg.table[local] - 1]))
+                if len(out) == batch:
+                    return out, (rx, ry, int(local))
+        return out, None
+
+    def clear_player_bits_all(self, batch: int = 0) -> Tuple[int, int]:
+        """Clear bit0 in every stored chunk, one vectorized pass per region."""
+        scanned = rewritten = 0
+        for _, _, reg in self._all_regions():
+            slots = reg.data[:reg.used]
+            dirty = (slots & PLAYER_MASK).reshape(len(slots), -1).any(axis=1)
+            n = int(dirty.sum())
+            if n:
+                slots[dirty] &= 0xFF ^ PLAYER_MASK
+                reg.flush()
+            scanned += len(slots)
+            rewritten += n
+        return scanned, rewritten
+
+    def _meta(self) -> Dict[str, str]:
+        try:
+            return json.loads((self.root / "meta.json").read_text())
+        except FileNotFoundError:
+            return {}
+
+    def get_meta(self, key: str) -> Optional[str]:
+        return self._meta().get(key)
+
+    def set_meta(self, key: str, value: str) -> None:
+        meta = self._meta()
+        meta[key] = value
+        tmp = self.root / "meta.json.tmp"
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.root / "meta.json")
@@ -0,0 +1,120 @@
+"""
+Resumable sessions (SESSION_GRACE_S > 0).
+
+Every player gets a resume token in a "session" frame right after it
+spawns. When its socket drops without a clean close, the Hub (or, with
+GAME_SHARDS, the ShardRouter) keeps the player on its cell for the grace
+period instead of disconnecting it. A new socket that connects with
+/ws?resume=<token> inside that window takes the player over, and the old
+token stops working: a fresh one comes with the resume.
+
+The token table is all this module keeps; what "holding" a player means
+is up to its owner, which also supplies `expire`, run when the grace
+period ends without a resume.
+"""
+import asyncio, secrets
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .ids import chunk_id_from_coords
+
+
+class SessionStats:
+    def __init__(self) -> None:
+        self.issued = 0
+        self.resumed = 0
+        self.taken_over = 0   # resumed while the old socket still looked alive
+        self.expired = 0
+        self.refused = 0      # unknown, expired or already used token
+        self.caught_up = 0    # chunks brought up to date with one merged delta
+        self.current = 0      # chunks the client already held at the current version
+        self.snapshots = 0    # chunks whose history did not reach back far enough
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "issued": self.issued,
+            "resumed": self.resumed,
+            "taken_over": self.taken_over,
+            "expired": self.expired,
+            "refused": self.refused,
+            "caught_up": self.caught_up,
+            "current": self.current,
+            "snapshots": self.snapshots,
+        }
+
+
+class Sessions:
+    def __init__(self, grace_s: float, expire: Callable[[Any], Awaitable[None]]) -> None:
+        self.grace_s = grace_s
+        self._expire = expire
+        self._by_token: Dict[str, Tuple[Any, str]] = {}   # token -> (ws, fmt)
+        self._token: Dict[Any, str] = {}                  # ws -> token
+        self._timers: Dict[Any, asyncio.TimerHandle] = {} # held ws -> expiry
+        self.stats = SessionStats()
+
+    def __len__(self) -> int:
+        return len(self._token)
+
+    @property
+    def held(self) -> int:
+        return len(self._timers)
+
+    def is_held(self, ws: Any) -> bool:
+        return ws in self._timers
+
+    def issue(self, ws: Any, fmt: str) -> str:
+        token = secrets.token_urlsafe(18)
+        self._by_token[token] = (ws, fmt)
+        self._token[ws] = token
+        self.stats.issued += 1
+        return token
+
+    def hold(self, ws: Any) -> bool:
+        """Start the grace period of ws's session; False if it has none."""
+        if ws not in self._token:
+            return False
+        if ws not in self._timers:
+            self._timers[ws] = asyncio.get_running_loop().call_later(self.grace_s, self._expired, ws)
+        return True
+
+    def _expired(self, ws: Any) -> None:
+        self._timers.pop(ws, None)
+        self.stats.expired += 1
+        self.forget(ws)
+        asyncio.create_task(self._expire(ws))
+
+    def take(self, token: str) -> Optional[Tuple[Any, str, bool]]:
+        """(ws, fmt, was held) of the session behind `token`, which is used up; None if there is none."""
+        entry = self._by_token.pop(token, None) if isinstance(token, str) else None
+        if entry is None:
+            self.stats.refused += 1
+            return None
+        ws, fmt = entry
+        del self._token[ws]
+        timer = self._timers.pop(ws, None)
+        if timer is not None:
+            timer.cancel()
+        else:
+            self.stats.taken_over += 1
+        self.stats.resumed += 1
+        return ws, fmt, timer is not None
+
+    def forget(self, ws: Any) -> None:
+        token = self._token.pop(ws, None)
+        if token is not None:
+            del self._by_token[token]
+        timer = self._timers.pop(ws, None)
+        if timer is not None:
+            timer.cancel()
+
+
+def parse_seen(text: Optional[str]) -> Dict[str, int]:
+    """?seen=<cx>,<cy>:<version>;... – the chunk versions a resuming client holds. Bad entries are skipped."""
+    out: Dict[str, int] = {}
+    for item in (text or "").split(";"):
+        cid, _, version = item.rpartition(":")
+        try:
+            cx, cy = (int(v) for v in cid.split(","))
+            out[chunk_id_from_coords(cx, cy)] = int(version)
+        except ValueError:
+            continue
+    return out
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 import torch
 
@@ -20,4 +21,117 @@ COLOR_BITS = {
 # SQLite file path
 DATA_DIR = Path("data")
 DATA_DIR.mkdir(parents=True, exist_ok=True)  # creates ./data if missing
-DB_PATH = DATA_DIR/ "world.db"
+DB_PATH = Path(os.getenv("GAME_DB_PATH", str(DATA_DIR / "world.db")))   # e.g. a scratch DB for bench/load.py
+
+# Chunk storage backend: "sqlite" (db.ChunkDB, DB_PATH) or "regions" –
+# memory-mapped region files under REGION_DIR (regions.py), loaded as
+# zero-copy views; suits big, mostly-read worlds. Move a world between
+# backends with `python -m game.convert`.
+STORAGE = os.getenv("GAME_STORAGE", "sqlite")
+REGION_DIR = DATA_DIR / "regions"
+
+# Write-behind persistence: Hub marks chunks dirty and a background flusher
+# writes them all in one transaction every FLUSH_INTERVAL_MS, or sooner once
+# FLUSH_MAX_CHANGES changes piled up. FLUSH_INTERVAL_MS is the durability
+# window; 0 writes every change through immediately (old behaviour).
+FLUSH_INTERVAL_MS = int(os.getenv("GAME_FLUSH_INTERVAL_MS", "250"))
+FLUSH_MAX_CHANGES = int(os.getenv("GAME_FLUSH_MAX_CHANGES", "512"))
+
+# Event-sourced persistence (journal.py). 1 = every cell write is appended
+# to a per-process log (15 bytes per cell, synced every FLUSH_INTERVAL_MS);
+# whole chunks are only written at checkpoints – every JOURNAL_CHECKPOINT_S
+# or once the log holds JOURNAL_MAX_BYTES – after which the log is emptied.
+# Logs left by a crash are replayed at startup either way.
+JOURNAL = os.getenv("GAME_JOURNAL", "0") != "0"
+JOURNAL_DIR = DATA_DIR / "journal"
+JOURNAL_CHECKPOINT_S = float(os.getenv("GAME_JOURNAL_CHECKPOINT_S", "60"))
+JOURNAL_MAX_BYTES = int(os.getenv("GAME_JOURNAL_MAX_BYTES", str(4 << 20)))
+
+# Startup sanitizer for player bits left behind by a crash.
+#   scan – stream every chunk once at startup and rewrite those with player
+#          bits; skipped when the previous run shut down cleanly
+#   lazy – never scan; strip player bits whenever a chunk is loaded
+SANITIZE = os.getenv("GAME_SANITIZE", "scan")
+SANITIZE_BATCH = int(os.getenv("GAME_SANITIZE_BATCH", "256"))   # rows per fetch
+
+# Run SQLite on a dedicated thread instead of the event loop (0 = inline).
+DB_OFFLOAD = os.getenv("GAME_DB_OFFLOAD", "1") != "0"
+
+# In-memory chunk cache. Unwatched chunks are evicted LRU-first once the
+# cache holds more than CACHE_MAX_CHUNKS chunks (or CACHE_MAX_BYTES, if set).
+# CACHE_MAX_BYTES counts everything a chunk keeps resident, not just its
+# board – see cache.chunk_footprint().
+CACHE_MAX_CHUNKS = int(os.getenv("GAME_CACHE_MAX_CHUNKS", "1024"))
+CACHE_MAX_BYTES  = int(os.getenv("GAME_CACHE_MAX_BYTES", "0"))
+
+# Neighbour prefetch: a player within PREFETCH_CELLS cells of a chunk edge
+# gets the chunk across that edge loaded in the background (0 = off), at most
+# PREFETCH_MAX_INFLIGHT loads at a time.
+PREFETCH_CELLS = int(os.getenv("GAME_PREFETCH_CELLS", "8"))
+PREFETCH_MAX_INFLIGHT = int(os.getenv("GAME_PREFETCH_MAX_INFLIGHT", "4"))
+
+# Area of interest: a client may ask ({"k": "view", "r": R}) to watch every
+# chunk within R chunks of its own; R is capped at VIEW_MAX_RADIUS.
+VIEW_MAX_RADIUS = int(os.getenv("GAME_VIEW_MAX_RADIUS", "2"))
+
+# Bulk terrain edits (paint.py: POST /admin/fill, {"k": "fill"} on the
+# socket) and /admin/profile need ADMIN_TOKEN (X-Admin-Token header /
+# "token" field); unset, they are off.
+ADMIN_TOKEN = os.getenv("GAME_ADMIN_TOKEN", "")
+FILL_MAX_CELLS = int(os.getenv("GAME_FILL_MAX_CELLS", str(1 << 24)))   # per request
+
+# Client input (inputs.py): each connection may apply INPUT_RATE actions/s,
+# bursts of up to INPUT_BURST (0 = no limit); past that, and past
+# INPUT_QUEUE_MAX actions waiting, inputs are dropped.
+INPUT_RATE      = float(os.getenv("GAME_INPUT_RATE", "30"))
+INPUT_BURST     = int(os.getenv("GAME_INPUT_BURST", "60"))
+INPUT_QUEUE_MAX = int(os.getenv("GAME_INPUT_QUEUE_MAX", "256"))
+
+# World overview (minimap.py, GET /minimap/<level>/<tx>/<ty>.png): 256×256 px
+# tiles at each of MINIMAP_LEVELS cells per pixel side (64 = a pixel per
+# chunk). Built once at startup by streaming the chunk store MINIMAP_BATCH
+# chunks at a time, then redrawn every MINIMAP_REFRESH_S from the chunks
+# the Hub persisted meanwhile (in journal mode: at checkpoints). 0 = off.
+MINIMAP = os.getenv("GAME_MINIMAP", "1") != "0"
+MINIMAP_LEVELS = tuple(int(s) for s in os.getenv("GAME_MINIMAP_LEVELS", "4,16,64").split(","))
+MINIMAP_REFRESH_S = float(os.getenv("GAME_MINIMAP_REFRESH_S", "1"))
+MINIMAP_BATCH = int(os.getenv("GAME_MINIMAP_BATCH", "256"))
+
+# Spectators (/spectate?chunks=<cx>,<cy>;...): read-only sockets, up to
+# SPECTATORS_MAX of them, each watching up to SPECTATE_MAX_CHUNKS chunks.
+# Watching does not keep a chunk loaded: the cache bound still holds.
+SPECTATORS_MAX = int(os.getenv("GAME_SPECTATORS_MAX", "1000"))
+SPECTATE_MAX_CHUNKS = int(os.getenv("GAME_SPECTATE_MAX_CHUNKS", "16"))
+
+# Resumable sessions (sessions.py): a player whose socket drops without a
+# clean close keeps its cell for SESSION_GRACE_S (0 = off); reconnecting with
+# its token resumes it. Each chunk keeps its last SESSION_HISTORY deltas so
+# a resumed client gets one merged delta instead of a snapshot.
+SESSION_GRACE_S = float(os.getenv("GAME_SESSION_GRACE_S", "30"))
+SESSION_HISTORY = int(os.getenv("GAME_SESSION_HISTORY", "64"))
+
+# Sampling profiler (profiler.py): off until switched on with POST
+# /admin/profile (or at startup with GAME_PROFILE=1); samples the event
+# loop's stack PROFILE_HZ times a second – in every shard worker too.
+# GET /admin/profile returns folded stacks for flamegraph.pl / speedscope.
+PROFILE = os.getenv("GAME_PROFILE", "0") == "1"
+PROFILE_HZ = float(os.getenv("GAME_PROFILE_HZ", "97"))   # not a divisor of the tick rates
+
+# Per-client send queues (outbox.py): past OUTBOX_COALESCE_AT queued frames a
+# chunk's backlog collapses into one fresh snapshot; a client with
+# OUTBOX_MAX frames queued, or frames older than OUTBOX_MAX_LAG_S, is dropped.
+OUTBOX_COALESCE_AT = int(os.getenv("GAME_OUTBOX_COALESCE_AT", "64"))
+OUTBOX_MAX         = int(os.getenv("GAME_OUTBOX_MAX", "512"))
+OUTBOX_MAX_LAG_S   = float(os.getenv("GAME_OUTBOX_MAX_LAG_S", "10"))
+
+# Fixed-rate simulation tick. 0 = apply every key immediately. With e.g. 20,
+# the socket only queues intents; Hub applies them 20×/s in a fixed order and
+# broadcasts each changed chunk once per tick.
+TICK_HZ = float(os.getenv("GAME_TICK_HZ", "0"))
+TICK_MAX_INTENTS = int(os.getenv("GAME_TICK_MAX_INTENTS", "8"))   # per player per tick
+
+# Multi-process sharding (shard.py). 0 = one in-process Hub. With N > 0 the
+# web process only routes sockets; N worker processes each own the chunks
+# whose SHARD_REGION×SHARD_REGION block of chunks hashes to them.
+SHARDS = int(os.getenv("GAME_SHARDS", "0"))
+SHARD_REGION = int(os.getenv("GAME_SHARD_REGION", "4"))
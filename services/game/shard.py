@@ -0,0 +1,735 @@
+"""
+Multi-process sharding (GAME_SHARDS=N).
+
+The world is split by chunk coordinates: every SHARD_REGION×SHARD_REGION
+block of chunks hashes to one of N worker processes, and each worker runs an
+ordinary Hub that only owns the chunks of its blocks. The web process keeps
+no world state – ShardRouter assigns each socket a player id, forwards its
+keys to the shard the player is on, and writes the frames the shards send
+back through a per-socket Outbox.
+
+The front never writes a pipe from the event loop: each worker gets a
+sender thread fed by a queue. Otherwise front and worker could both block
+in send() with full pipes, each waiting for the other to read.
+
+Front and workers talk over multiprocessing pipes (tuples, pickled):
+
+    front → worker   ("connect", pid, fmt, home)   ("act", pid, action)   ("view", pid, radius)
+                     ("acts", pid, actions, ack)
+                     ("disconnect", pid)           ("adopt", pid, fmt, cid, r, c, color, origin)
+                     ("resume", pid, fmt)
+                     ("spectate", pid, fmt, cids)  ("unspectate", pid)      ("resnap", pid, cid)
+                     ("release", pid)              ("abort", pid)           ("stop",)
+                     ("fill", req, Fill)           ("profile", on, hz)      ("profiled", req, reset)
+    worker → front   ("ready",)   ("out", pid, frame)   ("kick", pid, code)
+                     ("handoff", pid, cid, r, c, color, fmt)
+                     ("adopted", pid, ok, origin)   ("stats", dict)   ("metrics", families)
+                     ("filled", req, result)   ("profiled", req, stacks)   ("persisted", cids)
+
+A move across a border into another shard's chunk is a two-phase handoff:
+the origin reports ("handoff") and ignores the player's moves from then on;
+the target tries to place the player on the destination cell ("adopt"); only
+when that worked the origin releases the player (restoring the ground under
+it, as on disconnect), otherwise it aborts and the player stays put – just
+like a move into an occupied cell. The player's color and format travel
+with it; its ground byte stays with the origin, which owns that cell. The
+front remembers each player's view radius and sends it to the new shard
+after a handoff. A view only covers chunks the player's current shard owns.
+
+Resumable sessions (sessions.py) live on the front, which knows sockets and
+not chunks: a dropped player stays in its worker untouched while the front
+discards its frames, and a resume ("resume") makes the worker send the
+player's chunks again as snapshots – no catch-up from delta history here.
+
+Spectators (/spectate) never reach a worker one by one. The front keeps a
+feed per (chunk, format) – one worker-side spectator ("spectate" under a
+pid of its own) – caches its latest snapshot and the deltas since, and
+fans every frame out to all its sockets. A socket joining a feed gets the
+cached frames; once more than FEED_MAX_DELTAS deltas piled up the cache is
+dropped and the next joiner asks the worker for a fresh one ("resnap").
+"""
+import asyncio, itertools, multiprocessing, queue, signal, sys, threading
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from fastapi import WebSocket
+
+from .settings import PROFILE, SESSION_GRACE_S, SHARD_REGION
+from .ids import chunk_id_from_coords, coords_from_chunk_id
+from .frames import Frame, encode_session, is_snapshot
+from .paint import Fill
+from .hub import Hub
+from .metrics import collect, counter, gauge
+from .profiler import Profiler
+from .sessions import Sessions
+from .outbox import Outbox, OutboxStats
+from .storage import store
+
+STATS_INTERVAL_S = 1.0
+FEED_MAX_DELTAS = 32
+
+
+def shard_of(cid: str, n: int) -> int:
+    """Shard index (0..n-1) owning chunk `cid`."""
+    cx, cy = coords_from_chunk_id(cid)
+    rx, ry = cx // SHARD_REGION, cy // SHARD_REGION
+    return ((rx * 73856093) ^ (ry * 19349663)) % n
+
+
+# ── worker side ──────────────────────────────────────────────────────────────
+class RemoteSocket:
+    """What a worker's Hub sees instead of a WebSocket: sends go to the front."""
+    def __init__(self, pid: int, post: Callable[[tuple], None]) -> None:
+        self.pid = pid
+        self._post = post
+
+    async def send_text(self, data: str) -> None:
+        self._post(("out", self.pid, data))
+
+    async def send_bytes(self, data: bytes) -> None:
+        self._post(("out", self.pid, data))
+
+    async def close(self, code: int = 1000) -> None:
+        self._post(("kick", self.pid, code))
+
+
+class _Worker:
+    def __init__(self, index: int, n: int, conn: Connection) -> None:
+        self.index = index
+        self.conn = conn
+        self.hub = Hub(owns=lambda cid: shard_of(cid, n) == index, handoff=self._handoff)
+        self.hub.on_persist = lambda cids: self._post(("persisted", cids))
+        self.sockets: Dict[int, RemoteSocket] = {}
+        self.spectators: Dict[int, RemoteSocket] = {}   # feed pid -> its Hub spectator
+        # one queue per player so its messages apply in order, while players
+        # still interleave across awaits (chunk loads, lock waits)
+        self._inbox: Dict[int, asyncio.Queue] = {}
+        self._stop = asyncio.Event()
+        self.profiler = Profiler()
+
+    def _post(self, msg: tuple) -> None:
+        try:
+            self.conn.send(msg)
+        except OSError:
+            self._stop.set()   # front is gone
+
+    def _handoff(self, ws: RemoteSocket, cid: str, r: int, c: int) -> None:
+        self._post(("handoff", ws.pid, cid, r, c, self.hub.player_color[ws], self.hub.fmt_by_ws[ws]))
+
+    def _on_readable(self) -> None:
+        try:
+            while self.conn.poll():
+                self._dispatch(self.conn.recv())
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(self.conn.fileno())
+            self._stop.set()
+
+    def _dispatch(self, msg: tuple) -> None:
+        op = msg[0]
+        if op == "connect":
+            _, pid, fmt, home = msg
+            ws = self.sockets[pid] = RemoteSocket(pid, self._post)
+            self._run(pid, lambda: self.hub.connect(ws, fmt, home))
+        elif op == "act":
+            _, pid, action = msg
+            ws = self.sockets.get(pid)
+            if ws is not None:
+                self._run(pid, lambda: self.hub.handle(ws, action))
+        elif op == "acts":
+            _, pid, actions, ack = msg
+            ws = self.sockets.get(pid)
+            if ws is not None:
+                self._run(pid, lambda: self.hub.handle_batch(ws, actions, ack))
+        elif op == "view":
+            _, pid, radius = msg
+            ws = self.sockets.get(pid)
+            if ws is not None:
+                self._run(pid, lambda: self.hub.set_view(ws, radius))
+        elif op in ("disconnect", "release"):
+            pid = msg[1]
+            ws = self.sockets.get(pid)
+            if ws is not None:
+                self._run(pid, lambda: self._leave(ws))
+        elif op == "resume":
+            _, pid, fmt = msg
+            ws = self.sockets.get(pid)
+            if ws is not None:
+                self._run(pid, lambda: self.hub.resumed_remote(ws, fmt))
+        elif op == "spectate":
+            _, pid, fmt, cids = msg
+            ws = self.spectators.get(pid)
+            if ws is None:
+                ws = self.spectators[pid] = RemoteSocket(pid, self._post)
+            self._run(pid, lambda: self.hub.spectate(ws, fmt, cids))
+        elif op == "unspectate":
+            ws = self.spectators.pop(msg[1], None)
+            if ws is not None:
+                self.hub.unspectate(ws)
+        elif op == "resnap":
+            _, pid, cid = msg
+            ws = self.spectators.get(pid)
+            if ws is not None:
+                self.hub.spectator_snapshot(ws, cid)
+        elif op == "abort":
+            ws = self.sockets.get(msg[1])
+            if ws is not None:
+                self.hub.handoff_aborted(ws)
+        elif op == "adopt":
+            _, pid, fmt, cid, r, c, color, origin = msg
+            ws = RemoteSocket(pid, self._post)
+            self._run(pid, lambda: self._adopt(ws, fmt, cid, r, c, color, origin))
+        elif op == "fill":
+            _, req, spec = msg
+            asyncio.create_task(self._fill(req, spec))
+        elif op == "profile":
+            _, on, hz = msg
+            if on:
+                self.profiler.start(hz)
+            else:
+                self.profiler.stop()
+        elif op == "profiled":
+            _, req, reset = msg
+            self._post(("profiled", req, self.profiler.folded(reset)))
+        elif op == "stop":
+            self._stop.set()
+
+    def _run(self, pid: int, job: Callable[[], Any]) -> None:
+        q = self._inbox.get(pid)
+        if q is None:
+            q = self._inbox[pid] = asyncio.Queue()
+            asyncio.create_task(self._drain(pid, q))
+        q.put_nowait(job)
+
+    async def _drain(self, pid: int, q: asyncio.Queue) -> None:
+        while True:
+            job = await q.get()
+            try:
+                await job()
+            except Exception as e:
+                print(f"[shard {self.index}] player {pid}: {e!r}")
+            if q.empty() and pid not in self.sockets:
+                if self._inbox.get(pid) is q:
+                    del self._inbox[pid]
+                return
+
+    async def _adopt(self, ws: RemoteSocket, fmt: str, cid: str, r: int, c: int, color: int, origin: int) -> None:
+        ok = await self.hub.adopt(ws, fmt, cid, r, c, color)
+        if ok:
+            self.sockets[ws.pid] = ws
+        self._post(("adopted", ws.pid, ok, origin))
+
+    async def _fill(self, req: int, spec: Fill) -> None:
+        try:
+            result = await self.hub.fill(spec)
+        except Exception as e:
+            result = {"error": repr(e)}
+        self._post(("filled", req, result))
+
+    async def _leave(self, ws: RemoteSocket) -> None:
+        await self.hub.disconnect(ws)
+        if self.sockets.get(ws.pid) is ws:
+            del self.sockets[ws.pid]
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(STATS_INTERVAL_S)
+            self._post(("stats", self.hub.stats()))
+            self._post(("metrics", collect() + self.hub.gauges()))
+
+    async def run(self) -> bool:
+        loop = asyncio.get_running_loop()
+        await self.hub.start()
+        loop.add_reader(self.conn.fileno(), self._on_readable)
+        self._post(("ready",))
+        if PROFILE:
+            self.profiler.start()
+        reporter = asyncio.create_task(self._report())
+        await self._stop.wait()
+        reporter.cancel()
+        self.profiler.stop()
+        clean = True
+        for ws in list(self.hub.pos_by_ws):
+            try:
+                await self.hub.disconnect(ws)
+            except Exception:
+                clean = False
+        clean = await self.hub.stop() and clean
+        store.close()
+        return clean
+
+
+def _worker_main(index: int, n: int, conn: Connection) -> None:
+    # Ctrl-C reaches the whole process group; the front decides when we stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def main() -> bool:
+        return await _Worker(index, n, conn).run()
+    if not asyncio.run(main()):
+        sys.exit(1)   # the front must not mark this shutdown clean
+
+
+# ── front side ───────────────────────────────────────────────────────────────
+class _Feed:
+    """One worker-side spectator of a chunk, shared by every front spectator of it in one format."""
+    __slots__ = ("pid", "cid", "fmt", "sockets", "waiting", "snapshot", "deltas", "asked")
+
+    def __init__(self, pid: int, cid: str, fmt: str) -> None:
+        self.pid, self.cid, self.fmt = pid, cid, fmt
+        self.sockets: Set[WebSocket] = set()    # hold the current version
+        self.waiting: Set[WebSocket] = set()    # need a snapshot first
+        self.snapshot: Optional[Frame] = None   # latest snapshot, if the deltas since are all in `deltas`
+        self.deltas: List[Frame] = []
+        self.asked = True                       # a snapshot is on its way
+
+
+class ShardRouter:
+    """
+    Stands in for Hub in the web process (connect / handle / handle_batch /
+    set_view / disconnect / fill / start / stop / stats) and spreads the
+    world over `n` worker processes.
+    """
+    def __init__(self, n: int) -> None:
+        self.n = n
+        self.root_cid = chunk_id_from_coords(0, 0)
+        self._conns: List[Connection] = []
+        self._outq: List[queue.SimpleQueue] = []
+        self._senders: List[threading.Thread] = []
+        self._procs: List[multiprocessing.Process] = []
+        self._ready: List[asyncio.Future] = []
+        self._pids = itertools.count(1)
+
+        self.ws_by_pid: Dict[int, WebSocket] = {}
+        self.pid_by_ws: Dict[WebSocket, int] = {}
+        self.shard_by_pid: Dict[int, int] = {}
+        self._in_transit: Set[int] = set()       # handoff asked, not answered yet
+        self.view_by_pid: Dict[int, int] = {}    # view radius asked for (Hub.set_view)
+        self._reqs = itertools.count(1)
+        self._replies: Dict[Tuple[int, int], asyncio.Future] = {}   # (req, shard) -> fill result / stacks
+        self.outbox: Dict[WebSocket, Outbox] = {}
+        self.outbox_stats = OutboxStats()
+        self.on_persist: Optional[Callable[[List[str]], None]] = None   # as Hub.on_persist, any shard
+        self.sessions: Optional[Sessions] = Sessions(SESSION_GRACE_S, self.disconnect) if SESSION_GRACE_S > 0 else None
+        self.spectating: Dict[WebSocket, Set[str]] = {}
+        self._spectator_fmt: Dict[WebSocket, str] = {}
+        self._feeds: Dict[Tuple[str, str], _Feed] = {}     # (cid, fmt) -> feed
+        self._feed_by_pid: Dict[int, _Feed] = {}
+
+        self.handoffs = 0
+        self.handoffs_refused = 0
+        self.inputs_dropped = 0                  # keys sent mid-handoff
+        self._shard_stats: List[Dict[str, object]] = [{} for _ in range(n)]
+        self._shard_metrics: List[list] = [[] for _ in range(n)]
+
+    # ── lifecycle ─────────────────────────────────────────────────────────────
+    async def start(self) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        loop = asyncio.get_running_loop()
+        for i in range(self.n):
+            ours, theirs = ctx.Pipe()
+            proc = ctx.Process(target=_worker_main, args=(i, self.n, theirs), name=f"game-shard-{i}", daemon=True)
+            proc.start()
+            theirs.close()
+            self._conns.append(ours)
+            q: queue.SimpleQueue = queue.SimpleQueue()
+            sender = threading.Thread(target=self._pump, args=(i, ours, q), name=f"game-shard-{i}-send", daemon=True)
+            sender.start()
+            self._outq.append(q)
+            self._senders.append(sender)
+            self._procs.append(proc)
+            self._ready.append(loop.create_future())
+            loop.add_reader(ours.fileno(), self._on_readable, i)
+        await asyncio.gather(*self._ready)
+
+    async def stop(self) -> bool:
+        """
+        Ask every worker to disconnect its players, flush and exit.
+        True if all of them did so cleanly.
+        """
+        loop = asyncio.get_running_loop()
+        for i in range(self.n):
+            self._send(i, ("stop",))
+            self._outq[i].put(None)
+        for proc in self._procs:
+            await loop.run_in_executor(None, proc.join, 30)
+            if proc.is_alive():
+                proc.terminate()
+        for sender in self._senders:
+            sender.join(timeout=1)
+        for conn in self._conns:
+            try:
+                loop.remove_reader(conn.fileno())
+            except (OSError, ValueError):
+                pass
+            conn.close()
+        for box in self.outbox.values():
+            box.close()
+        return all(proc.exitcode == 0 for proc in self._procs)
+
+    def stats(self) -> Dict[str, object]:
+        depths = [len(b) for b in self.outbox.values()]
+        return {
+            "shards": {
+                "count": self.n,
+                "players": len(self.pid_by_ws),
+                "in_transit": len(self._in_transit),
+                "handoffs": self.handoffs,
+                "handoffs_refused": self.handoffs_refused,
+                "inputs_dropped": self.inputs_dropped,
+                "workers": self._shard_stats,   # each worker's Hub.stats(), ≤1s old
+            },
+            "spectators": {
+                "sockets": len(self.spectating),
+                "feeds": len(self._feeds),
+            },
+            "sessions": {
+                "grace_s": SESSION_GRACE_S, "active": len(self.sessions), "held": self.sessions.held,
+                **self.sessions.stats.as_dict(),
+            } if self.sessions is not None else None,
+            "outbox": {
+                **self.outbox_stats.as_dict(),
+                "clients": len(depths),
+                "queued": sum(depths),
+                "max_depth": max(depths, default=0),
+            },
+        }
+
+    def metric_families(self) -> List[Tuple[Dict[str, str], list]]:
+        """As Hub.metric_families: the front's own, then each worker's (≤1s old) as shard="<i>"."""
+        depths = [len(b) for b in self.outbox.values()]
+        front = [
+            gauge("game_sockets", "Connected sockets", len(self.pid_by_ws)),
+            gauge("game_spectators", "Connected spectator sockets", len(self.spectating)),
+            gauge("game_spectator_feeds", "Chunk feeds shared by the spectators", len(self._feeds)),
+            gauge("game_sessions_held", "Dropped players kept for a resume",
+                  self.sessions.held if self.sessions is not None else 0),
+            gauge("game_outbox_queued", "Frames waiting in socket outboxes", sum(depths)),
+            counter("game_frames_sent_total", "Frames sent to sockets", self.outbox_stats.frames_sent),
+            counter("game_bytes_sent_total", "Bytes sent to sockets", self.outbox_stats.bytes_sent),
+            counter("game_clients_dropped_total", "Sockets kicked for lagging", self.outbox_stats.dropped_clients),
+            counter("game_handoffs_total", "Players moved to another shard", self.handoffs),
+            counter("game_handoffs_refused_total", "Handoffs the target shard refused", self.handoffs_refused),
+        ]
+        return [({"shard": "front"}, collect() + front)] + [
+            ({"shard": str(i)}, fams) for i, fams in enumerate(self._shard_metrics)]
+
+    # ── profiling ─────────────────────────────────────────────────────────────
+    def profile(self, on: bool, hz: float) -> None:
+        """Switch every worker's sampling profiler (profiler.py) on or off."""
+        for i in range(self.n):
+            self._send(i, ("profile", on, hz))
+
+    async def profiles(self, reset: bool = False) -> List[Dict[str, int]]:
+        """Each worker's folded stacks, in shard order."""
+        return await self._ask_all("profiled", reset)
+
+    # ── sockets ───────────────────────────────────────────────────────────────
+    @property
+    def sockets(self) -> Set[WebSocket]:
+        return set(self.pid_by_ws)
+
+    async def connect(self, ws: WebSocket, fmt: str = "json", home: Optional[str] = None) -> None:
+        pid = next(self._pids)
+        self.ws_by_pid[pid] = ws
+        self.pid_by_ws[ws] = pid
+        self.outbox[ws] = Outbox(ws, self.outbox_stats, self._resync, self._drop)
+        shard = self.shard_by_pid[pid] = shard_of(home or self.root_cid, self.n)
+        self._send(shard, ("connect", pid, fmt, home))
+        if self.sessions is not None:
+            self._new_session(ws, fmt)
+
+    async def resume(self, ws: WebSocket, fmt: str, token: str, seen: Optional[Dict[str, int]] = None) -> bool:
+        """As Hub.resume; `seen` is not used – the player's shard resends its chunks as snapshots."""
+        if self.sessions is None:
+            return False
+        taken = self.sessions.take(token)
+        if taken is None:
+            return False
+        old, _, held = taken
+        pid = self.pid_by_ws.pop(old, None)
+        if pid is None:
+            return False
+        self.pid_by_ws[ws] = pid
+        self.ws_by_pid[pid] = ws
+        box = self.outbox.pop(old, None)
+        if box is not None:
+            box.close()
+        self.outbox[ws] = Outbox(ws, self.outbox_stats, self._resync, self._drop)
+        self._new_session(ws, fmt)
+        self._send(self.shard_by_pid[pid], ("resume", pid, fmt))
+        if not held:
+            asyncio.create_task(self._kick(old, 4000))   # session resumed on another socket
+        return True
+
+    def _new_session(self, ws: WebSocket, fmt: str) -> None:
+        token = self.sessions.issue(ws, fmt)
+        self.outbox[ws].push("session", encode_session(fmt, token, SESSION_GRACE_S), snapshot=True)
+
+    async def handle(self, ws: WebSocket, action: str) -> None:
+        pid = self.pid_by_ws.get(ws)
+        if pid is None:
+            return
+        if pid in self._in_transit and action != "whereami":
+            self.inputs_dropped += 1
+            return
+        self._send(self.shard_by_pid[pid], ("act", pid, action))
+
+    async def handle_batch(self, ws: WebSocket, actions: Sequence[str], ack: Optional[Tuple[int, int]] = None) -> None:
+        pid = self.pid_by_ws.get(ws)
+        if pid is None:
+            return
+        if pid in self._in_transit:
+            kept = [a for a in actions if a == "whereami"]
+            self.inputs_dropped += len(actions) - len(kept)
+            actions = kept
+        if not actions and ack is None:
+            return
+        # sent even when empty: the shard answers the ack after what came before
+        self._send(self.shard_by_pid[pid], ("acts", pid, list(actions), ack))
+
+    async def set_view(self, ws: WebSocket, radius: int) -> None:
+        pid = self.pid_by_ws.get(ws)
+        if pid is None:
+            return
+        self.view_by_pid[pid] = radius
+        if pid not in self._in_transit:   # else sent to the new shard on "adopted"
+            self._send(self.shard_by_pid[pid], ("view", pid, radius))
+
+    async def disconnect(self, ws: WebSocket, hold: bool = False) -> None:
+        """As Hub.disconnect; a held player stays in its shard, its frames are dropped here."""
+        if hold and self.sessions is not None and ws in self.pid_by_ws and self.sessions.hold(ws):
+            box = self.outbox.pop(ws, None)
+            if box is not None:
+                box.close()
+            return
+        if self.sessions is not None:
+            self.sessions.forget(ws)
+        pid = self.pid_by_ws.pop(ws, None)
+        if pid is None:
+            return
+        del self.ws_by_pid[pid]
+        self.view_by_pid.pop(pid, None)
+        self._in_transit.discard(pid)   # a late "adopted" is undone in _dispatch
+        self._send(self.shard_by_pid.pop(pid), ("disconnect", pid))
+        box = self.outbox.pop(ws, None)
+        if box is not None:
+            box.close()
+
+    def _resync(self, ws: WebSocket, cid: str) -> Optional[Frame]:
+        # Outbox callback. The front has no boards: ask the shard for a fresh
+        # snapshot instead; it arrives as an ordinary frame.
+        pid = self.pid_by_ws.get(ws)
+        if pid is not None:
+            self._send(self.shard_by_pid[pid], ("act", pid, "whereami"))
+        return None
+
+    def _drop(self, ws: WebSocket) -> None:
+        asyncio.create_task(self._kick(ws, 1013))
+
+    async def _kick(self, ws: WebSocket, code: int) -> None:
+        try:
+            await ws.close(code=code)
+        except Exception:
+            pass
+        await self.disconnect(ws)
+
+    async def _ask_all(self, op: str, *args: Any) -> List[Any]:
+        """Send (op, req, *args) to every worker; their replies, in shard order."""
+        req = next(self._reqs)
+        loop = asyncio.get_running_loop()
+        futs = []
+        for i in range(self.n):
+            fut = self._replies[(req, i)] = loop.create_future()
+            futs.append(fut)
+            self._send(i, (op, req, *args))
+        return await asyncio.gather(*futs)
+
+    async def fill(self, spec: Fill) -> Dict[str, int]:
+        """Hub.fill on every worker (each edits the chunks it owns); results summed."""
+        total: Dict[str, int] = {}
+        for result in await self._ask_all("fill", spec):
+            if "error" in result:
+                raise RuntimeError(f"fill failed on a shard: {result['error']}")
+            for k, v in result.items():
+                total[k] = total.get(k, 0) + v
+        return total
+
+    # ── spectators ────────────────────────────────────────────────────────────
+    async def spectate(self, ws: WebSocket, fmt: str, cids: Sequence[str]) -> None:
+        """As Hub.spectate, through the shared feeds."""
+        if ws not in self.spectating:
+            self.spectating[ws] = set()
+            self._spectator_fmt[ws] = fmt
+            self.outbox[ws] = Outbox(ws, self.outbox_stats, self._resync_spectator, self._drop_spectator)
+        fmt = self._spectator_fmt[ws]
+        have, want = self.spectating[ws], set(cids)
+        for cid in have - want:
+            self._leave_feed(ws, self._feeds[(cid, fmt)])
+        for cid in sorted(want - have):
+            have.add(cid)
+            feed = self._feeds.get((cid, fmt))
+            if feed is None:
+                feed = self._feeds[(cid, fmt)] = _Feed(next(self._pids), cid, fmt)
+                self._feed_by_pid[feed.pid] = feed
+                self._send(shard_of(cid, self.n), ("spectate", feed.pid, fmt, [cid]))
+            self._join_feed(ws, feed)
+        self.spectating[ws] = have & want
+
+    def _join_feed(self, ws: WebSocket, feed: _Feed) -> None:
+        if feed.snapshot is None:
+            feed.waiting.add(ws)
+            if not feed.asked:
+                feed.asked = True
+                self._send(shard_of(feed.cid, self.n), ("resnap", feed.pid, feed.cid))
+            return
+        box = self.outbox[ws]
+        box.push(feed.cid, feed.snapshot, snapshot=True)
+        for frame in feed.deltas:
+            box.push(feed.cid, frame)
+        feed.sockets.add(ws)
+
+    def _leave_feed(self, ws: WebSocket, feed: _Feed) -> None:
+        feed.sockets.discard(ws)
+        feed.waiting.discard(ws)
+        if not feed.sockets and not feed.waiting:
+            del self._feeds[(feed.cid, feed.fmt)]
+            del self._feed_by_pid[feed.pid]
+            self._send(shard_of(feed.cid, self.n), ("unspectate", feed.pid))
+
+    def _feed_frame(self, feed: _Feed, frame: Frame) -> None:
+        if is_snapshot(frame):
+            feed.snapshot, feed.deltas, feed.asked = frame, [], False
+            feed.sockets |= feed.waiting
+            feed.waiting.clear()
+            for ws in feed.sockets:
+                self.outbox[ws].push(feed.cid, frame, snapshot=True)
+            return
+        if feed.snapshot is not None:
+            if len(feed.deltas) < FEED_MAX_DELTAS:
+                feed.deltas.append(frame)
+            else:   # cheaper to ask for a snapshot when someone joins
+                feed.snapshot, feed.deltas = None, []
+        for ws in feed.sockets:
+            box = self.outbox[ws]
+            if not box.resyncing(feed.cid):
+                box.push(feed.cid, frame)
+
+    def _resync_spectator(self, ws: WebSocket, cid: str) -> Optional[Frame]:
+        # Outbox callback: rejoin the feed, which replays or asks for a snapshot
+        feed = self._feeds.get((cid, self._spectator_fmt.get(ws, "")))
+        if feed is not None and ws in feed.sockets:
+            feed.sockets.discard(ws)
+            self._join_feed(ws, feed)
+        return None
+
+    def unspectate(self, ws: WebSocket) -> None:
+        fmt = self._spectator_fmt.pop(ws, None)
+        for cid in self.spectating.pop(ws, ()):
+            self._leave_feed(ws, self._feeds[(cid, fmt)])
+        box = self.outbox.pop(ws, None)
+        if box is not None:
+            box.close()
+
+    def _drop_spectator(self, ws: WebSocket) -> None:
+        self.unspectate(ws)
+        asyncio.create_task(self._close_quietly(ws, 1013))
+
+    @staticmethod
+    async def _close_quietly(ws: WebSocket, code: int) -> None:
+        try:
+            await ws.close(code=code)
+        except Exception:
+            pass
+
+    # ── pipes ─────────────────────────────────────────────────────────────────
+    def _send(self, i: int, msg: tuple) -> None:
+        self._outq[i].put(msg)
+
+    @staticmethod
+    def _pump(i: int, conn: Connection, q: queue.SimpleQueue) -> None:
+        while True:
+            msg = q.get()
+            if msg is None:
+                return
+            try:
+                conn.send(msg)
+            except OSError as e:
+                print(f"[shard] send to worker {i} failed: {e!r}")
+                return
+
+    def _on_readable(self, i: int) -> None:
+        conn = self._conns[i]
+        try:
+            while conn.poll():
+                self._dispatch(i, conn.recv())
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+            print(f"[shard] worker {i} exited")
+            if not self._ready[i].done():
+                self._ready[i].set_exception(RuntimeError(f"shard worker {i} died during startup"))
+            for (req, shard), fut in list(self._replies.items()):
+                if shard == i and not fut.done():
+                    del self._replies[(req, shard)]
+                    fut.set_exception(RuntimeError(f"shard worker {i} exited"))
+
+    def _dispatch(self, i: int, msg: tuple) -> None:
+        op = msg[0]
+        if op == "out":
+            _, pid, frame = msg
+            feed = self._feed_by_pid.get(pid)
+            if feed is not None:
+                self._feed_frame(feed, frame)
+                return
+            ws = self.ws_by_pid.get(pid)
+            box = self.outbox.get(ws) if ws is not None else None
+            # Frames are not tagged by chunk here, so the whole backlog of a
+            # socket coalesces as one stream ("") into a whereami resync.
+            if box is not None and not box.resyncing(""):
+                box.push("", frame)
+        elif op == "handoff":
+            _, pid, cid, r, c, color, fmt = msg
+            if pid not in self.ws_by_pid:
+                return   # gone already; the origin got ("disconnect")
+            self._in_transit.add(pid)
+            self._send(shard_of(cid, self.n), ("adopt", pid, fmt, cid, r, c, color, i))
+        elif op == "adopted":
+            _, pid, ok, origin = msg
+            self._in_transit.discard(pid)
+            if pid not in self.ws_by_pid:
+                if ok:   # socket closed mid-handoff: undo the adoption
+                    self._send(i, ("disconnect", pid))
+                return
+            if ok:
+                self.shard_by_pid[pid] = i
+                self._send(origin, ("release", pid))
+                if pid in self.view_by_pid:
+                    self._send(i, ("view", pid, self.view_by_pid[pid]))
+                self.handoffs += 1
+            else:   # refused: the player stays put, its view with it
+                self._send(origin, ("abort", pid))
+                self.handoffs_refused += 1
+        elif op == "kick":
+            _, pid, code = msg
+            feed = self._feed_by_pid.get(pid)
+            if feed is not None:   # the worker dropped the feed: subscribe again
+                feed.waiting |= feed.sockets
+                feed.sockets.clear()
+                feed.snapshot, feed.deltas, feed.asked = None, [], True
+                self._send(i, ("spectate", pid, feed.fmt, [feed.cid]))
+                return
+            ws = self.ws_by_pid.get(pid)
+            if ws is not None:
+                asyncio.create_task(self._kick(ws, code))
+        elif op == "stats":
+            self._shard_stats[i] = msg[1]
+        elif op == "metrics":
+            self._shard_metrics[i] = msg[1]
+        elif op in ("filled", "profiled"):
+            _, req, result = msg
+            fut = self._replies.pop((req, i), None)
+            if fut is not None and not fut.done():
+                fut.set_result(result)
+        elif op == "persisted":
+            if self.on_persist is not None:
+                self.on_persist(msg[1])
+        elif op == "ready":
+            self._ready[i].set_result(None)
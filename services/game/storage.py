@@ -0,0 +1,139 @@
+import asyncio, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+import torch
+
+from .settings import DB_OFFLOAD, SANITIZE, SANITIZE_BATCH
+from .db import ChunkDB, _db
+from .regions import RegionDB
+from .journal import Journal, replay
+from .metrics import STORE
+
+
+class ChunkStore:
+    """
+    Awaitable façade over the chunk backend (ChunkDB or RegionDB, see
+    GAME_STORAGE) for code running on the event loop.
+
+    Every storage call runs on one dedicated thread, so a disk stall only
+    delays the coroutine that asked for the data, never the loop. A single
+    thread also keeps writes and reads in submission order: a load queued
+    after a save always sees that save.
+
+    With offload=False the calls run inline (old behaviour) – handy for
+    comparing loop lag in /stats.
+    """
+    def __init__(self, db: Union[ChunkDB, RegionDB], offload: bool = DB_OFFLOAD) -> None:
+        self.db = db
+        self._pool: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunkdb") if offload else None
+        )
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # timed per DB method (load_chunk, save_chunks, checkpoint, ...), queueing included
+        hist = STORE.labels(fn.__name__.lstrip("_"))
+        t0 = time.perf_counter()
+        try:
+            if self._pool is None:
+                return fn(*args)
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            hist.observe(time.perf_counter() - t0)
+
+    async def load_chunk(self, cid: str) -> Optional[torch.Tensor]:
+        return await self._run(self.db.load_chunk, cid)
+
+    def snapshot(self, items: Iterable[Tuple[str, torch.Tensor]]) -> List[Tuple[str, torch.Tensor]]:
+        """
+        Copies of the boards to write, taken on the loop thread: they keep
+        changing while the write waits for the DB thread. Boards that are
+        the backend's own storage (region mappings) are passed as they are.
+        """
+        return [(cid, t if self.db.is_mapped(cid, t) else t.clone()) for cid, t in items]
+
+    # save_chunk / save_chunks / checkpoint are plain functions returning the
+    # write to await: the snapshot is taken by the call itself, so it cannot
+    # slip behind anything scheduled before the awaitable first runs.
+    def save_chunk(self, cid: str, data: torch.Tensor) -> Awaitable[None]:
+        return self.save_chunks([(cid, data)])
+
+    def save_chunks(self, items: Iterable[Tuple[str, torch.Tensor]]) -> Awaitable[None]:
+        return self._run(self.db.save_chunks, self.snapshot(items))
+
+    async def read_chunks(self, cids: Iterable[str]) -> List[Tuple[str, Optional[np.ndarray]]]:
+        return await self._run(self.db.read_chunks, list(cids))
+
+    async def iter_chunks(self, batch: int = SANITIZE_BATCH) -> AsyncIterator[List[Tuple[str, np.ndarray]]]:
+        """Every stored chunk, `batch` at a time: only one page is in memory at once."""
+        after = None
+        while True:
+            page, after = await self._run(self.db.scan_chunks, after, batch)
+            if page:
+                yield page
+            if after is None:
+                return
+
+    async def append_journal(self, journal: Journal, data: bytes) -> None:
+        await self._run(journal.write, data)
+
+    def checkpoint(self, items: Iterable[Tuple[str, torch.Tensor]], journal: Journal) -> Awaitable[None]:
+        """save_chunks, then empty `journal` – the snapshots cover all of it."""
+        return self._run(self._checkpoint, self.snapshot(items), journal)
+
+    def _checkpoint(self, rows, journal: Journal) -> None:
+        self.db.save_chunks(rows)
+        journal.truncate()
+
+    async def close_journal(self, journal: Journal) -> None:
+        await self._run(journal.close)
+
+    async def replay_journal(self) -> None:
+        """Startup, before sanitize(): apply logs left by a crashed run."""
+        t0 = time.perf_counter()
+        files, records, chunks = await self._run(replay, self.db)
+        if files:
+            print(f"[db] journal: replayed {records} records into {chunks} chunks "
+                  f"from {files} logs in {time.perf_counter() - t0:.2f}s")
+
+    async def touch(self, cids: Iterable[str]) -> None:
+        await self._run(self.db.touch, list(cids))
+
+    async def clear_player_bits_all(self) -> None:
+        await self._run(self.db.clear_player_bits_all)
+
+    async def sanitize(self) -> None:
+        """
+        Startup: make sure no chunk still shows a player from the last run.
+        The scan is skipped after a clean shutdown (mark_clean_shutdown) and
+        in lazy mode, where the backend strips player bits on load instead.
+        Clears the marker, so a crash from here on means a scan next time.
+        """
+        clean = await self._run(self.db.get_meta, "clean_shutdown") == "1"
+        await self._run(self.db.set_meta, "clean_shutdown", "0")
+        if SANITIZE == "lazy":
+            print("[db] sanitize: lazy, player bits are stripped on load")
+        elif clean:
+            print("[db] sanitize: skipped, last shutdown was clean")
+        else:
+            t0 = time.perf_counter()
+            scanned, rewritten = await self._run(self.db.clear_player_bits_all)
+            print(f"[db] sanitize: scanned {scanned} chunks, rewrote {rewritten} in {time.perf_counter() - t0:.2f}s")
+
+    async def mark_clean_shutdown(self) -> None:
+        """Every player was removed and flushed: the next start can skip the scan."""
+        # lazy runs leave stale bits in rows they never rewrote – never clean
+        if SANITIZE != "lazy":
+            await self._run(self.db.set_meta, "clean_shutdown", "1")
+
+    def stats(self) -> Dict[str, object]:
+        return self.db.stats()
+
+    def close(self) -> None:
+        """Wait for queued writes to land, then stop the DB thread."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+store = ChunkStore(_db)
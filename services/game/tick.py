@@ -0,0 +1,44 @@
+from typing import Dict
+
+
+class TickStats:
+    """Timing of the fixed-rate simulation tick (Hub._tick)."""
+    def __init__(self) -> None:
+        self.ticks = 0
+        self.overruns = 0          # ticks that took longer than the period
+        self.intents = 0           # applied
+        self.intents_dropped = 0   # over the per-player cap for one tick
+        self.chunks_broadcast = 0
+        self.apply_s = 0.0
+        self.broadcast_s = 0.0
+        self.max_apply_s = 0.0
+        self.max_broadcast_s = 0.0
+        self.last_apply_s = 0.0
+        self.last_broadcast_s = 0.0
+
+    def record(self, apply_s: float, broadcast_s: float, intents: int, chunks: int) -> None:
+        self.ticks += 1
+        self.intents += intents
+        self.chunks_broadcast += chunks
+        self.apply_s += apply_s
+        self.broadcast_s += broadcast_s
+        self.last_apply_s = apply_s
+        self.last_broadcast_s = broadcast_s
+        self.max_apply_s = max(self.max_apply_s, apply_s)
+        self.max_broadcast_s = max(self.max_broadcast_s, broadcast_s)
+
+    def as_dict(self) -> Dict[str, float]:
+        n = max(self.ticks, 1)
+        return {
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "intents": self.intents,
+            "intents_dropped": self.intents_dropped,
+            "chunks_broadcast": self.chunks_broadcast,
+            "apply_ms_avg": round(self.apply_s / n * 1000, 3),
+            "apply_ms_max": round(self.max_apply_s * 1000, 3),
+            "apply_ms_last": round(self.last_apply_s * 1000, 3),
+            "broadcast_ms_avg": round(self.broadcast_s / n * 1000, 3),
+            "broadcast_ms_max": round(self.max_broadcast_s * 1000, 3),
+            "broadcast_ms_last": round(self.last_broadcast_s * 1000, 3),
+        }
@@ -0,0 +1,7 @@
+import os, sys, tempfile
+from pathlib import Path
+
+# game.settings is read at import: keep the default databases out of data/
+_tmp = tempfile.mkdtemp(prefix="game-tests-")
+os.environ.setdefault("GAME_DB_PATH", os.path.join(_tmp, "world.db"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,40 @@
+"""game.bits against the torch kernels it replaced (game.bench.bits keeps them), for every byte value."""
+import numpy as np
+import pytest
+import torch
+
+from game import bits
+from game.bench.bits import (ref_get2, ref_inc_color, ref_make_color, ref_set_bit,
+                             ref_with_player, ref_without_player)
+from game.settings import COLOR_BITS, DTYPE
+
+ALL_BYTES = np.arange(256, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("v", range(256))
+def test_scalar_kernels_match_torch(v):
+    t = torch.tensor(v, dtype=DTYPE)
+    assert bits.inc_color(v) == int(ref_inc_color(t))
+    assert bits.with_player(v) == int(ref_with_player(t))
+    assert bits.without_player(v) == int(ref_without_player(t))
+    assert bits.is_player(v) == bool(v & 1)
+    assert bits.decode_rgb(v) == tuple(int(ref_get2(t, b0, b1)) for (b0, b1) in COLOR_BITS.values())
+    for bit in range(8):
+        for one in (False, True):
+            assert bits.set_bit(v, bit, one) == int(ref_set_bit(t, bit, one)), (bit, one)
+
+
+def test_make_color_matches_torch():
+    for r2 in range(4):
+        for g2 in range(4):
+            for b2 in range(4):
+                assert bits.make_color(r2, g2, b2) == int(ref_make_color(r2, g2, b2)), (r2, g2, b2)
+
+
+def test_array_kernels_match_scalar():
+    assert bits.inc_color_arr(ALL_BYTES).tolist() == [bits.inc_color(v) for v in range(256)]
+    assert bits.with_player_arr(ALL_BYTES).tolist() == [bits.with_player(v) for v in range(256)]
+    assert bits.without_player_arr(ALL_BYTES).tolist() == [bits.without_player(v) for v in range(256)]
+    r, g, b = bits.decode_rgb_arr(ALL_BYTES)
+    assert list(zip(r.tolist(), g.tolist(), b.tolist())) == [bits.decode_rgb(v) for v in range(256)]
+    assert bits.encode_rgb_arr(r, g, b).tolist() == [v & bits.COLOR_MASK for v in range(256)]
@@ -0,0 +1,36 @@
+import asyncio, threading
+
+import torch
+
+from game.regions import RegionDB
+from game.storage import ChunkStore
+from game.settings import H, W
+
+
+def test_regions_flush_keeps_edits_made_while_in_flight(tmp_path):
+    db = RegionDB(tmp_path)
+    store = ChunkStore(db, offload=True)
+    cid = "3,5"
+    first = torch.zeros((H, W), dtype=torch.uint8)
+    first[0, 0] = 1
+    db.save_chunks([(cid, first)])
+    board = db.load_chunk(cid)   # view into the mapping, as the Hub holds it
+
+    async def run():
+        gate = threading.Event()
+        blocked = store._run(gate.wait)      # hold the DB thread
+        board[1, 1] = 2
+        write = asyncio.ensure_future(store.save_chunks([(cid, board)]))
+        await asyncio.sleep(0)   # the flush is queued…
+        board[2, 2] = 3          # …and the board moves on
+        gate.set()
+        await blocked
+        await write
+
+    try:
+        asyncio.run(run())
+    finally:
+        store.close()
+    assert board[1, 1] == 2 and board[2, 2] == 3
+    stored = RegionDB(tmp_path).load_chunk(cid)
+    assert stored[0, 0] == 1 and stored[1, 1] == 2 and stored[2, 2] == 3